@@ -1,5 +1,93 @@
+from decimal import Decimal
+from functools import reduce
+from operator import or_
+
+from django import forms
 from django.contrib import admin
+from django.contrib.admin.views.main import PAGE_VAR
+from django.contrib.admin.widgets import AutocompleteSelect
+from django.core.paginator import Paginator
+from django.db.models import Prefetch, Q
+from django.utils.functional import cached_property
+from django.utils.text import smart_split, unescape_string_literal
+from django.utils.translation import gettext_lazy as _
+from .counts import get_count
 from .models import Author, Category, Book, BookDetails
+from .search import get_search_backend
+
+
+class AutocompleteFilter(admin.FieldListFilter):
+    """
+    Filter on a relation that renders a select2 autocomplete backed by the
+    related model's admin search instead of a link per related object: only
+    the selected object is loaded, whatever the size of the related table.
+    """
+
+    template = 'admin/books/autocomplete_filter.html'
+
+    def __init__(self, field, request, params, model, model_admin, field_path):
+        self.lookup_kwarg = f"{field_path}__{field.target_field.name}__exact"
+        values = params.get(self.lookup_kwarg)
+        self.lookup_val = values[-1] if isinstance(values, list) else values
+        super().__init__(field, request, params, model, model_admin, field_path)
+        self.preserved_params = [
+            (name, value)
+            for name, values in request.GET.lists()
+            if name not in (self.lookup_kwarg, PAGE_VAR)
+            for value in values
+        ]
+        remote_model = field.remote_field.model
+        self.form_field = forms.ModelChoiceField(
+            queryset=remote_model._default_manager.all(),
+            widget=AutocompleteSelect(field, model_admin.admin_site, attrs={'onchange': 'this.form.submit()'}),
+            required=False,
+        )
+
+    def expected_parameters(self):
+        return [self.lookup_kwarg]
+
+    def widget(self):
+        return self.form_field.widget.render(self.lookup_kwarg, self.lookup_val)
+
+    def choices(self, changelist):
+        yield {
+            'selected': self.lookup_val is None,
+            'query_string': changelist.get_query_string(remove=[self.lookup_kwarg]),
+            'display': _('All'),
+        }
+
+
+class CountingPaginator(Paginator):
+    # Changelist totals, date_hierarchy drilldowns included, through
+    # books.counts instead of a COUNT(*) per page view.
+
+    @cached_property
+    def count(self):
+        return get_count(self.object_list, estimate=True)
+
+
+class PriceRangeFilter(admin.SimpleListFilter):
+    title = 'price'
+    parameter_name = 'price_range'
+    # (value, label, lower bound inclusive, upper bound exclusive)
+    RANGES = [
+        ('0-20', '< 20', None, Decimal('20')),
+        ('20-50', '20–50', Decimal('20'), Decimal('50')),
+        ('50-100', '50–100', Decimal('50'), Decimal('100')),
+        ('100-', '≥ 100', Decimal('100'), None),
+    ]
+
+    def lookups(self, request, model_admin):
+        return [(value, label) for value, label, _, _ in self.RANGES]
+
+    def queryset(self, request, queryset):
+        for value, _, lower, upper in self.RANGES:
+            if value == self.value():
+                if lower is not None:
+                    queryset = queryset.filter(price__gte=lower)
+                if upper is not None:
+                    queryset = queryset.filter(price__lt=upper)
+        return queryset
 
 
 class BookDetailsInline(admin.StackedInline):
@@ -23,13 +111,45 @@ class CategoryAdmin(admin.ModelAdmin):
 @admin.register(Book)
 class BookAdmin(admin.ModelAdmin):
     list_display = ('title', 'author', 'price', 'publication_date', 'display_categories')
-    list_filter = ('publication_date', 'author', 'categories', 'price')
-    search_fields = ('title', 'description', 'author__first_name', 'author__last_name')
+    list_filter = (
+        'publication_date',
+        ('author', AutocompleteFilter),
+        ('categories', AutocompleteFilter),
+        PriceRangeFilter,
+    )
+    list_select_related = ('author',)
+    paginator = CountingPaginator
+    # The unfiltered total is an extra COUNT over the whole table.
+    show_full_result_count = False
+    # title and description go through the full-text index, see get_search_results.
+    search_fields = ('author__first_name', 'author__last_name')
     date_hierarchy = 'publication_date'
     filter_horizontal = ('categories',)
 
     inlines = [BookDetailsInline]
 
+    @property
+    def media(self):
+        # The select2 assets of the autocomplete filters.
+        return super().media + AutocompleteSelect(Book._meta.get_field('author'), self.admin_site).media
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).prefetch_related(
+            Prefetch('categories', queryset=Category.objects.only('id', 'name'))
+        )
+
+    def get_search_results(self, request, queryset, search_term):
+        # Like the admin's own search every term has to match: either the
+        # title or description through the full-text index, or one of
+        # search_fields.
+        backend = get_search_backend()
+        for term in smart_split(search_term):
+            if term.startswith(('"', "'")) and term[0] == term[-1]:
+                term = unescape_string_literal(term)
+            by_field = reduce(or_, (Q(**{f'{field}__icontains': term}) for field in self.search_fields))
+            queryset = queryset.filter(Q(pk__in=backend.filter(Book.objects.all(), term).values('pk')) | by_field)
+        return queryset, False
+
     def display_categories(self, obj):
         return ", ".join([category.name for category in obj.categories.all()])
     display_categories.short_description = 'Categories'
@@ -4,3 +4,8 @@ from django.apps import AppConfig
 class BooksConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'books'
+
+    def ready(self):
+        from . import signals  # noqa: F401
+        # Before any connection is opened, so every one gets the query recorder.
+        from bookshelf import metrics  # noqa: F401
@@ -0,0 +1,122 @@
+import datetime
+import random
+import statistics
+import time
+from contextlib import contextmanager
+from decimal import Decimal
+
+from django.test.utils import setup_databases, setup_test_environment, teardown_databases, teardown_test_environment
+
+from .models import Author, Book, BookDetails, Category
+from .statistics import rebuild_statistics
+
+WORDS = (
+    "wiatr morze las miasto noc dzień wojna miłość dom droga ogień czas pamięć sen "
+    "król księga podróż rzeka góra zima lato cień światło serce historia tajemnica"
+).split()
+SYLLABLES = "ka lo mi ra te no wa si du be ge zo ni pa ro le ku ta ma sa".split()
+# A few thousand synthetic words give search terms a realistic selectivity.
+VOCABULARY = WORDS + [a + b + c for a in SYLLABLES for b in SYLLABLES for c in SYLLABLES]
+FIRST_NAMES = ("Adam", "Olga", "Henryk", "Wisława", "Bolesław", "Maria", "Stanisław", "Zofia", "Jan", "Anna")
+LAST_NAMES = ("Mickiewicz", "Tokarczuk", "Sienkiewicz", "Szymborska", "Prus", "Konopnicka", "Lem", "Nałkowska")
+FORMATS = [code for code, _ in Book.FORMAT_CHOICES]
+
+
+@contextmanager
+def benchmark_database(verbosity=0):
+    # Benchmarks never touch the configured database: they run against a
+    # throwaway test database, exactly like the test runner does.
+    setup_test_environment()
+    old_config = setup_databases(verbosity=verbosity, interactive=False, aliases={'default'})
+    try:
+        yield
+    finally:
+        teardown_databases(old_config, verbosity=verbosity)
+        teardown_test_environment()
+
+
+def _sentence(rng, words):
+    return ' '.join(rng.choice(VOCABULARY) for _ in range(words)).capitalize()
+
+
+def seed_catalog(books, authors=None, categories=20, batch_size=5000, seed=0):
+    rng = random.Random(seed)
+    authors = authors or max(books // 20, 1)
+
+    Author.objects.bulk_create(
+        [Author(first_name=f"{FIRST_NAMES[i % len(FIRST_NAMES)]} {i}", last_name=LAST_NAMES[i % len(LAST_NAMES)])
+         for i in range(authors)],
+        batch_size=batch_size
+    )
+    Category.objects.bulk_create(
+        [Category(name=f"{WORDS[i % len(WORDS)].capitalize()} {i}") for i in range(categories)],
+        batch_size=batch_size
+    )
+    author_ids = list(Author.objects.values_list('pk', flat=True))
+    category_ids = list(Category.objects.values_list('pk', flat=True))
+    through = Book.categories.through
+
+    start = datetime.date(1800, 1, 1)
+    for offset in range(0, books, batch_size):
+        batch = [
+            Book(
+                title=f"{_sentence(rng, 3)} {offset + i}",
+                author_id=rng.choice(author_ids),
+                description=_sentence(rng, 25),
+                price=Decimal(rng.randint(500, 15000)) / 100,
+                publication_date=start + datetime.timedelta(days=rng.randint(0, 80000)),
+                book_format=rng.choice(FORMATS),
+            )
+            for i in range(min(batch_size, books - offset))
+        ]
+        Book.objects.bulk_create(batch)
+        book_ids = [book.pk for book in batch]
+        through.objects.bulk_create([
+            through(book_id=book_id, category_id=category_id)
+            for book_id in book_ids
+            for category_id in rng.sample(category_ids, k=min(2, len(category_ids)))
+        ])
+        BookDetails.objects.bulk_create([
+            BookDetails(
+                book_id=book_id,
+                isbn=f"978-{book_id:09d}",
+                number_of_pages=rng.randint(80, 900),
+                language=rng.choice(("polski", "angielski", "niemiecki")),
+                publisher=rng.choice(("Znak", "Czarne", "PIW", "Wydawnictwo Literackie")),
+            )
+            for book_id in book_ids
+            if rng.random() < 0.8
+        ])
+
+    # bulk_create skips the signals that maintain the statistics table.
+    rebuild_statistics()
+
+
+def _percentile(samples, fraction):
+    ordered = sorted(samples)
+    index = min(int(round(fraction * (len(ordered) - 1))), len(ordered) - 1)
+    return ordered[index]
+
+
+def summarize(samples, elapsed=None):
+    # elapsed: wall time of concurrently taken samples; sequential samples
+    # simply add up.
+    elapsed = sum(samples) if elapsed is None else elapsed
+    return {
+        'iterations': len(samples),
+        'mean_ms': statistics.fmean(samples) * 1000,
+        'p50_ms': _percentile(samples, 0.50) * 1000,
+        'p99_ms': _percentile(samples, 0.99) * 1000,
+        'ops_per_sec': len(samples) / elapsed if elapsed else None,
+    }
+
+
+def measure(func, iterations=20, warmup=1):
+    for _ in range(warmup):
+        func()
+    samples = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - started)
+    return summarize(samples)
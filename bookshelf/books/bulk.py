@@ -0,0 +1,193 @@
+from django.db import transaction
+
+from .models import Author, Book, BookDetails, Category
+from .signals import books_bulk_changed
+from .statistics import deferred_statistics
+
+BATCH_SIZE = 1000
+BOOK_FIELDS = ('title', 'author_id', 'description', 'price', 'publication_date', 'book_format')
+
+
+class BulkErrors(list):
+    # One dict of field errors per payload item, shaped like the errors of a
+    # DRF serializer with many=True ({} for items without problems).
+
+    def __init__(self, size):
+        super().__init__({} for _ in range(size))
+
+    def add(self, index, field, message, subfield=None):
+        errors = self[index]
+        if subfield is not None:
+            errors = errors.setdefault(field, {})
+            field = subfield
+        errors.setdefault(field, []).append(message)
+
+    def __bool__(self):
+        return any(self)
+
+
+def _check_relations(items, errors):
+    author_ids = {item['author_id'] for item in items if 'author_id' in item}
+    category_ids = {pk for item in items for pk in item.get('category_ids', ())}
+    authors = set(Author.objects.filter(pk__in=author_ids).values_list('pk', flat=True)) if author_ids else set()
+    categories = (
+        set(Category.objects.filter(pk__in=category_ids).values_list('pk', flat=True)) if category_ids else set()
+    )
+    for index, item in enumerate(items):
+        if 'author_id' in item and item['author_id'] not in authors:
+            errors.add(index, 'author', f"Autor o ID {item['author_id']} nie istnieje.")
+        for pk in item.get('category_ids', ()):
+            if pk not in categories:
+                errors.add(index, 'categories', f"Kategoria o ID {pk} nie istnieje.")
+
+
+def _check_unique_titles(keys, errors):
+    # keys: index -> (book pk or None, title, author_id) after the write.
+    seen = {}
+    for index, (pk, title, author_id) in keys.items():
+        if (title, author_id) in seen:
+            errors.add(index, 'non_field_errors', "Książka tego autora o tym tytule powtarza się w żądaniu.")
+        seen[(title, author_id)] = pk
+    if not seen:
+        return
+    # Title alone keeps the lookup on the unique (title, author) index.
+    existing = Book.objects.filter(title__in={title for title, _ in seen}).values_list('title', 'author_id', 'pk')
+    taken = {(title, author_id): pk for title, author_id, pk in existing}
+    for index, (pk, title, author_id) in keys.items():
+        if taken.get((title, author_id), pk) != pk:
+            errors.add(index, 'non_field_errors', "Książka tego autora o tym tytule już istnieje.")
+
+
+def _check_unique_isbns(items, pks, errors):
+    isbns = {}
+    for index, item in enumerate(items):
+        isbn = (item.get('details') or {}).get('isbn')
+        if not isbn:
+            continue
+        if isbn in isbns.values():
+            errors.add(index, 'details', f"ISBN {isbn} powtarza się w żądaniu.", subfield='isbn')
+        isbns[index] = isbn
+    if not isbns:
+        return
+    taken = dict(BookDetails.objects.filter(isbn__in=set(isbns.values())).values_list('isbn', 'book_id'))
+    for index, isbn in isbns.items():
+        if isbn in taken and taken[isbn] != pks[index]:
+            errors.add(index, 'details', f"ISBN {isbn} już istnieje.", subfield='isbn')
+
+
+def _write_categories(pairs):
+    through = Book.categories.through
+    through.objects.bulk_create([
+        through(book_id=book_pk, category_id=category_pk)
+        for book_pk, category_pks in pairs
+        for category_pk in dict.fromkeys(category_pks)
+    ], batch_size=BATCH_SIZE)
+
+
+def bulk_create_books(items):
+    """
+    items are validated_data dicts of BookBulkSerializer. Nothing is written
+    unless every item is valid; returns (books, errors).
+    """
+    errors = BulkErrors(len(items))
+    _check_relations(items, errors)
+    _check_unique_titles(
+        {index: (None, item['title'], item['author_id']) for index, item in enumerate(items)}, errors
+    )
+    _check_unique_isbns(items, [None] * len(items), errors)
+    if errors:
+        return [], errors
+
+    books = [Book(**{field: item[field] for field in BOOK_FIELDS if field in item}) for item in items]
+    with transaction.atomic(), deferred_statistics():
+        Book.objects.bulk_create(books, batch_size=BATCH_SIZE)
+        _write_categories((book.pk, item['category_ids']) for book, item in zip(books, items))
+        BookDetails.objects.bulk_create([
+            BookDetails(book=book, **item['details'])
+            for book, item in zip(books, items)
+            if item.get('details')
+        ], batch_size=BATCH_SIZE)
+        books_bulk_changed.send(sender=Book, author_ids={book.author_id for book in books})
+    return books, errors
+
+
+def bulk_update_books(items):
+    """
+    Partial updates; every item carries the "id" of an existing book.
+    Returns (books, errors) like bulk_create_books.
+    """
+    errors = BulkErrors(len(items))
+    books = Book.objects.in_bulk([item['id'] for item in items if 'id' in item])
+    seen = set()
+    for index, item in enumerate(items):
+        if 'id' not in item:
+            errors.add(index, 'id', "To pole jest wymagane.")
+        elif item['id'] not in books:
+            errors.add(index, 'id', f"Książka o ID {item['id']} nie istnieje.")
+        elif item['id'] in seen:
+            errors.add(index, 'id', "Książka powtarza się w żądaniu.")
+        seen.add(item.get('id'))
+    if errors:
+        return [], errors
+
+    _check_relations(items, errors)
+    _check_unique_titles({
+        index: (item['id'], item.get('title', books[item['id']].title),
+                item.get('author_id', books[item['id']].author_id))
+        for index, item in enumerate(items)
+        if 'title' in item or 'author_id' in item
+    }, errors)
+    _check_unique_isbns(items, [item['id'] for item in items], errors)
+    if errors:
+        return [], errors
+
+    author_ids = {book.author_id for book in books.values()}
+    fields = set()
+    for item in items:
+        book = books[item['id']]
+        for field in BOOK_FIELDS:
+            if field in item:
+                setattr(book, field, item[field])
+                fields.add(field)
+    author_ids |= {book.author_id for book in books.values()}
+
+    details_items = {item['id']: item['details'] for item in items if item.get('details')}
+    existing_details = BookDetails.objects.in_bulk(details_items)
+    new_details = []
+    details_fields = set()
+    for pk, data in details_items.items():
+        if pk in existing_details:
+            for field, value in data.items():
+                setattr(existing_details[pk], field, value)
+                details_fields.add(field)
+        else:
+            new_details.append(BookDetails(book_id=pk, **data))
+
+    updated = [books[item['id']] for item in items]
+    with transaction.atomic(), deferred_statistics():
+        if fields:
+            Book.objects.bulk_update(updated, fields, batch_size=BATCH_SIZE)
+        categories = [(item['id'], item['category_ids']) for item in items if 'category_ids' in item]
+        if categories:
+            Book.categories.through.objects.filter(book_id__in=[pk for pk, _ in categories]).delete()
+            _write_categories(categories)
+        if details_fields:
+            BookDetails.objects.bulk_update(existing_details.values(), details_fields, batch_size=BATCH_SIZE)
+        BookDetails.objects.bulk_create(new_details, batch_size=BATCH_SIZE)
+        books_bulk_changed.send(sender=Book, author_ids=author_ids)
+    return updated, errors
+
+
+def bulk_delete_books(ids):
+    errors = BulkErrors(len(ids))
+    existing = dict(Book.objects.filter(pk__in=ids).values_list('pk', 'author_id'))
+    for index, pk in enumerate(ids):
+        if pk not in existing:
+            errors.add(index, 'id', f"Książka o ID {pk} nie istnieje.")
+    if errors:
+        return 0, errors
+
+    with transaction.atomic(), deferred_statistics():
+        Book.objects.filter(pk__in=ids).delete()
+        books_bulk_changed.send(sender=Book, author_ids=set(existing.values()))
+    return len(existing), errors
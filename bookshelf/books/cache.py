@@ -0,0 +1,102 @@
+import hashlib
+import uuid
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import F
+from django.utils import timezone
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from rest_framework.response import Response
+
+from .models import ModelVersion
+
+RESPONSE_KEY = 'books:response:{}'
+
+
+def bump_version(model):
+    # Runs inside the writer's transaction, so the new version becomes
+    # visible together with the rows it describes.
+    label, now, token = model._meta.label_lower, timezone.now(), uuid.uuid4()
+    if not ModelVersion.objects.filter(label=label).update(version=F('version') + 1, token=token, updated_at=now):
+        ModelVersion.objects.get_or_create(label=label, defaults={'version': 1, 'token': token, 'updated_at': now})
+
+
+def _versions_queryset(labels):
+    return ModelVersion.objects.filter(label__in=labels).values_list('label', 'version', 'token', 'updated_at')
+
+
+def get_versions(models):
+    # [(version, token, updated_at)] in the order of models.
+    labels = [model._meta.label_lower for model in models]
+    rows = {label: (version, token, updated_at) for label, version, token, updated_at in _versions_queryset(labels)}
+    return [rows.get(label, (0, None, None)) for label in labels]
+
+
+def version_stamp(versions):
+    return ':'.join(f'{version}.{token.hex if token else 0}' for version, token, _ in versions)
+
+
+def response_fingerprint(request, versions, renderer_format):
+    params = sorted((key, sorted(values)) for key, values in request.GET.lists())
+    parts = [
+        request.build_absolute_uri(request.path),
+        urlencode(params, doseq=True),
+        renderer_format,
+        version_stamp(versions),
+    ]
+    return hashlib.sha256('|'.join(parts).encode()).hexdigest()
+
+
+def response_validators(request, versions, renderer_format):
+    # (cache key, ETag, Last-Modified timestamp) of a response. The timestamp
+    # keeps its fraction: the header is truncated to the second, but
+    # If-Modified-Since is compared with the exact time of the last write,
+    # so a second write within the same second is never answered with 304.
+    fingerprint = response_fingerprint(request, versions, renderer_format)
+    modified = [updated_at for _, _, updated_at in versions if updated_at is not None]
+    last_modified = max(modified).timestamp() if modified else None
+    return RESPONSE_KEY.format(fingerprint), f'"{fingerprint}"', last_modified
+
+
+def set_validator_headers(response, etag, last_modified):
+    response['ETag'] = etag
+    if last_modified is not None:
+        response['Last-Modified'] = http_date(last_modified)
+    return response
+
+
+class ResponseCacheMixin:
+    """
+    Conditional GET and response caching for list/retrieve. Both are derived
+    from the stored versions of the models in cache_models: the ETag and the
+    cache key change whenever any of them is written, and Last-Modified is
+    the latest of their modification times. A matching If-None-Match or
+    If-Modified-Since is answered with 304 before the queryset or the
+    serializer is touched.
+    """
+
+    cache_models = ()
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(super().retrieve, request, *args, **kwargs)
+
+    def cached_response(self, handler, request, *args, **kwargs):
+        versions = get_versions(self.cache_models)
+        key, etag, last_modified = response_validators(request, versions, request.accepted_renderer.format)
+
+        response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if response is None:
+            data = cache.get(key)
+            if data is not None:
+                response = Response(data)
+            else:
+                response = handler(request, *args, **kwargs)
+                if response.status_code != 200:
+                    return response
+                cache.set(key, response.data, timeout=settings.BOOKS_RESPONSE_CACHE_TIMEOUT)
+        return set_validator_headers(response, etag, last_modified)
@@ -0,0 +1,110 @@
+import hashlib
+import json
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+from django.db.models.expressions import Col
+from django.db.models.lookups import Exact
+
+from .cache import get_versions, version_stamp
+from .models import Book, BookStatistics
+from .signals import CACHED_MODELS
+
+COUNT_KEY = 'books:count:{}'
+
+
+def _statistics_scope(queryset):
+    # The BookStatistics row that holds the count of an unfiltered or
+    # author-filtered book queryset: (True, author_id or None), or (False, None)
+    # when the queryset has any other shape.
+    query = queryset.query
+    if (
+        queryset.model is not Book or query.is_sliced or query.distinct or query.combinator
+        or query.group_by or query.extra or query.annotations
+    ):
+        return False, None
+    if not query.where:
+        return True, None
+    if query.where.negated or len(query.where.children) != 1:
+        return False, None
+    lookup = query.where.children[0]
+    if (
+        isinstance(lookup, Exact) and isinstance(lookup.lhs, Col) and lookup.lhs.alias == query.base_table
+        and lookup.lhs.target.attname == 'author_id' and isinstance(lookup.rhs, int)
+    ):
+        return True, lookup.rhs
+    return False, None
+
+
+def _fingerprint(queryset):
+    sql, params = queryset.order_by().query.sql_with_params()
+    versions = get_versions(CACHED_MODELS)
+    parts = [queryset.db, sql, json.dumps(params, default=str), version_stamp(versions)]
+    return hashlib.sha256('|'.join(parts).encode()).hexdigest()
+
+
+def _estimate(queryset):
+    # The planner's row estimate; only PostgreSQL exposes one cheaply.
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql':
+        return None
+    sql, params = queryset.order_by().query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]['Plan']['Plan Rows'])
+
+
+def get_count(queryset, estimate=False):
+    """
+    Row count of a queryset for paginators and connection fields.
+
+    Unfiltered and author-filtered book querysets are answered from the
+    maintained BookStatistics counters. Other results are counted exactly up
+    to COUNT_EXACT_THRESHOLD rows, which costs at most that many rows read;
+    larger ones are counted once and cached until the next catalog write
+    (the key includes the model versions). With estimate=True a large count
+    may instead be the planner's estimate where the database provides one,
+    so it must only be displayed, never used to slice results.
+    """
+    known, author_id = _statistics_scope(queryset)
+    if known:
+        count = BookStatistics.objects.filter(author_id=author_id).values_list('book_count', flat=True).first()
+        if count is not None:
+            return count
+
+    threshold = settings.COUNT_EXACT_THRESHOLD
+    count = queryset.order_by()[:threshold + 1].count()
+    if count <= threshold:
+        return count
+
+    key = COUNT_KEY.format(_fingerprint(queryset))
+    cached = cache.get(key)
+    if cached is not None and (estimate or cached['exact']):
+        return cached['count']
+    count = _estimate(queryset) if estimate else None
+    exact = count is None
+    if exact:
+        count = queryset.count()
+    cache.set(key, {'count': count, 'exact': exact}, timeout=settings.COUNT_CACHE_TIMEOUT)
+    return count
+
+
+class CountedQuerySet:
+    # Sequence view of a queryset whose len() comes from get_count(), for
+    # code that sizes a result with len() and then slices it.
+
+    def __init__(self, queryset):
+        self.queryset = queryset
+
+    def __len__(self):
+        return get_count(self.queryset)
+
+    def __getitem__(self, item):
+        return self.queryset[item]
+
+    def __iter__(self):
+        return iter(self.queryset)
@@ -0,0 +1,187 @@
+import io
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from pathlib import PurePosixPath
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connections, transaction
+from django.db.models import F, Q
+from PIL import Image, ImageOps
+
+from .cache import bump_version
+from .models import Book, CoverBlob
+from .storage import cover_storage
+
+logger = logging.getLogger(__name__)
+
+# Bounding boxes; covers are scaled down to fit, never up.
+RENDITIONS = {
+    'thumbnail': (100, 150),
+    'card': (300, 450),
+    'full': (800, 1200),
+}
+RENDITION_FORMATS = {
+    'webp': ('WEBP', {'quality': 80, 'method': 4}),
+    'jpeg': ('JPEG', {'quality': 85, 'optimize': True, 'progressive': True}),
+}
+RENDITIONS_DIR = 'book_covers/renditions'
+
+
+def rendition_name(source, rendition, extension):
+    # One directory per cover file. Books sharing a deduplicated cover share
+    # its renditions too.
+    return f"{RENDITIONS_DIR}/{PurePosixPath(source).name}/{rendition}.{extension}"
+
+
+def renditions_current(book):
+    # Book.cover_renditions is {"source": <cover_image name>, "files":
+    # {rendition: {extension: <storage name>}}}, or None without a cover.
+    source = book.cover_image.name or None
+    stored = book.cover_renditions
+    return (stored or {}).get('source') == source if source else stored is None
+
+
+def renditions_missing(book):
+    # Also checks the storage, so meant for the management command only.
+    if not renditions_current(book):
+        return True
+    files = (book.cover_renditions or {}).get('files', {})
+    return any(not default_storage.exists(name) for names in files.values() for name in names.values())
+
+
+def rendition_urls(cover_renditions, rendition):
+    files = (cover_renditions or {}).get('files', {}).get(rendition)
+    if not files:
+        return None
+    return {extension: default_storage.url(name) for extension, name in files.items()}
+
+
+def _rgb(image):
+    if image.mode in ('RGBA', 'LA', 'P'):
+        image = image.convert('RGBA')
+        background = Image.new('RGB', image.size, 'white')
+        background.paste(image, mask=image.getchannel('A'))
+        return background
+    return image.convert('RGB')
+
+
+def existing_renditions(source):
+    files = {
+        rendition: {extension: rendition_name(source, rendition, extension) for extension in RENDITION_FORMATS}
+        for rendition in RENDITIONS
+    }
+    if all(default_storage.exists(name) for names in files.values() for name in names.values()):
+        return {'source': source, 'files': files}
+    return None
+
+
+def render_cover(source):
+    with cover_storage.open(source, 'rb') as handle:
+        image = _rgb(ImageOps.exif_transpose(Image.open(handle)))
+    files = {}
+    for rendition, size in RENDITIONS.items():
+        resized = image.copy()
+        resized.thumbnail(size, Image.Resampling.LANCZOS)
+        for extension, (image_format, options) in RENDITION_FORMATS.items():
+            buffer = io.BytesIO()
+            resized.save(buffer, image_format, **options)
+            name = rendition_name(source, rendition, extension)
+            if default_storage.exists(name):
+                default_storage.delete(name)
+            files.setdefault(rendition, {})[extension] = default_storage.save(name, ContentFile(buffer.getvalue()))
+    return {'source': source, 'files': files}
+
+
+def release_renditions(cover_renditions):
+    # Rendition files go away with the last book using their cover.
+    if not cover_renditions or Book.objects.filter(cover_image=cover_renditions['source']).exists():
+        return
+    for files in cover_renditions['files'].values():
+        for name in files.values():
+            default_storage.delete(name)
+
+
+def process_cover(book_id, source, reuse=True):
+    """
+    Brings the renditions of a book in line with its cover source (None
+    when the cover was removed), reusing those of another book with the
+    same cover file unless reuse=False. The result is only stored while the
+    book still has that cover; otherwise a newer job owns it.
+    """
+    previous = Book.objects.filter(pk=book_id).values_list('cover_renditions', flat=True).first()
+    renditions = None
+    if source:
+        renditions = (reuse and existing_renditions(source)) or render_cover(source)
+    with transaction.atomic():
+        has_source = Q(cover_image=source) if source else Q(cover_image='') | Q(cover_image__isnull=True)
+        updated = Book.objects.filter(has_source, pk=book_id).update(cover_renditions=renditions)
+        if updated:
+            bump_version(Book)
+    if not updated:
+        release_renditions(renditions)
+    elif previous and previous['source'] != source:
+        release_renditions(previous)
+    return renditions
+
+
+def retain_cover(name):
+    # Legacy covers (stored before the content-addressed storage) are not
+    # reference counted and never collected.
+    if not cover_storage.is_blob_name(name):
+        return
+    blob, created = CoverBlob.objects.get_or_create(
+        name=name, defaults={'size': cover_storage.size(name), 'ref_count': 1}
+    )
+    if not created:
+        CoverBlob.objects.filter(name=name).update(ref_count=F('ref_count') + 1)
+
+
+def release_cover(name):
+    if not cover_storage.is_blob_name(name):
+        return
+    if CoverBlob.objects.filter(name=name, ref_count__gt=0).update(ref_count=F('ref_count') - 1):
+        transaction.on_commit(partial(collect_cover, name))
+
+
+def collect_cover(name):
+    # Runs after the commit that dropped the last reference; a book that
+    # took the blob again in the meantime keeps it alive.
+    if CoverBlob.objects.filter(name=name, ref_count=0).delete()[0]:
+        cover_storage.delete(name)
+        return True
+    return False
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _executor_instance():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.COVER_RENDITION_WORKERS, thread_name_prefix='cover-renditions'
+            )
+        return _executor
+
+
+def _run_in_worker(book_id, source):
+    try:
+        return process_cover(book_id, source)
+    except Exception:
+        logger.exception("Nie udało się wygenerować wersji okładki książki %s (%s).", book_id, source)
+        raise
+    finally:
+        connections.close_all()
+
+
+def schedule_renditions(book_id, source):
+    # COVER_RENDITION_WORKERS = 0 processes the cover synchronously.
+    if not settings.COVER_RENDITION_WORKERS:
+        return process_cover(book_id, source)
+    return _executor_instance().submit(_run_in_worker, book_id, source)
@@ -0,0 +1,72 @@
+import csv
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import StreamingHttpResponse
+
+# Flat record layout shared by the export endpoint and import_catalog: the
+# author is identified by full name and categories by name, so a file can be
+# loaded into another database.
+CATALOG_FIELDS = [
+    'id', 'title', 'author_first_name', 'author_last_name', 'categories', 'description', 'price',
+    'publication_date', 'book_format', 'isbn', 'number_of_pages', 'language', 'publisher',
+]
+DETAILS_FIELDS = ['isbn', 'number_of_pages', 'language', 'publisher']
+CATEGORY_SEPARATOR = '|'
+EXPORT_CHUNK_SIZE = 2000
+
+
+def catalog_record(book):
+    details = getattr(book, 'details', None)
+    return {
+        'id': book.pk,
+        'title': book.title,
+        'author_first_name': book.author.first_name,
+        'author_last_name': book.author.last_name,
+        'categories': [category.name for category in book.categories.all()],
+        'description': book.description,
+        'price': book.price,
+        'publication_date': book.publication_date,
+        'book_format': book.book_format,
+        **{field: getattr(details, field, None) for field in DETAILS_FIELDS},
+    }
+
+
+def export_queryset(queryset):
+    # iterator() keeps memory flat; with chunk_size the prefetch runs once
+    # per chunk instead of being disabled.
+    return queryset.select_related('author', 'details').prefetch_related('categories').iterator(
+        chunk_size=EXPORT_CHUNK_SIZE
+    )
+
+
+class _Echo:
+    def write(self, value):
+        return value
+
+
+def _csv_rows(books):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(CATALOG_FIELDS)
+    for book in books:
+        record = catalog_record(book)
+        record['categories'] = CATEGORY_SEPARATOR.join(record['categories'])
+        yield writer.writerow(['' if record[field] is None else record[field] for field in CATALOG_FIELDS])
+
+
+def _ndjson_rows(books):
+    for book in books:
+        yield json.dumps(catalog_record(book), cls=DjangoJSONEncoder, ensure_ascii=False) + '\n'
+
+
+EXPORT_FORMATS = {
+    'csv': (_csv_rows, 'text/csv; charset=utf-8'),
+    'ndjson': (_ndjson_rows, 'application/x-ndjson; charset=utf-8'),
+}
+
+
+def streaming_export(queryset, export_format, filename='books'):
+    rows, content_type = EXPORT_FORMATS[export_format]
+    response = StreamingHttpResponse(rows(export_queryset(queryset)), content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename="{filename}.{export_format}"'
+    return response
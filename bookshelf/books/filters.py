@@ -0,0 +1,39 @@
+import django_filters
+
+from .models import Book
+
+
+class BookFilterSet(django_filters.FilterSet):
+    # Month and day read the stored, indexed columns instead of extracting
+    # the part from every row; __year already compiles to a date range that
+    # also serves the default ordering.
+    publication_date__month = django_filters.NumberFilter(field_name='publication_month')
+    publication_date__day = django_filters.NumberFilter(field_name='publication_day')
+    published = django_filters.BooleanFilter(field_name='is_published')
+
+    class Meta:
+        model = Book
+        fields = {
+            'author': ['exact'],
+            'categories': ['exact'],
+            'publication_date': ['year', 'gte', 'lte'],
+            'price': ['exact', 'gt', 'lt', 'gte', 'lte'],
+        }
+
+
+class BookNodeFilterSet(django_filters.FilterSet):
+    # Filter arguments of the GraphQL book connections.
+    published = django_filters.BooleanFilter(field_name='is_published')
+
+    class Meta:
+        model = Book
+        fields = {
+            'title': ['exact', 'icontains', 'istartswith'],
+            'price': ['exact', 'gt', 'lt', 'gte', 'lte'],
+            'publication_date': ['exact', 'year', 'year__gt', 'year__lt'],
+            'author__last_name': ['exact', 'icontains'],
+            'categories__name': ['exact', 'icontains'],
+            'book_format': ['exact'],
+            'details__isbn': ['exact', 'icontains'],
+            'details__language': ['exact', 'icontains'],
+        }
@@ -0,0 +1,215 @@
+import csv
+import json
+import time
+from itertools import islice
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+
+from .export import CATEGORY_SEPARATOR, DETAILS_FIELDS
+from .models import Author, Book, BookDetails, Category
+from .signals import books_bulk_changed
+from .statistics import deferred_statistics
+
+BOOK_UPDATE_FIELDS = ['description', 'price', 'publication_date', 'book_format']
+IMPORT_FORMATS = ('csv', 'ndjson')
+
+
+def read_records(stream, import_format):
+    if import_format == 'csv':
+        yield from csv.DictReader(stream)
+        return
+    for line in stream:
+        if line.strip():
+            # A malformed line is yielded as None and counted as skipped.
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                yield None
+
+
+def _text(value):
+    return '' if value is None else str(value).strip()
+
+
+def _clean(model, field, value):
+    return model._meta.get_field(field).clean(value, None)
+
+
+def parse_record(record):
+    # Returns a normalized record or None when a value is missing or not
+    # valid for its model field.
+    if not isinstance(record, dict):
+        return None
+    categories = record.get('categories') or []
+    if isinstance(categories, str):
+        categories = categories.split(CATEGORY_SEPARATOR)
+    details = {field: record.get(field) or None for field in DETAILS_FIELDS}
+    for field in ('language', 'publisher'):
+        details[field] = details[field] or ''
+    try:
+        author = (
+            _clean(Author, 'first_name', _text(record.get('author_first_name'))),
+            _clean(Author, 'last_name', _text(record.get('author_last_name'))),
+        )
+        parsed = {
+            'title': _clean(Book, 'title', _text(record.get('title'))),
+            'author': author,
+            'categories': [_clean(Category, 'name', name) for name in (_text(name) for name in categories) if name],
+            'description': _clean(Book, 'description', _text(record.get('description'))),
+            'price': _clean(Book, 'price', _text(record.get('price'))),
+            'publication_date': _clean(Book, 'publication_date', _text(record.get('publication_date'))),
+            'book_format': _clean(
+                Book, 'book_format',
+                _text(record.get('book_format')) or Book._meta.get_field('book_format').get_default()
+            ),
+        }
+        details = {field: _clean(BookDetails, field, value) for field, value in details.items()}
+    except ValidationError:
+        return None
+    parsed['details'] = details if any(details.values()) else None
+    return parsed
+
+
+class CatalogImporter:
+    """
+    Loads flat catalog records (see books.export.CATALOG_FIELDS) in batches.
+    Authors (by first and last name, the unique_author_full_name key) and
+    categories (by name) are deduplicated through in-memory maps, so each
+    batch costs a fixed number of queries regardless of its size. Existing
+    books (same title and author) are skipped, or updated with update=True.
+    """
+
+    def __init__(self, batch_size=1000, update=False):
+        self.batch_size = batch_size
+        self.update = update
+        self.authors = {}
+        self.categories = {}
+        self.rows = 0
+        self.skipped = 0
+        self.authors_created = 0
+        self.categories_created = 0
+
+    def run(self, records, progress=None):
+        started = time.perf_counter()
+        books_before = Book.objects.count()
+        records = iter(records)
+        try:
+            with deferred_statistics():
+                while True:
+                    batch = list(islice(records, self.batch_size))
+                    if not batch:
+                        break
+                    parsed = [parse_record(record) for record in batch]
+                    self.skipped += parsed.count(None)
+                    with transaction.atomic():
+                        self.import_batch([record for record in parsed if record is not None])
+                    self.rows += len(batch)
+                    if progress is not None:
+                        progress(self.rows, self.rows / (time.perf_counter() - started))
+        finally:
+            # Also after a failure: the batches committed until then have
+            # changed the catalog. Every author may have been touched, so all
+            # statistics are rebuilt.
+            books_bulk_changed.send(sender=Book, author_ids=None)
+        elapsed = time.perf_counter() - started
+        return {
+            'rows': self.rows,
+            'skipped': self.skipped,
+            'books_created': Book.objects.count() - books_before,
+            'authors_created': self.authors_created,
+            'categories_created': self.categories_created,
+            'seconds': elapsed,
+            'rows_per_second': self.rows / elapsed if elapsed else None,
+        }
+
+    def resolve_authors(self, names):
+        missing = set(names) - self.authors.keys()
+        if not missing:
+            return
+        existing = Author.objects.filter(
+            first_name__in={first for first, _ in missing}, last_name__in={last for _, last in missing}
+        ).values_list('first_name', 'last_name', 'pk')
+        self.authors.update({(first, last): pk for first, last, pk in existing})
+        new = [Author(first_name=first, last_name=last) for first, last in missing - self.authors.keys()]
+        if not new:
+            return
+        Author.objects.bulk_create(new, ignore_conflicts=True)
+        self.authors_created += len(new)
+        created = Author.objects.filter(
+            first_name__in={author.first_name for author in new}, last_name__in={author.last_name for author in new}
+        ).values_list('first_name', 'last_name', 'pk')
+        self.authors.update({(first, last): pk for first, last, pk in created})
+
+    def resolve_categories(self, names):
+        missing = set(names) - self.categories.keys()
+        if not missing:
+            return
+        self.categories.update(Category.objects.filter(name__in=missing).values_list('name', 'pk'))
+        new = [Category(name=name) for name in missing - self.categories.keys()]
+        if not new:
+            return
+        Category.objects.bulk_create(new, ignore_conflicts=True)
+        self.categories_created += len(new)
+        self.categories.update(Category.objects.filter(name__in=[category.name for category in new]).values_list(
+            'name', 'pk'
+        ))
+
+    def import_batch(self, records):
+        # The last occurrence of a book within a batch wins.
+        records = list({(record['title'], record['author']): record for record in records}.values())
+        if not records:
+            return
+        self.resolve_authors(record['author'] for record in records)
+        self.resolve_categories(name for record in records for name in record['categories'])
+
+        books = [
+            Book(
+                title=record['title'],
+                author_id=self.authors[record['author']],
+                **{field: record[field] for field in BOOK_UPDATE_FIELDS}
+            )
+            for record in records
+        ]
+        if self.update:
+            Book.objects.bulk_create(
+                books, update_conflicts=True, unique_fields=['title', 'author'], update_fields=BOOK_UPDATE_FIELDS
+            )
+        else:
+            Book.objects.bulk_create(books, ignore_conflicts=True)
+
+        # Conflicting rows get no primary key back, so they are looked up.
+        # Filtering on the title alone lets SQLite use the unique (title,
+        # author) index instead of scanning every book of the batch's authors.
+        book_ids = {
+            (title, author_id): pk for title, author_id, pk in Book.objects.filter(
+                title__in={book.title for book in books}
+            ).values_list('title', 'author_id', 'pk')
+        }
+        keyed = [(book_ids[(book.title, book.author_id)], record) for book, record in zip(books, records)]
+
+        through = Book.categories.through
+        if self.update:
+            through.objects.filter(book_id__in=[pk for pk, _ in keyed]).delete()
+        through.objects.bulk_create([
+            through(book_id=pk, category_id=self.categories[name])
+            for pk, record in keyed
+            for name in dict.fromkeys(record['categories'])
+        ], ignore_conflicts=True)
+
+        details = [(pk, record['details']) for pk, record in keyed if record['details']]
+        isbns = {data['isbn'] for _, data in details if data['isbn']}
+        # An ISBN already used by another book is dropped instead of failing
+        # the whole batch on the unique constraint.
+        taken = dict(BookDetails.objects.filter(isbn__in=isbns).values_list('isbn', 'book_id')) if isbns else {}
+        rows = []
+        for pk, data in details:
+            if data['isbn'] and taken.setdefault(data['isbn'], pk) != pk:
+                data = {**data, 'isbn': None}
+            rows.append(BookDetails(book_id=pk, **data))
+        if self.update:
+            BookDetails.objects.bulk_create(
+                rows, update_conflicts=True, unique_fields=['book'], update_fields=DETAILS_FIELDS
+            )
+        else:
+            BookDetails.objects.bulk_create(rows, ignore_conflicts=True)
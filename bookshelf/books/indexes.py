@@ -0,0 +1,28 @@
+# Indexes Django cannot declare portably in Meta.indexes. title__istartswith
+# compiles to "title LIKE 'x%'" on SQLite, which only uses an index with the
+# NOCASE collation, and to "UPPER(title::text) LIKE UPPER('x%')" on
+# PostgreSQL, which needs a pattern_ops expression index.
+#
+# SQLite drops these together with the table, so a migration that makes
+# Django remake books_book has to recreate them from its own copy of this SQL
+# (like the FTS triggers of books.search).
+TITLE_PREFIX_INDEX = 'book_title_prefix_idx'
+
+VENDOR_INDEX_SQL = {
+    'sqlite': [
+        f'CREATE INDEX IF NOT EXISTS {TITLE_PREFIX_INDEX} ON books_book (title COLLATE NOCASE)',
+    ],
+    'postgresql': [
+        f'CREATE INDEX IF NOT EXISTS {TITLE_PREFIX_INDEX} ON books_book (UPPER(title::text) text_pattern_ops)',
+    ],
+}
+
+
+def install_vendor_indexes(schema_editor):
+    for statement in VENDOR_INDEX_SQL.get(schema_editor.connection.vendor, []):
+        schema_editor.execute(statement)
+
+
+def drop_vendor_indexes(schema_editor):
+    if schema_editor.connection.vendor in VENDOR_INDEX_SQL:
+        schema_editor.execute(f'DROP INDEX IF EXISTS {TITLE_PREFIX_INDEX}')
@@ -0,0 +1,150 @@
+import json
+import subprocess
+from itertools import count
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.test import Client
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from books.benchmarks import benchmark_database, measure, seed_catalog
+from books.models import Author, Book, Category
+
+DEFAULT_SIZES = [1_000, 100_000, 1_000_000]
+BULK_BATCH = 100
+
+ALL_BOOKS_QUERY = """
+    query {
+      allBooks(first: 50) {
+        edges { node {
+          title price
+          author { firstName lastName }
+          categories { edges { node { name } } }
+          details { isbn publisher }
+        } }
+      }
+    }
+"""
+ALL_AUTHORS_QUERY = """
+    query {
+      allAuthors(first: 20) {
+        edges { node {
+          firstName lastName
+          books(first: 10) { edges { node { title categories { edges { node { name } } } } } }
+        } }
+      }
+    }
+"""
+
+
+def _git_revision():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Command(BaseCommand):
+    help = (
+        "Mierzy p50/p99 i przepustowość głównych ścieżek REST i GraphQL (lista, filtry, wyszukiwanie, "
+        "sortowanie, statystyki, tworzenie zbiorcze, zagnieżdżone zapytania) dla kolejnych rozmiarów "
+        "katalogu, na tymczasowej bazie testowej."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--books', type=int, action='append', dest='sizes',
+            help="Rozmiar katalogu; można podać wielokrotnie (domyślnie 1000, 100000 i 1000000)."
+        )
+        parser.add_argument('--iterations', type=int, default=20)
+        parser.add_argument('--scenario', action='append', dest='scenarios', help="Uruchom tylko wskazane scenariusze.")
+        parser.add_argument('--output', help="Ścieżka pliku JSON z wynikami.")
+
+    def scenarios(self, client, token, admin_client):
+        author = Author.objects.order_by('pk').values_list('pk', flat=True)[0]
+        book = Book.objects.order_by('pk').values_list('pk', flat=True)[0]
+        categories = list(Category.objects.order_by('pk').values_list('pk', flat=True)[:2])
+        titles = count()
+
+        def get(path, params=None):
+            # Every request is measured against the database, not the response cache.
+            cache.clear()
+            response = client.get(path, params or {})
+            assert response.status_code == 200, response.content
+
+        def graphql(query):
+            response = client.post('/graphql/', {'query': query}, content_type='application/json')
+            assert response.status_code == 200 and 'errors' not in response.json(), response.content
+
+        def bulk_create():
+            payload = [
+                {
+                    "title": f"Benchmark {next(titles)}", "author": author, "categories": categories,
+                    "price": "19.99", "publication_date": "2020-01-01",
+                }
+                for _ in range(BULK_BATCH)
+            ]
+            response = client.post(
+                '/api/books/bulk/', payload, content_type='application/json', HTTP_AUTHORIZATION=f'Bearer {token}'
+            )
+            assert response.status_code == 201, response.content
+
+        def admin(params=None):
+            response = admin_client.get('/admin/books/book/', params or {})
+            assert response.status_code == 200, response.content
+
+        def cached_list():
+            response = client.get('/api/books/')
+            assert response.status_code == 200, response.content
+
+        return {
+            'list': lambda: get('/api/books/'),
+            'list_cached': cached_list,
+            'list_page_1000': lambda: get('/api/books/', {'page_size': 1000}),
+            'retrieve': lambda: get(f'/api/books/{book}/'),
+            'filter_author': lambda: get('/api/books/', {'author': author}),
+            'filter_year': lambda: get('/api/books/', {'publication_date__year': 1900}),
+            'filter_month': lambda: get('/api/books/', {'publication_date__month': 5}),
+            'filter_day': lambda: get('/api/books/', {'publication_date__day': 15}),
+            'filter_price': lambda: get('/api/books/', {'price__gte': '50', 'price__lte': '60'}),
+            'filter_price_count': lambda: get('/api/books/', {'price__gte': '50', 'price__lte': '60', 'count': 'true'}),
+            'search': lambda: get('/api/books/', {'search': 'wiatr'}),
+            'ordering_price': lambda: get('/api/books/', {'ordering': '-price'}),
+            'ordering_author': lambda: get('/api/books/', {'ordering': 'author__last_name'}),
+            'statistics': lambda: get('/api/books/statistics/'),
+            'bulk_create': bulk_create,
+            'admin_date_hierarchy': lambda: admin(),
+            'admin_date_hierarchy_year': lambda: admin({'publication_date__year': 1900}),
+            'graphql_all_books': lambda: graphql(ALL_BOOKS_QUERY),
+            'graphql_all_authors': lambda: graphql(ALL_AUTHORS_QUERY),
+        }
+
+    def handle(self, *args, **options):
+        results = []
+        for size in options['sizes'] or DEFAULT_SIZES:
+            # A fresh database per size, so writes of one run never leak into the next.
+            with benchmark_database():
+                self.stdout.write(f"Generowanie {size} książek...")
+                seed_catalog(size)
+                user = User.objects.create_user('benchmark', password='benchmark')
+                admin_client = Client()
+                admin_client.force_login(User.objects.create_superuser('benchmark-admin', password='benchmark'))
+                scenarios = self.scenarios(Client(), RefreshToken.for_user(user).access_token, admin_client)
+                for name, run in scenarios.items():
+                    if options['scenarios'] and name not in options['scenarios']:
+                        continue
+                    timings = measure(run, iterations=options['iterations'])
+                    if name == 'bulk_create':
+                        timings['rows_per_sec'] = timings['ops_per_sec'] * BULK_BATCH
+                    results.append({'books': size, 'scenario': name, **timings})
+                    self.stdout.write(
+                        f"{size:>9} {name:>20}  p50 {timings['p50_ms']:8.2f} ms  p99 {timings['p99_ms']:8.2f} ms  "
+                        f"{timings['ops_per_sec']:8.1f} req/s"
+                    )
+
+        if options['output']:
+            with open(options['output'], 'w') as output:
+                json.dump({'revision': _git_revision(), 'results': results}, output, indent=2)
@@ -0,0 +1,75 @@
+import json
+
+from django.core.management.base import BaseCommand
+from django.test import Client
+from graphql_relay import to_global_id
+
+from books.benchmarks import benchmark_database, measure, seed_catalog
+from books.models import Author
+from bookshelf.documents import document_cache, query_hash
+
+# The read examples from the docstring at the end of bookshelf/schema.py.
+EXAMPLE_QUERIES = {
+    'allAuthors': """
+        query {
+          allAuthors {
+            edges { node { id firstName lastName books { edges { node { id title } } } } }
+            pageInfo { hasNextPage hasPreviousPage startCursor endCursor }
+          }
+        }
+    """,
+    'author': """
+        query($id: ID!) {
+          author(id: $id) { id firstName lastName books { edges { node { title } } } }
+        }
+    """,
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Mierzy opóźnienie przykładowych zapytań GraphQL ze schematu: bez pamięci podręcznej "
+        "dokumentów, z pamięcią podręczną oraz jako zapytania utrwalone (na tymczasowej bazie testowej)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--books', type=int, default=10_000)
+        parser.add_argument('--iterations', type=int, default=50)
+        parser.add_argument('--output', help="Ścieżka pliku JSON z wynikami.")
+
+    def handle(self, *args, **options):
+        results = []
+        with benchmark_database():
+            self.stdout.write(f"Generowanie {options['books']} książek...")
+            seed_catalog(options['books'])
+            client = Client()
+            variables = {'id': to_global_id('AuthorType', Author.objects.order_by('pk').values_list('pk', flat=True)[0])}
+
+            def post(body):
+                response = client.post('/graphql/', body, content_type='application/json')
+                assert response.status_code == 200, response.content
+
+            for name, query in EXAMPLE_QUERIES.items():
+                persisted = {'persistedQuery': {'version': 1, 'sha256Hash': query_hash(query)}}
+                post({'query': query, 'variables': variables, 'extensions': persisted})
+
+                def uncached():
+                    document_cache.clear()
+                    post({'query': query, 'variables': variables})
+
+                modes = {
+                    'uncached': uncached,
+                    'cached': lambda: post({'query': query, 'variables': variables}),
+                    'persisted': lambda: post({'variables': variables, 'extensions': persisted}),
+                }
+                for mode, run in modes.items():
+                    timings = measure(run, iterations=options['iterations'])
+                    results.append({'query': name, 'mode': mode, **timings})
+                    self.stdout.write(
+                        f"{name:>12} {mode:>10}  p50 {timings['p50_ms']:8.2f} ms  p99 {timings['p99_ms']:8.2f} ms"
+                    )
+            self.stdout.write(f"Pamięć podręczna dokumentów: {document_cache.info()}")
+
+        if options['output']:
+            with open(options['output'], 'w') as output:
+                json.dump({'books': options['books'], 'results': results}, output, indent=2)
@@ -0,0 +1,51 @@
+import json
+
+from django.core.management.base import BaseCommand
+from django.test import Client, override_settings
+
+from books.benchmarks import benchmark_database, measure, seed_catalog
+
+DEFAULT_QUERIES = ['wiatr', 'morze noc', 'kalomi', 'kalo', 'tajemnica rasite']
+NO_CACHE = {'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}}
+
+
+class Command(BaseCommand):
+    help = (
+        "Porównuje opóźnienie ?search= na /api/books/ dla indeksu pełnotekstowego "
+        "i dotychczasowego filtra icontains (na tymczasowej bazie testowej)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--books', type=int, default=100_000)
+        parser.add_argument('--iterations', type=int, default=20)
+        parser.add_argument('--query', action='append', dest='queries')
+        parser.add_argument('--output', help="Ścieżka pliku JSON z wynikami.")
+
+    def handle(self, *args, **options):
+        queries = options['queries'] or DEFAULT_QUERIES
+        results = []
+        # The response cache is off; its key does not depend on the backend.
+        with benchmark_database(), override_settings(CACHES=NO_CACHE):
+            self.stdout.write(f"Generowanie {options['books']} książek...")
+            seed_catalog(options['books'])
+            client = Client()
+            backends = {
+                'icontains': 'books.search.LikeSearchBackend',
+                'fulltext': None,
+            }
+            for query in queries:
+                for label, backend in backends.items():
+                    with override_settings(BOOKS_SEARCH_BACKEND=backend):
+                        timings = measure(
+                            lambda: client.get('/api/books/', {'search': query}),
+                            iterations=options['iterations']
+                        )
+                    results.append({'query': query, 'backend': label, **timings})
+                    self.stdout.write(
+                        f"{query!r:>20} {label:>10}  p50 {timings['p50_ms']:8.2f} ms  "
+                        f"p99 {timings['p99_ms']:8.2f} ms"
+                    )
+
+        if options['output']:
+            with open(options['output'], 'w') as output:
+                json.dump({'books': options['books'], 'results': results}, output, indent=2)
@@ -0,0 +1,104 @@
+import os
+import posixpath
+
+from django.core.files import File
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, Sum
+
+from books.cache import bump_version
+from books.covers import collect_cover, release_renditions
+from books.models import Book, CoverBlob
+from books.storage import cover_storage
+
+
+class Command(BaseCommand):
+    help = (
+        "Przelicza liczniki odwołań do plików okładek, usuwa pliki nieużywane przez żadną książkę "
+        "i opcjonalnie przenosi starsze okładki do magazynu adresowanego treścią."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--legacy', action='store_true',
+            help="Zapisuje okładki sprzed deduplikacji pod skrótem treści i usuwa ich dotychczasowe pliki."
+        )
+
+    def handle(self, *args, **options):
+        if options['legacy']:
+            self.convert_legacy_covers()
+        recounted = self.recount()
+        collected = sum(collect_cover(name) for name in CoverBlob.objects.filter(ref_count=0).values_list(
+            'name', flat=True
+        ))
+        collected += self.delete_untracked_files()
+        blobs = CoverBlob.objects.aggregate(count=Count('name'), size=Sum('size'))
+        self.stdout.write(self.style.SUCCESS(
+            f"Poprawiono {recounted} liczników, usunięto {collected} nieużywanych plików; "
+            f"w magazynie jest {blobs['count']} plików okładek ({blobs['size'] or 0} bajtów)."
+        ))
+
+    def recount(self):
+        references = {
+            name: count
+            for name, count in Book.objects.exclude(cover_image='').exclude(cover_image__isnull=True).values(
+                'cover_image'
+            ).annotate(count=Count('pk')).values_list('cover_image', 'count')
+            if cover_storage.is_blob_name(name)
+        }
+        fixed = 0
+        with transaction.atomic():
+            for blob in CoverBlob.objects.all():
+                count = references.pop(blob.name, 0)
+                if blob.ref_count != count:
+                    CoverBlob.objects.filter(name=blob.name).update(ref_count=count)
+                    fixed += 1
+            for name, count in references.items():
+                if cover_storage.exists(name):
+                    CoverBlob.objects.create(name=name, size=cover_storage.size(name), ref_count=count)
+                    fixed += 1
+        return fixed
+
+    def delete_untracked_files(self):
+        # Blobs whose upload was stored but never committed (e.g. a failed
+        # save) have no CoverBlob row.
+        upload_to = Book._meta.get_field('cover_image').upload_to.rstrip('/')
+        root = cover_storage.path(upload_to)
+        tracked = set(CoverBlob.objects.values_list('name', flat=True))
+        deleted = 0
+        for directory, _, files in os.walk(root):
+            relative = posixpath.join(upload_to, os.path.relpath(directory, root).replace(os.sep, '/'))
+            for filename in files:
+                name = posixpath.normpath(posixpath.join(relative, filename))
+                if cover_storage.is_blob_name(name) and name not in tracked:
+                    cover_storage.delete(name)
+                    deleted += 1
+        return deleted
+
+    def convert_legacy_covers(self):
+        legacy = [
+            book for book in Book.objects.exclude(cover_image='').exclude(cover_image__isnull=True).only(
+                'pk', 'cover_image', 'cover_renditions'
+            )
+            if not cover_storage.is_blob_name(book.cover_image.name)
+        ]
+        converted = {}
+        for book in legacy:
+            old = book.cover_image.name
+            if old not in converted:
+                if not cover_storage.exists(old):
+                    self.stderr.write(f"Książka {book.pk}: brak pliku {old}.")
+                    continue
+                with cover_storage.open(old, 'rb') as handle:
+                    converted[old] = cover_storage.save(old, File(handle))
+            with transaction.atomic():
+                Book.objects.filter(pk=book.pk).update(cover_image=converted[old], cover_renditions=None)
+                bump_version(Book)
+            release_renditions(book.cover_renditions)
+        for old in converted:
+            cover_storage.delete(old)
+        if converted:
+            self.stdout.write(
+                f"Przeniesiono {len(converted)} plików okładek; uruchom generate_cover_renditions, "
+                f"aby odtworzyć ich wersje."
+            )
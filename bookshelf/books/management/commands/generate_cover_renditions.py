@@ -0,0 +1,54 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.db.models import Q
+
+from books.covers import process_cover, renditions_missing
+from books.models import Book
+
+
+class Command(BaseCommand):
+    help = (
+        "Generuje brakujące wersje okładek (miniatura, karta, pełny rozmiar; WebP i JPEG) "
+        "i usuwa wersje okładek, których już nie ma. Pliki są przetwarzane równolegle."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+        parser.add_argument('--force', action='store_true', help="Generuje ponownie wszystkie wersje.")
+
+    def handle(self, *args, **options):
+        if options['workers'] < 1:
+            raise CommandError("--workers musi być dodatni.")
+        books = Book.objects.filter(
+            (~Q(cover_image='') & Q(cover_image__isnull=False)) | Q(cover_renditions__isnull=False)
+        ).only('pk', 'cover_image', 'cover_renditions').order_by('pk')
+
+        def process(book):
+            try:
+                if not options['force'] and not renditions_missing(book):
+                    return 'current'
+                process_cover(book.pk, book.cover_image.name or None)
+                return 'generated'
+            except Exception as exc:
+                self.stderr.write(f"Książka {book.pk} ({book.cover_image.name}): {exc}")
+                return 'failed'
+
+        def process_in_thread(book):
+            try:
+                return process(book)
+            finally:
+                connections.close_all()
+
+        if options['workers'] == 1:
+            results = [process(book) for book in books.iterator()]
+        else:
+            with ThreadPoolExecutor(max_workers=options['workers']) as pool:
+                results = list(pool.map(process_in_thread, books.iterator()))
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Przetworzono {results.count('generated')} okładek, {results.count('current')} było aktualnych, "
+            f"{results.count('failed')} błędów."
+        ))
@@ -0,0 +1,50 @@
+import os
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from books.importer import IMPORT_FORMATS, CatalogImporter, read_records
+
+
+class Command(BaseCommand):
+    help = (
+        "Importuje katalog (autorzy, kategorie, książki, szczegóły) z pliku CSV lub NDJSON "
+        "w formacie eksportu /api/books/export/, wsadowo przez bulk_create."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="Ścieżka pliku CSV lub NDJSON ('-' oznacza standardowe wejście).")
+        parser.add_argument('--format', choices=IMPORT_FORMATS, dest='import_format',
+                            help="Domyślnie na podstawie rozszerzenia pliku.")
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--update', action='store_true',
+                            help="Aktualizuje istniejące książki (ten sam tytuł i autor) zamiast je pomijać.")
+
+    def handle(self, *args, **options):
+        path = options['path']
+        import_format = options['import_format']
+        if import_format is None:
+            extension = os.path.splitext(path)[1].lower()
+            import_format = 'csv' if extension == '.csv' else 'ndjson' if extension in ('.ndjson', '.jsonl') else None
+        if import_format is None:
+            raise CommandError("Nie można rozpoznać formatu pliku, użyj --format.")
+        if options['batch_size'] < 1:
+            raise CommandError("--batch-size musi być dodatni.")
+
+        def progress(rows, rows_per_second):
+            if options['verbosity'] >= 2 or rows % (options['batch_size'] * 50) == 0:
+                self.stdout.write(f"{rows} wierszy ({rows_per_second:.0f} wierszy/s)")
+
+        importer = CatalogImporter(batch_size=options['batch_size'], update=options['update'])
+        if path == '-':
+            summary = importer.run(read_records(sys.stdin, import_format), progress)
+        else:
+            with open(path, newline='', encoding='utf-8') as stream:
+                summary = importer.run(read_records(stream, import_format), progress)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Zaimportowano {summary['rows']} wierszy w {summary['seconds']:.2f} s "
+            f"({summary['rows_per_second'] or 0:.0f} wierszy/s): {summary['books_created']} nowych książek, "
+            f"{summary['authors_created']} nowych autorów, {summary['categories_created']} nowych kategorii, "
+            f"{summary['skipped']} pominiętych wierszy."
+        ))
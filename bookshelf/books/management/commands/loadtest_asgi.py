@@ -0,0 +1,94 @@
+import asyncio
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.test import AsyncClient, Client, override_settings
+
+from books.benchmarks import benchmark_database, seed_catalog, summarize
+
+DEFAULT_CONCURRENCY = [1, 10, 50, 100]
+NO_CACHE = {'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}}
+
+
+def _wsgi_run(path, requests, concurrency, threads, delay):
+    # A threaded WSGI server: a slow client holds one of its `threads`
+    # worker threads for the whole exchange, and the other clients queue.
+    workers = threading.Semaphore(threads)
+
+    def one(_):
+        started = time.perf_counter()
+        with workers:
+            time.sleep(delay)
+            response = Client().get(path)
+        assert response.status_code == 200, response.content
+        return time.perf_counter() - started
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as clients:
+        samples = list(clients.map(one, range(requests)))
+    return summarize(samples, time.perf_counter() - started)
+
+
+def _asgi_run(path, requests, concurrency, delay):
+    # A single ASGI worker: a slow client is an await, not a thread.
+    async def run():
+        client, slots = AsyncClient(), asyncio.Semaphore(concurrency)
+
+        async def one():
+            async with slots:
+                started = time.perf_counter()
+                await asyncio.sleep(delay)
+                response = await client.get(path)
+                assert response.status_code == 200, response.content
+                return time.perf_counter() - started
+
+        started = time.perf_counter()
+        samples = await asyncio.gather(*(one() for _ in range(requests)))
+        return summarize(samples, time.perf_counter() - started)
+
+    return asyncio.run(run())
+
+
+class Command(BaseCommand):
+    help = (
+        "Porównuje przepustowość i opóźnienia listy książek przy rosnącej liczbie równoczesnych, "
+        "wolnych klientów: WSGI z pulą wątków, widok DRF pod ASGI i asynchroniczny widok "
+        "/api/async/books/ pod ASGI (na tymczasowej bazie testowej, bez pamięci podręcznej odpowiedzi)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--books', type=int, default=10_000)
+        parser.add_argument('--requests', type=int, default=200)
+        parser.add_argument('--concurrency', type=int, action='append', help="Można podać wielokrotnie.")
+        parser.add_argument('--threads', type=int, default=8, help="Liczba wątków serwera WSGI.")
+        parser.add_argument('--client-delay', type=float, default=50, help="Opóźnienie wolnego klienta w ms.")
+        parser.add_argument('--page-size', type=int, default=20)
+        parser.add_argument('--output', help="Ścieżka pliku JSON z wynikami.")
+
+    def handle(self, *args, **options):
+        delay = options['client_delay'] / 1000
+        query = f"?page_size={options['page_size']}"
+        deployments = {
+            'wsgi': lambda n: _wsgi_run('/api/books/' + query, options['requests'], n, options['threads'], delay),
+            'asgi_sync_view': lambda n: _asgi_run('/api/books/' + query, options['requests'], n, delay),
+            'asgi_async_view': lambda n: _asgi_run('/api/async/books/' + query, options['requests'], n, delay),
+        }
+        results = []
+        with benchmark_database(), override_settings(CACHES=NO_CACHE):
+            self.stdout.write(f"Generowanie {options['books']} książek...")
+            seed_catalog(options['books'])
+            for concurrency in options['concurrency'] or DEFAULT_CONCURRENCY:
+                for name, run in deployments.items():
+                    timings = run(concurrency)
+                    results.append({'deployment': name, 'concurrency': concurrency, **timings})
+                    self.stdout.write(
+                        f"{name:>16} x{concurrency:<4} p50 {timings['p50_ms']:8.2f} ms  "
+                        f"p99 {timings['p99_ms']:8.2f} ms  {timings['ops_per_sec']:8.1f} req/s"
+                    )
+
+        if options['output']:
+            with open(options['output'], 'w') as output:
+                json.dump({'books': options['books'], 'results': results}, output, indent=2)
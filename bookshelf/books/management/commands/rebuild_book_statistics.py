@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from books.statistics import rebuild_statistics
+
+
+class Command(BaseCommand):
+    help = "Przelicza od zera zmaterializowane statystyki książek (globalne i per autor)."
+
+    def handle(self, *args, **options):
+        rows = rebuild_statistics()
+        self.stdout.write(self.style.SUCCESS(
+            f"Przeliczono statystyki: {rows[0].book_count} książek, {len(rows) - 1} autorów."
+        ))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from books.publishing import rollover_published
+
+
+class Command(BaseCommand):
+    help = (
+        "Oznacza jako opublikowane książki, których data wydania nadeszła. "
+        "Uruchamiane codziennie, np. z crona tuż po północy."
+    )
+
+    def handle(self, *args, **options):
+        changed = rollover_published()
+        self.stdout.write(self.style.SUCCESS(f"Zmieniono stan publikacji {changed} książek."))
@@ -0,0 +1,21 @@
+# Generated by Django 5.1.15 on 2026-10-17 04:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('books', '0004_bookdetails'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='author',
+            index=models.Index(fields=['last_name', 'first_name'], name='author_ordering_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='book',
+            index=models.Index(fields=['-publication_date', 'title'], name='book_ordering_idx'),
+        ),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 5.1.15 on 2026-10-17 04:07
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Max, Min, Sum
+
+
+def populate_statistics(apps, schema_editor):
+    Book = apps.get_model('books', 'Book')
+    BookStatistics = apps.get_model('books', 'BookStatistics')
+    aggregates = {
+        'book_count': Count('id'),
+        'price_sum': Sum('price'),
+        'min_price': Min('price'),
+        'max_price': Max('price'),
+    }
+    totals = Book.objects.aggregate(**aggregates)
+    rows = [BookStatistics(author=None, **{**totals, 'price_sum': totals['price_sum'] or 0})]
+    rows.extend(
+        BookStatistics(**row)
+        for row in Book.objects.order_by().values('author_id').annotate(**aggregates)
+    )
+    BookStatistics.objects.bulk_create(rows)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('books', '0005_author_author_ordering_idx_book_book_ordering_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BookStatistics',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('book_count', models.PositiveIntegerField(default=0)),
+                ('price_sum', models.DecimalField(decimal_places=2, default=0, max_digits=16)),
+                ('min_price', models.DecimalField(blank=True, decimal_places=2, max_digits=6, null=True)),
+                ('max_price', models.DecimalField(blank=True, decimal_places=2, max_digits=6, null=True)),
+                ('author', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='statistics', to='books.author')),
+            ],
+            options={
+                'verbose_name_plural': 'Book statistics',
+            },
+        ),
+        migrations.RunPython(populate_statistics, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,93 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+import books.models
+
+# The SQL is copied here rather than imported from books.search, so later
+# changes there do not alter this migration.
+FTS_TABLE = 'books_book_fts'
+FTS_TABLE_SQL = """
+    CREATE VIRTUAL TABLE books_book_fts USING fts5(
+        title, description,
+        content='books_book', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+"""
+FTS_TRIGGERS_SQL = [
+    """
+    CREATE TRIGGER IF NOT EXISTS books_book_fts_insert AFTER INSERT ON books_book BEGIN
+        INSERT INTO books_book_fts(rowid, title, description) VALUES (new.id, new.title, new.description);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS books_book_fts_delete AFTER DELETE ON books_book BEGIN
+        INSERT INTO books_book_fts(books_book_fts, rowid, title, description)
+        VALUES ('delete', old.id, old.title, old.description);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS books_book_fts_update AFTER UPDATE OF title, description ON books_book BEGIN
+        INSERT INTO books_book_fts(books_book_fts, rowid, title, description)
+        VALUES ('delete', old.id, old.title, old.description);
+        INSERT INTO books_book_fts(rowid, title, description) VALUES (new.id, new.title, new.description);
+    END
+    """,
+]
+
+POSTGRES_INDEX_NAME = 'book_search_vector_idx'
+
+
+def postgres_index():
+    from django.contrib.postgres.indexes import GinIndex
+    from django.contrib.postgres.search import SearchVector
+    return GinIndex(SearchVector('title', 'description', config='simple'), name=POSTGRES_INDEX_NAME)
+
+
+def install_fts_triggers(schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for statement in FTS_TRIGGERS_SQL:
+        schema_editor.execute(statement)
+    schema_editor.execute("INSERT INTO books_book_fts(books_book_fts) VALUES ('rebuild')")
+
+
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        schema_editor.execute(FTS_TABLE_SQL)
+        install_fts_triggers(schema_editor)
+    elif vendor == 'postgresql':
+        schema_editor.add_index(apps.get_model('books', 'Book'), postgres_index())
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        for suffix in ('update', 'delete', 'insert'):
+            schema_editor.execute(f"DROP TRIGGER IF EXISTS {FTS_TABLE}_{suffix}")
+        schema_editor.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+    elif vendor == 'postgresql':
+        schema_editor.remove_index(apps.get_model('books', 'Book'), postgres_index())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('books', '0006_bookstatistics'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BookSearchIndex',
+            fields=[
+                ('book', models.OneToOneField(db_column='rowid', on_delete=django.db.models.deletion.DO_NOTHING, primary_key=True, related_name='search_index', serialize=False, to='books.book')),
+                ('document', books.models.SearchDocumentField(db_column='books_book_fts')),
+                ('rank', models.FloatField()),
+            ],
+            options={
+                'db_table': 'books_book_fts',
+                'managed': False,
+            },
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
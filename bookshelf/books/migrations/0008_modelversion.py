@@ -0,0 +1,31 @@
+# Generated by Django 5.1.15 on 2026-10-17 04:27
+
+from django.db import migrations, models
+from django.utils import timezone
+
+TRACKED_MODELS = ['books.author', 'books.category', 'books.book', 'books.bookdetails']
+
+
+def create_versions(apps, schema_editor):
+    ModelVersion = apps.get_model('books', 'ModelVersion')
+    now = timezone.now()
+    ModelVersion.objects.bulk_create([ModelVersion(label=label, version=1, updated_at=now) for label in TRACKED_MODELS])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('books', '0007_book_search_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ModelVersion',
+            fields=[
+                ('label', models.CharField(max_length=100, primary_key=True, serialize=False)),
+                ('version', models.PositiveBigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField()),
+            ],
+        ),
+        migrations.RunPython(create_versions, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 5.1.15 on 2026-10-17 04:29
+
+from django.db import migrations, models
+
+# The SQL is copied here rather than imported from books.indexes, so
+# later changes there do not alter this migration.
+VENDOR_INDEX_SQL = {
+    'sqlite': ['CREATE INDEX IF NOT EXISTS book_title_prefix_idx ON books_book (title COLLATE NOCASE)'],
+    'postgresql': [
+        'CREATE INDEX IF NOT EXISTS book_title_prefix_idx ON books_book (UPPER(title::text) text_pattern_ops)'
+    ],
+}
+
+
+def create_title_prefix_index(apps, schema_editor):
+    for statement in VENDOR_INDEX_SQL.get(schema_editor.connection.vendor, []):
+        schema_editor.execute(statement)
+
+
+def drop_title_prefix_index(apps, schema_editor):
+    if schema_editor.connection.vendor in VENDOR_INDEX_SQL:
+        schema_editor.execute('DROP INDEX IF EXISTS book_title_prefix_idx')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('books', '0008_modelversion'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='book',
+            index=models.Index(fields=['price'], name='book_price_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='book',
+            index=models.Index(fields=['book_format', '-publication_date', 'title'], name='book_format_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='bookdetails',
+            index=models.Index(fields=['language'], name='bookdetails_language_idx'),
+        ),
+        migrations.RunPython(create_title_prefix_index, drop_title_prefix_index),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.15 on 2026-10-17 04:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('books', '0009_filter_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='book',
+            name='cover_renditions',
+            field=models.JSONField(blank=True, editable=False, null=True),
+        ),
+    ]
@@ -0,0 +1,84 @@
+# Generated by Django 5.1.15 on 2026-10-17 04:43
+
+import books.storage
+from django.db import migrations, models
+
+# The SQL is copied here rather than imported from books.search and
+# books.indexes, so later changes there do not alter this migration.
+FTS_TRIGGERS_SQL = [
+    """
+    CREATE TRIGGER IF NOT EXISTS books_book_fts_insert AFTER INSERT ON books_book BEGIN
+        INSERT INTO books_book_fts(rowid, title, description) VALUES (new.id, new.title, new.description);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS books_book_fts_delete AFTER DELETE ON books_book BEGIN
+        INSERT INTO books_book_fts(books_book_fts, rowid, title, description)
+        VALUES ('delete', old.id, old.title, old.description);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS books_book_fts_update AFTER UPDATE OF title, description ON books_book BEGIN
+        INSERT INTO books_book_fts(books_book_fts, rowid, title, description)
+        VALUES ('delete', old.id, old.title, old.description);
+        INSERT INTO books_book_fts(rowid, title, description) VALUES (new.id, new.title, new.description);
+    END
+    """,
+]
+
+VENDOR_INDEX_SQL = {
+    'sqlite': ['CREATE INDEX IF NOT EXISTS book_title_prefix_idx ON books_book (title COLLATE NOCASE)'],
+    'postgresql': [
+        'CREATE INDEX IF NOT EXISTS book_title_prefix_idx ON books_book (UPPER(title::text) text_pattern_ops)'
+    ],
+}
+
+
+def install_fts_triggers(schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for statement in FTS_TRIGGERS_SQL:
+        schema_editor.execute(statement)
+    schema_editor.execute("INSERT INTO books_book_fts(books_book_fts) VALUES ('rebuild')")
+
+
+def install_vendor_indexes(schema_editor):
+    for statement in VENDOR_INDEX_SQL.get(schema_editor.connection.vendor, []):
+        schema_editor.execute(statement)
+
+
+def reinstall_book_table_extras(apps, schema_editor):
+    # Altering cover_image makes SQLite remake books_book, which drops the
+    # FTS triggers and the vendor indexes created in 0007 and 0009.
+    install_fts_triggers(schema_editor)
+    install_vendor_indexes(schema_editor)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('books', '0010_book_cover_renditions'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CoverBlob',
+            fields=[
+                ('name', models.CharField(max_length=255, primary_key=True, serialize=False)),
+                ('size', models.PositiveBigIntegerField()),
+                ('ref_count', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.RunPython(migrations.RunPython.noop, reinstall_book_table_extras),
+        migrations.AlterField(
+            model_name='book',
+            name='cover_image',
+            field=models.ImageField(blank=True, null=True, storage=books.storage.get_cover_storage, upload_to='book_covers/'),
+        ),
+        migrations.RunPython(reinstall_book_table_extras, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='book',
+            index=models.Index(fields=['cover_image'], name='book_cover_image_idx'),
+        ),
+    ]
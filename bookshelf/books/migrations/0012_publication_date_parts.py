@@ -0,0 +1,93 @@
+# Generated by Django 5.1.15 on 2026-10-17 04:55
+
+import books.models
+from django.db import migrations, models
+
+# The SQL is copied here rather than imported from books.search and
+# books.indexes, so later changes there do not alter this migration.
+FTS_TRIGGERS_SQL = [
+    """
+    CREATE TRIGGER IF NOT EXISTS books_book_fts_insert AFTER INSERT ON books_book BEGIN
+        INSERT INTO books_book_fts(rowid, title, description) VALUES (new.id, new.title, new.description);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS books_book_fts_delete AFTER DELETE ON books_book BEGIN
+        INSERT INTO books_book_fts(books_book_fts, rowid, title, description)
+        VALUES ('delete', old.id, old.title, old.description);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS books_book_fts_update AFTER UPDATE OF title, description ON books_book BEGIN
+        INSERT INTO books_book_fts(books_book_fts, rowid, title, description)
+        VALUES ('delete', old.id, old.title, old.description);
+        INSERT INTO books_book_fts(rowid, title, description) VALUES (new.id, new.title, new.description);
+    END
+    """,
+]
+
+VENDOR_INDEX_SQL = {
+    'sqlite': ['CREATE INDEX IF NOT EXISTS book_title_prefix_idx ON books_book (title COLLATE NOCASE)'],
+    'postgresql': [
+        'CREATE INDEX IF NOT EXISTS book_title_prefix_idx ON books_book (UPPER(title::text) text_pattern_ops)'
+    ],
+}
+
+
+def install_fts_triggers(schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for statement in FTS_TRIGGERS_SQL:
+        schema_editor.execute(statement)
+    schema_editor.execute("INSERT INTO books_book_fts(books_book_fts) VALUES ('rebuild')")
+
+
+def install_vendor_indexes(schema_editor):
+    for statement in VENDOR_INDEX_SQL.get(schema_editor.connection.vendor, []):
+        schema_editor.execute(statement)
+
+
+def reinstall_book_table_extras(apps, schema_editor):
+    # SQLite cannot add stored generated columns in place: each AddField
+    # remakes books_book, dropping the FTS triggers and the vendor indexes.
+    install_fts_triggers(schema_editor)
+    install_vendor_indexes(schema_editor)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('books', '0011_content_addressed_covers'),
+    ]
+
+    operations = [
+        migrations.RunPython(migrations.RunPython.noop, reinstall_book_table_extras),
+        migrations.AddField(
+            model_name='book',
+            name='publication_day',
+            field=models.GeneratedField(db_persist=True, expression=books.models.StoredDatePart('publication_date', 'day'), output_field=models.PositiveSmallIntegerField()),
+        ),
+        migrations.AddField(
+            model_name='book',
+            name='publication_month',
+            field=models.GeneratedField(db_persist=True, expression=books.models.StoredDatePart('publication_date', 'month'), output_field=models.PositiveSmallIntegerField()),
+        ),
+        migrations.AddField(
+            model_name='book',
+            name='publication_year',
+            field=models.GeneratedField(db_persist=True, expression=books.models.StoredDatePart('publication_date', 'year'), output_field=models.PositiveSmallIntegerField()),
+        ),
+        migrations.RunPython(reinstall_book_table_extras, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='book',
+            index=models.Index(fields=['publication_year', 'publication_month'], name='book_pub_year_month_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='book',
+            index=models.Index(fields=['publication_month', '-publication_date', 'title'], name='book_pub_month_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='book',
+            index=models.Index(fields=['publication_day', '-publication_date', 'title'], name='book_pub_day_idx'),
+        ),
+    ]
@@ -0,0 +1,89 @@
+# Generated by Django 5.1.15 on 2026-10-17 05:15
+
+from django.db import migrations, models
+from django.utils import timezone
+
+# The SQL is copied here rather than imported from books.search and
+# books.indexes, so later changes there do not alter this migration.
+FTS_TRIGGERS_SQL = [
+    """
+    CREATE TRIGGER IF NOT EXISTS books_book_fts_insert AFTER INSERT ON books_book BEGIN
+        INSERT INTO books_book_fts(rowid, title, description) VALUES (new.id, new.title, new.description);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS books_book_fts_delete AFTER DELETE ON books_book BEGIN
+        INSERT INTO books_book_fts(books_book_fts, rowid, title, description)
+        VALUES ('delete', old.id, old.title, old.description);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS books_book_fts_update AFTER UPDATE OF title, description ON books_book BEGIN
+        INSERT INTO books_book_fts(books_book_fts, rowid, title, description)
+        VALUES ('delete', old.id, old.title, old.description);
+        INSERT INTO books_book_fts(rowid, title, description) VALUES (new.id, new.title, new.description);
+    END
+    """,
+]
+
+VENDOR_INDEX_SQL = {
+    'sqlite': ['CREATE INDEX IF NOT EXISTS book_title_prefix_idx ON books_book (title COLLATE NOCASE)'],
+    'postgresql': [
+        'CREATE INDEX IF NOT EXISTS book_title_prefix_idx ON books_book (UPPER(title::text) text_pattern_ops)'
+    ],
+}
+
+
+def install_fts_triggers(schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for statement in FTS_TRIGGERS_SQL:
+        schema_editor.execute(statement)
+    schema_editor.execute("INSERT INTO books_book_fts(books_book_fts) VALUES ('rebuild')")
+
+
+def install_vendor_indexes(schema_editor):
+    for statement in VENDOR_INDEX_SQL.get(schema_editor.connection.vendor, []):
+        schema_editor.execute(statement)
+
+
+def reinstall_book_table_extras(apps, schema_editor):
+    # Adding a NOT NULL column makes SQLite remake books_book, which drops
+    # the FTS triggers and the vendor indexes.
+    install_fts_triggers(schema_editor)
+    install_vendor_indexes(schema_editor)
+
+
+def set_published(apps, schema_editor):
+    Book = apps.get_model('books', 'Book')
+    Book.objects.filter(publication_date__lte=timezone.now().date()).update(is_published=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('books', '0012_publication_date_parts'),
+    ]
+
+    operations = [
+        migrations.RunPython(migrations.RunPython.noop, reinstall_book_table_extras),
+        migrations.AddField(
+            model_name='book',
+            name='is_published',
+            field=models.BooleanField(default=False, editable=False),
+        ),
+        migrations.RunPython(reinstall_book_table_extras, migrations.RunPython.noop),
+        migrations.RunPython(set_published, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='book',
+            index=models.Index(condition=models.Q(('is_published', True)), fields=['-publication_date', 'title'], name='book_published_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='book',
+            index=models.Index(condition=models.Q(('is_published', True)), fields=['price', '-publication_date', 'title'], name='book_published_price_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='book',
+            index=models.Index(condition=models.Q(('is_published', False)), fields=['publication_date'], name='book_unpublished_date_idx'),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.1.15 on 2026-10-17 05:29
+
+from django.db import migrations, models
+
+
+def drop_duplicate_global_rows(apps, schema_editor):
+    # Races between rebuilds and book saves could leave several; the
+    # remaining one is corrected by the next rebuild_book_statistics.
+    BookStatistics = apps.get_model('books', 'BookStatistics')
+    first = BookStatistics.objects.filter(author__isnull=True).order_by('pk').first()
+    if first is not None:
+        BookStatistics.objects.filter(author__isnull=True).exclude(pk=first.pk).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('books', '0013_book_is_published'),
+    ]
+
+    operations = [
+        migrations.RunPython(drop_duplicate_global_rows, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='bookstatistics',
+            constraint=models.UniqueConstraint(models.Value(True), condition=models.Q(('author__isnull', True)), name='bookstatistics_single_global_row'),
+        ),
+    ]
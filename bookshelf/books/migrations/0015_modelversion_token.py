@@ -0,0 +1,19 @@
+# Generated by Django 5.1.15 on 2026-10-17 05:33
+
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('books', '0014_bookstatistics_single_global_row'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='modelversion',
+            name='token',
+            field=models.UUIDField(default=uuid.uuid4, editable=False),
+        ),
+    ]
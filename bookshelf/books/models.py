@@ -1,13 +1,31 @@
+import uuid
+from decimal import Decimal
+
 from django.db import models
+from django.db.models import Case, Min, Q, Value, When
+from django.db.models.functions import Extract
+from django.db.models.lookups import LessThanOrEqual
 from django.utils import timezone
 
+from .storage import get_cover_storage
+
+
+def publication_cutoff():
+    # Books dated up to this day are published.
+    return timezone.now().date()
+
 
 class PublishedBookManager(models.Manager):
+    # Book.is_published is set on every write and flipped for books whose
+    # date has arrived by the daily rollover (books.publishing), so the
+    # filter does not depend on the current date and is served by the
+    # partial indexes on published rows.
+
     def get_queryset(self):
-        return super().get_queryset().filter(publication_date__lte=timezone.now().date())
+        return super().get_queryset().filter(is_published=True)
 
     def affordable(self):
-        return self.get_queryset().filter(price__lt=20.00)
+        return self.get_queryset().filter(price__lt=Decimal('20.00'))
 
 
 class Author(models.Model):
@@ -24,6 +42,9 @@ class Author(models.Model):
         constraints = [
             models.UniqueConstraint(fields=['first_name', 'last_name'], name='unique_author_full_name')
         ]
+        indexes = [
+            models.Index(fields=['last_name', 'first_name'], name='author_ordering_idx')
+        ]
 
 
 class Category(models.Model):
@@ -38,6 +59,86 @@ class Category(models.Model):
         verbose_name_plural = "Categories"
 
 
+class StoredDatePart(models.Func):
+    """
+    Year, month or day of a date, for stored generated columns. Extract()
+    compiles to django_date_extract() on SQLite, a function registered by
+    Django's connection only, which would make the table unwritable from any
+    other client; strftime() is built in and deterministic for dates.
+    """
+
+    output_field = models.PositiveSmallIntegerField()
+    SQLITE_FORMATS = {'year': '%Y', 'month': '%m', 'day': '%d'}
+
+    def __init__(self, expression, lookup_name, **extra):
+        self.lookup_name = lookup_name
+        super().__init__(expression, lookup_name=lookup_name, **extra)
+
+    def as_sql(self, compiler, connection, **extra_context):
+        return compiler.compile(Extract(self.source_expressions[0], self.lookup_name))
+
+    def as_sqlite(self, compiler, connection, **extra_context):
+        sql, params = compiler.compile(self.source_expressions[0])
+        return f"CAST(strftime(%s, {sql}) AS integer)", (self.SQLITE_FORMATS[self.lookup_name], *params)
+
+
+class FirstOfMonth(models.Func):
+    # The first day of the given year and month.
+
+    output_field = models.DateField()
+
+    def as_sql(self, compiler, connection, **extra_context):
+        return super().as_sql(compiler, connection, function='MAKE_DATE', template='%(function)s(%(expressions)s, 1)')
+
+    def as_sqlite(self, compiler, connection, **extra_context):
+        sql, params = super().as_sql(compiler, connection, template='%(expressions)s')
+        return f"date(printf(%s, {sql}))", ('%04d-%02d-01', *params)
+
+
+class BookQuerySet(models.QuerySet):
+    # bulk_create(), bulk_update() and update() skip Book.save(), so they
+    # keep is_published in line with publication_date themselves.
+
+    def bulk_create(self, objs, *args, **kwargs):
+        objs = list(objs)
+        for book in objs:
+            book.set_published()
+        if kwargs.get('update_conflicts') and 'is_published' not in kwargs.get('update_fields', ()):
+            kwargs['update_fields'] = [*kwargs.get('update_fields', ()), 'is_published']
+        return super().bulk_create(objs, *args, **kwargs)
+
+    def bulk_update(self, objs, fields, *args, **kwargs):
+        if 'publication_date' in fields:
+            objs = list(objs)
+            for book in objs:
+                book.set_published()
+            fields = [*fields, 'is_published']
+        return super().bulk_update(objs, fields, *args, **kwargs)
+
+    def update(self, **kwargs):
+        if 'publication_date' in kwargs and 'is_published' not in kwargs:
+            value, cutoff = kwargs['publication_date'], publication_cutoff()
+            if hasattr(value, 'resolve_expression'):
+                kwargs['is_published'] = Case(
+                    When(LessThanOrEqual(value, cutoff), then=Value(True)), default=Value(False)
+                )
+            else:
+                kwargs['is_published'] = self.model._meta.get_field('publication_date').to_python(value) <= cutoff
+        return super().update(**kwargs)
+
+    def dates(self, field_name, kind, order='ASC'):
+        # Year and month buckets of publication_date (the admin date
+        # hierarchy) are grouped on the stored, indexed columns instead of
+        # truncating the date of every row; still a queryset of dates.
+        if field_name != 'publication_date' or kind not in ('year', 'month'):
+            return super().dates(field_name, kind, order)
+        fields = ['publication_year', 'publication_month'] if kind == 'month' else ['publication_year']
+        prefix = '-' if order == 'DESC' else ''
+        return self.order_by(*(prefix + field for field in fields)).values(*fields).annotate(
+            datefield=FirstOfMonth(Min('publication_year'), Min('publication_month') if kind == 'month' else Value(1))
+        ).values_list('datefield', flat=True)
+
+
 class Book(models.Model):
     FORMAT_CHOICES = [
         ('HB', 'Hardback'),
@@ -51,21 +152,106 @@ class Book(models.Model):
     description = models.TextField(blank=True)
     price = models.DecimalField(max_digits=6, decimal_places=2)
     publication_date = models.DateField()
+    # Maintained by the database; month/day filters and date drilldowns use
+    # them instead of extracting the part from every row.
+    publication_year = models.GeneratedField(
+        expression=StoredDatePart('publication_date', 'year'),
+        output_field=models.PositiveSmallIntegerField(),
+        db_persist=True,
+    )
+    publication_month = models.GeneratedField(
+        expression=StoredDatePart('publication_date', 'month'),
+        output_field=models.PositiveSmallIntegerField(),
+        db_persist=True,
+    )
+    publication_day = models.GeneratedField(
+        expression=StoredDatePart('publication_date', 'day'),
+        output_field=models.PositiveSmallIntegerField(),
+        db_persist=True,
+    )
+    # publication_date <= publication_cutoff(); see PublishedBookManager.
+    is_published = models.BooleanField(default=False, editable=False)
     book_format = models.CharField(max_length=2, choices=FORMAT_CHOICES, default='PB')
 
-    cover_image = models.ImageField(upload_to='book_covers/', blank=True, null=True)
+    cover_image = models.ImageField(upload_to='book_covers/', storage=get_cover_storage, blank=True, null=True)
+    # Maintained by books.covers; see renditions_current().
+    cover_renditions = models.JSONField(null=True, blank=True, editable=False)
 
-    objects = models.Manager()
-    published = PublishedBookManager()
+    objects = BookQuerySet.as_manager()
+    published = PublishedBookManager.from_queryset(BookQuerySet)()
 
     def __str__(self):
         return self.title
 
+    def set_published(self):
+        publication_date = self._meta.get_field('publication_date').to_python(self.publication_date)
+        self.is_published = publication_date is not None and publication_date <= publication_cutoff()
+
+    def save(self, *args, **kwargs):
+        self.set_published()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'publication_date' in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'is_published'}
+        super().save(*args, **kwargs)
+
     class Meta:
         ordering = ['-publication_date', 'title']
         constraints = [
             models.UniqueConstraint(fields=['title', 'author'], name='unique_author_title')
         ]
+        indexes = [
+            models.Index(fields=['-publication_date', 'title'], name='book_ordering_idx'),
+            models.Index(fields=['price'], name='book_price_idx'),
+            models.Index(fields=['book_format', '-publication_date', 'title'], name='book_format_idx'),
+            models.Index(fields=['cover_image'], name='book_cover_image_idx'),
+            models.Index(fields=['publication_year', 'publication_month'], name='book_pub_year_month_idx'),
+            models.Index(fields=['publication_month', '-publication_date', 'title'], name='book_pub_month_idx'),
+            models.Index(fields=['publication_day', '-publication_date', 'title'], name='book_pub_day_idx'),
+            models.Index(
+                fields=['-publication_date', 'title'], condition=Q(is_published=True), name='book_published_idx'
+            ),
+            # Covers affordable(): the price range and the default ordering.
+            models.Index(
+                fields=['price', '-publication_date', 'title'], condition=Q(is_published=True),
+                name='book_published_price_idx'
+            ),
+            # Only the future-dated books the rollover looks at.
+            models.Index(
+                fields=['publication_date'], condition=Q(is_published=False), name='book_unpublished_date_idx'
+            ),
+        ]
+
+
+class SearchDocumentField(models.TextField):
+    pass
+
+
+@SearchDocumentField.register_lookup
+class FullTextMatch(models.Lookup):
+    lookup_name = 'match'
+
+    def as_sql(self, compiler, connection):
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        rhs, rhs_params = self.process_rhs(compiler, connection)
+        return f"{lhs} MATCH {rhs}", (*lhs_params, *rhs_params)
+
+
+class BookSearchIndex(models.Model):
+    # Read-only mapping of the SQLite FTS5 table created in migration 0007, so
+    # the search backend can join it and order by its bm25 rank.
+    book = models.OneToOneField(
+        Book,
+        on_delete=models.DO_NOTHING,
+        primary_key=True,
+        db_column='rowid',
+        related_name='search_index'
+    )
+    document = SearchDocumentField(db_column='books_book_fts')
+    rank = models.FloatField()
+
+    class Meta:
+        managed = False
+        db_table = 'books_book_fts'
 
 
 class BookDetails(models.Model):
@@ -85,3 +271,64 @@ class BookDetails(models.Model):
 
     class Meta:
         verbose_name_plural = "Szczegóły książek"
+        indexes = [
+            models.Index(fields=['language'], name='bookdetails_language_idx')
+        ]
+
+
+class BookStatistics(models.Model):
+    author = models.OneToOneField(
+        Author,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='statistics'
+    )
+    book_count = models.PositiveIntegerField(default=0)
+    price_sum = models.DecimalField(max_digits=16, decimal_places=2, default=0)
+    min_price = models.DecimalField(max_digits=6, decimal_places=2, blank=True, null=True)
+    max_price = models.DecimalField(max_digits=6, decimal_places=2, blank=True, null=True)
+
+    def __str__(self):
+        return f"Statystyki: {self.author or 'wszystkie książki'}"
+
+    @property
+    def average_price(self):
+        if not self.book_count:
+            return None
+        return (self.price_sum / self.book_count).quantize(Decimal('0.01'))
+
+    class Meta:
+        verbose_name_plural = "Book statistics"
+        constraints = [
+            # The author OneToOneField does not cover NULL: one global row only.
+            models.UniqueConstraint(
+                Value(True), condition=Q(author__isnull=True), name='bookstatistics_single_global_row'
+            )
+        ]
+
+
+class ModelVersion(models.Model):
+    # One row per tracked model, bumped in the same transaction as every
+    # write to that model's table; drives response caching and ETags.
+    label = models.CharField(max_length=100, primary_key=True)
+    version = models.PositiveBigIntegerField(default=0)
+    # Replaced on every bump: the counter alone repeats after a rolled back
+    # bump or a database reset, and cache keys must not.
+    token = models.UUIDField(default=uuid.uuid4, editable=False)
+    updated_at = models.DateTimeField()
+
+    def __str__(self):
+        return f"{self.label} v{self.version}"
+
+
+class CoverBlob(models.Model):
+    # One row per file in the content-addressed cover storage, with the
+    # number of books using it; see books.covers.
+    name = models.CharField(max_length=255, primary_key=True)
+    size = models.PositiveBigIntegerField()
+    ref_count = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return self.name
@@ -0,0 +1,193 @@
+import base64
+import json
+from functools import reduce
+from operator import or_
+
+from asgiref.sync import sync_to_async
+from django.core.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import CursorPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+from .counts import get_count
+
+
+def _invert(field):
+    return field[1:] if field.startswith('-') else f'-{field}'
+
+
+def _resolve(row, field):
+    name = field.lstrip('-')
+    if isinstance(row, dict):
+        return row[name]
+    value = row
+    for attr in name.split('__'):
+        value = getattr(value, attr)
+    return value
+
+
+class KeysetPagination(CursorPagination):
+    """
+    Cursor pagination over the complete ordering tuple of the queryset.
+
+    Unlike DRF's CursorPagination, which remembers only the first ordering
+    field plus an offset, the cursor stores the value of every ordering field
+    (with the primary key appended as a tie-breaker), so each page is a single
+    index range seek no matter how deep it is.
+
+    The total is not needed to paginate, so it is only computed (through
+    books.counts, possibly estimated) when the client asks for it with
+    ?count=true.
+    """
+    page_size_query_param = 'page_size'
+    max_page_size = 1000
+    count_query_param = 'count'
+    invalid_cursor_message = 'Nieprawidłowy kursor.'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        page_queryset = self.get_page_queryset(queryset, request)
+        if page_queryset is None:
+            return None
+        if self.count_requested(request):
+            self.count = get_count(queryset, estimate=True)
+        return self.set_page(list(page_queryset))
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        page_queryset = self.get_page_queryset(queryset, request)
+        if page_queryset is None:
+            return None
+        if self.count_requested(request):
+            self.count = await sync_to_async(get_count)(queryset, estimate=True)
+        # With a chunk_size, aiterator() runs the prefetch_related lookups
+        # for the fetched rows as well.
+        return self.set_page([row async for row in page_queryset.aiterator(chunk_size=self.page_size + 1)])
+
+    def count_requested(self, request):
+        return request.query_params.get(self.count_query_param, '').lower() in ('1', 'true')
+
+    def get_page_queryset(self, queryset, request):
+        self.request = request
+        self.count = None
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_keyset_ordering(queryset)
+        self.position, self.reverse = self.decode_cursor(request)
+        if self.position is not None:
+            self.position = self.clean_position(queryset, self.position)
+
+        ordering = [_invert(field) for field in self.ordering] if self.reverse else self.ordering
+        queryset = queryset.order_by(*ordering)
+        if self.position is not None:
+            queryset = queryset.filter(self.get_keyset_filter(ordering, self.position))
+        return queryset[:self.page_size + 1]
+
+    def set_page(self, rows):
+        has_more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        if self.reverse:
+            rows.reverse()
+            self.has_next, self.has_previous = self.position is not None, has_more
+        else:
+            self.has_next, self.has_previous = has_more, self.position is not None
+
+        self.page = rows
+        return rows
+
+    def get_paginated_data(self, data):
+        paginated = {'next': self.get_next_link(), 'previous': self.get_previous_link(), 'results': data}
+        if self.count is not None:
+            return {'count': self.count, **paginated}
+        return paginated
+
+    def get_paginated_response(self, data):
+        return Response(self.get_paginated_data(data))
+
+    def get_paginated_response_schema(self, schema):
+        response_schema = super().get_paginated_response_schema(schema)
+        response_schema['properties'] = {
+            'count': {'type': 'integer', 'example': 123},
+            **response_schema['properties'],
+        }
+        return response_schema
+
+    def get_keyset_ordering(self, queryset):
+        ordering = list(queryset.query.order_by) or list(queryset.model._meta.ordering)
+        pk_names = ('pk', queryset.model._meta.pk.name)
+        if not any(field.lstrip('-') in pk_names for field in ordering):
+            ordering.append('pk')
+        return ordering
+
+    def get_ordering_field(self, queryset, name):
+        if name in queryset.query.annotations:
+            return queryset.query.annotations[name].output_field
+        model, *path, last = [queryset.model, *name.split('__')]
+        for part in path:
+            model = model._meta.get_field(part).related_model
+        return model._meta.pk if last == 'pk' else model._meta.get_field(last)
+
+    def clean_position(self, queryset, position):
+        # A cursor is client input: every value has to be valid for its
+        # ordering field, or the keyset filter fails in the database layer.
+        cleaned = []
+        for field, value in zip(self.ordering, position):
+            try:
+                value = self.get_ordering_field(queryset, field.lstrip('-')).to_python(value)
+            except (ValidationError, TypeError, ValueError):
+                raise NotFound(self.invalid_cursor_message)
+            if value is None:
+                raise NotFound(self.invalid_cursor_message)
+            cleaned.append(value)
+        return cleaned
+
+    def get_keyset_filter(self, ordering, position):
+        # (a, b, pk) > (x, y, z) expanded into OR-ed prefixes, because mixed
+        # ASC/DESC columns cannot be compared as a single row value. The extra
+        # bound on the leading column lets the database seek the index.
+        conditions = []
+        for index, field in enumerate(ordering):
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            condition = Q(**{f'{field.lstrip("-")}__{lookup}': position[index]})
+            for previous, value in zip(ordering[:index], position):
+                condition &= Q(**{previous.lstrip('-'): value})
+            conditions.append(condition)
+        first = ordering[0]
+        leading = Q(**{f'{first.lstrip("-")}__{"lte" if first.startswith("-") else "gte"}': position[0]})
+        return leading & reduce(or_, conditions)
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None, False
+        try:
+            cursor = json.loads(base64.urlsafe_b64decode(encoded.encode('ascii')).decode('utf-8'))
+            position, reverse = cursor['p'], bool(cursor.get('r'))
+        except (TypeError, ValueError, KeyError, UnicodeError):
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(position, list) or len(position) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+        return position, reverse
+
+    def encode_cursor(self, row, reverse):
+        cursor = {'p': [_resolve(row, field) for field in self.ordering]}
+        if reverse:
+            cursor['r'] = 1
+        encoded = base64.urlsafe_b64encode(json.dumps(cursor, cls=DjangoJSONEncoder).encode('utf-8'))
+        return replace_query_param(self.base_url, self.cursor_query_param, encoded.decode('ascii'))
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if not self.page:
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        return self.encode_cursor(self.page[0], reverse=True)
@@ -0,0 +1,21 @@
+from django.db import transaction
+
+from .cache import bump_version
+from .models import Book, publication_cutoff
+
+
+def rollover_published(cutoff=None):
+    """
+    Brings Book.is_published in line with the date: publishes books whose
+    publication_date has arrived and, should the clock or the data have
+    moved back, unpublishes future-dated ones. Meant to run daily (manage.py
+    rollover_published) right after midnight; returns the number of books
+    changed.
+    """
+    cutoff = cutoff or publication_cutoff()
+    with transaction.atomic():
+        changed = Book.objects.filter(is_published=False, publication_date__lte=cutoff).update(is_published=True)
+        changed += Book.objects.filter(is_published=True, publication_date__gt=cutoff).update(is_published=False)
+        if changed:
+            bump_version(Book)
+    return changed
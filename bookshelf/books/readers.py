@@ -0,0 +1,164 @@
+import asyncio
+from collections import defaultdict
+
+from rest_framework.generics import get_object_or_404
+from rest_framework.response import Response
+
+from bookshelf.metrics import serializer_timing
+
+from .models import Author, Book, Category
+from .serializers import SERIALIZE_CHUNK_SIZE, BookSerializer
+
+
+class BookReader:
+    """
+    Read-only counterpart of BookSerializer for GET list/retrieve.
+
+    Books are read with .values() (author and details joined) and their
+    categories with one query on the through table for the whole page. Each
+    output field gets an accessor compiled once per reader, mostly the
+    to_representation of the serializer's own field, so the JSON is the same
+    as BookSerializer's down to the key order. A field added to
+    BookSerializer has to be handled in compile_field() as well.
+    """
+
+    serializer_class = BookSerializer
+    columns = (
+        'pk', 'title', 'author_id', 'author__first_name', 'author__last_name', 'description', 'price',
+        'publication_date', 'book_format', 'cover_image', 'cover_renditions', 'details__pk',
+    )
+
+    def __init__(self, context=None):
+        self.context = context or {}
+        self.author_names = {}
+        fields = self.serializer_class(context=self.context).fields
+        self.details_fields = [
+            (name, f'details__{name}', field.to_representation)
+            for name, field in fields['details'].fields.items() if not field.write_only
+        ]
+        self.accessors = [
+            (name, self.compile_field(name, field)) for name, field in fields.items() if not field.write_only
+        ]
+
+    def compile_field(self, name, field):
+        if name == 'author':
+            return lambda row, categories: row['author_id']
+        if name == 'author_name':
+            return self.author_name
+        if name == 'categories':
+            return lambda row, categories: [pk for pk, _ in categories]
+        if name == 'category_names':
+            return lambda row, categories: [name for _, name in categories]
+        if name == 'cover_image':
+            return self.cover_image_accessor()
+        if name == 'details':
+            return self.details
+        key = 'pk' if field.source == 'id' else field.source
+        if key not in self.columns:
+            raise ValueError(f"BookReader nie obsługuje pola {name!r}.")
+        to_representation = field.to_representation
+        return lambda row, categories: None if row[key] is None else to_representation(row[key])
+
+    def author_name(self, row, categories):
+        # Author.__str__ is the source of truth; one instance per author.
+        names = self.author_names
+        author_id = row['author_id']
+        if author_id not in names:
+            names[author_id] = str(Author(first_name=row['author__first_name'], last_name=row['author__last_name']))
+        return names[author_id]
+
+    def cover_image_accessor(self):
+        storage = Book._meta.get_field('cover_image').storage
+        request = self.context.get('request')
+
+        def cover_image(row, categories):
+            if not row['cover_image']:
+                return None
+            url = storage.url(row['cover_image'])
+            return url if request is None else request.build_absolute_uri(url)
+        return cover_image
+
+    def details(self, row, categories):
+        if row['details__pk'] is None:
+            return None
+        return {
+            name: None if row[key] is None else to_representation(row[key])
+            for name, key, to_representation in self.details_fields
+        }
+
+    def values(self, queryset):
+        # The ordering fields stay in the rows for the KeysetPagination cursors.
+        ordering = [
+            field.lstrip('-') for field in (queryset.query.order_by or queryset.model._meta.ordering)
+            if isinstance(field, str)
+        ]
+        details = [key for _, key, _ in self.details_fields]
+        extra = [name for name in dict.fromkeys(ordering) if name not in self.columns and name not in details]
+        return queryset.prefetch_related(None).values(*self.columns, *details, *extra)
+
+    def categories_queryset(self, rows):
+        return Book.categories.through.objects.filter(
+            book_id__in=[row['pk'] for row in rows]
+        ).order_by('category__name').values_list('book_id', 'category_id', 'category__name')
+
+    def group_categories(self, category_rows):
+        grouped, names = defaultdict(list), {}
+        for book_id, category_id, name in category_rows:
+            if category_id not in names:
+                names[category_id] = str(Category(pk=category_id, name=name))
+            grouped[book_id].append((category_id, names[category_id]))
+        return grouped
+
+    def categories(self, rows):
+        return self.group_categories(self.categories_queryset(rows) if rows else ())
+
+    async def acategories(self, rows):
+        return self.group_categories([row async for row in self.categories_queryset(rows)] if rows else ())
+
+    def build(self, rows, categories):
+        with serializer_timing():
+            return [
+                {name: accessor(row, categories.get(row['pk'], ())) for name, accessor in self.accessors}
+                for row in rows
+            ]
+
+    def represent(self, rows):
+        return self.build(rows, self.categories(rows))
+
+    async def arepresent(self, rows):
+        # Like aserialize_many: the event loop gets control back between chunks.
+        categories = await self.acategories(rows)
+        data = []
+        for start in range(0, len(rows), SERIALIZE_CHUNK_SIZE):
+            data.extend(self.build(rows[start:start + SERIALIZE_CHUNK_SIZE], categories))
+            await asyncio.sleep(0)
+        return data
+
+
+class ReaderMixin:
+    # Viewset mixin serving GET list/retrieve through reader_class instead of
+    # model instances and the serializer; writes still use the serializer.
+    # Object permissions are checked against the row dict.
+
+    reader_class = None
+
+    def get_reader(self):
+        return self.reader_class(context=self.get_serializer_context())
+
+    def get_read_queryset(self, reader):
+        return reader.values(self.filter_queryset(self.get_queryset()))
+
+    def list(self, request, *args, **kwargs):
+        reader = self.get_reader()
+        queryset = self.get_read_queryset(reader)
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(reader.represent(page))
+        return Response(reader.represent(list(queryset)))
+
+    def retrieve(self, request, *args, **kwargs):
+        reader = self.get_reader()
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        row = get_object_or_404(self.get_read_queryset(reader), **{self.lookup_field: self.kwargs[lookup_url_kwarg]})
+        self.check_object_permissions(request, row)
+        return Response(reader.represent([row])[0])
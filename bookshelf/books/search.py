@@ -0,0 +1,165 @@
+import re
+from functools import reduce
+from operator import and_, or_
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import F, Q
+from django.utils.module_loading import import_string
+from rest_framework import filters
+
+from .models import BookSearchIndex
+
+SEARCH_FIELDS = ('title', 'description')
+FTS_TABLE = 'books_book_fts'
+
+SQLITE_FTS_TABLE_SQL = f"""
+    CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5(
+        title, description,
+        content='books_book', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+"""
+
+# SQLite drops triggers together with their table, so every migration that
+# makes Django remake books_book has to reinstall them (and the indexes of
+# books.indexes) from its own copy of this SQL; migrations never import it.
+SQLITE_FTS_TRIGGERS_SQL = [
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_insert AFTER INSERT ON books_book BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, title, description) VALUES (new.id, new.title, new.description);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_delete AFTER DELETE ON books_book BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, description)
+        VALUES ('delete', old.id, old.title, old.description);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_update AFTER UPDATE OF title, description ON books_book BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, description)
+        VALUES ('delete', old.id, old.title, old.description);
+        INSERT INTO {FTS_TABLE}(rowid, title, description) VALUES (new.id, new.title, new.description);
+    END
+    """,
+]
+
+
+def install_sqlite_fts_triggers(schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for statement in SQLITE_FTS_TRIGGERS_SQL:
+        schema_editor.execute(statement)
+    schema_editor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+
+
+def _tokens(query):
+    return re.findall(r'\w+', query)
+
+
+class SearchBackend:
+    rank_annotation = 'search_rank'
+
+    def filter(self, queryset, query):
+        raise NotImplementedError
+
+    def search(self, queryset, query):
+        return self.filter(queryset, query)
+
+
+class LikeSearchBackend(SearchBackend):
+    # The original SearchFilter behaviour: every word has to appear
+    # (case-insensitively) in at least one of the fields. No ranking.
+
+    def filter(self, queryset, query):
+        tokens = _tokens(query)
+        if not tokens:
+            return queryset
+        return queryset.filter(reduce(and_, (
+            reduce(or_, (Q(**{f'{field}__icontains': token}) for field in SEARCH_FIELDS))
+            for token in tokens
+        )))
+
+
+class SQLiteFTSSearchBackend(SearchBackend):
+    # Backed by the FTS5 external content table created in migration 0007 and
+    # kept in sync with books_book by triggers.
+
+    def match_expression(self, query):
+        return ' '.join(f'"{token}"*' for token in _tokens(query))
+
+    def filter(self, queryset, query):
+        match = self.match_expression(query)
+        if not match:
+            return queryset
+        return queryset.filter(
+            pk__in=BookSearchIndex.objects.filter(document__match=match).values('book_id')
+        )
+
+    def search(self, queryset, query):
+        match = self.match_expression(query)
+        if not match:
+            return queryset
+        # Joining the FTS table computes each rank once; a correlated
+        # subquery per row re-runs the MATCH and is orders of magnitude
+        # slower. FTS5 rank is bm25 (lower is better), so it is negated to
+        # make every backend order by descending search_rank.
+        return queryset.filter(search_index__document__match=match).annotate(
+            **{self.rank_annotation: -F('search_index__rank')}
+        ).order_by(f'-{self.rank_annotation}')
+
+
+class PostgresSearchBackend(SearchBackend):
+    # Matches the GIN expression index created in migration 0007, so the
+    # vector must stay exactly SearchVector(*SEARCH_FIELDS, config='simple').
+
+    def vector(self):
+        from django.contrib.postgres.search import SearchVector
+        return SearchVector(*SEARCH_FIELDS, config='simple')
+
+    def search_query(self, query):
+        from django.contrib.postgres.search import SearchQuery
+        tokens = _tokens(query)
+        if not tokens:
+            return None
+        return SearchQuery(' & '.join(f'{token}:*' for token in tokens), config='simple', search_type='raw')
+
+    def filter(self, queryset, query):
+        search_query = self.search_query(query)
+        if search_query is None:
+            return queryset
+        return queryset.annotate(search_vector=self.vector()).filter(search_vector=search_query)
+
+    def search(self, queryset, query):
+        from django.contrib.postgres.search import SearchRank
+        search_query = self.search_query(query)
+        if search_query is None:
+            return queryset
+        return self.filter(queryset, query).annotate(
+            **{self.rank_annotation: SearchRank(self.vector(), search_query)}
+        ).order_by(f'-{self.rank_annotation}')
+
+
+VENDOR_BACKENDS = {
+    'sqlite': SQLiteFTSSearchBackend,
+    'postgresql': PostgresSearchBackend,
+}
+
+
+def get_search_backend():
+    backend_path = getattr(settings, 'BOOKS_SEARCH_BACKEND', None)
+    if backend_path:
+        return import_string(backend_path)()
+    return VENDOR_BACKENDS.get(connection.vendor, LikeSearchBackend)()
+
+
+class FullTextSearchFilter(filters.SearchFilter):
+    # Drop-in replacement for SearchFilter on BookViewSet. Matches are ranked by
+    # relevance unless the client asks for an explicit ?ordering=.
+
+    def filter_queryset(self, request, queryset, view):
+        query = ' '.join(self.get_search_terms(request))
+        if not query:
+            return queryset
+        return get_search_backend().search(queryset, query)
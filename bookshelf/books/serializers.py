@@ -1,8 +1,66 @@
+import asyncio
+from functools import lru_cache
+
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Prefetch
 from rest_framework import serializers
+from .covers import rendition_urls
 from .models import Author, Category, Book, BookDetails
 from rest_framework.validators import UniqueTogetherValidator, UniqueValidator
 
 
+@lru_cache(maxsize=None)
+def _relation_plan(serializer_class):
+    model = serializer_class.Meta.model
+    select_related, prefetch_related = [], []
+    for field in serializer_class().fields.values():
+        relation = field.source.split('.')[0]
+        try:
+            model_field = model._meta.get_field(relation)
+        except FieldDoesNotExist:
+            continue
+        if not model_field.is_relation:
+            continue
+        if model_field.many_to_many or model_field.one_to_many:
+            if relation not in prefetch_related:
+                prefetch_related.append(relation)
+        elif isinstance(field, serializers.PrimaryKeyRelatedField):
+            # Served from the local "<name>_id" column, no join needed.
+            continue
+        elif relation not in select_related:
+            select_related.append(relation)
+    return tuple(select_related), tuple(prefetch_related)
+
+
+def prefetch_for_serializer(queryset, serializer_class):
+    select_related, prefetch_related = _relation_plan(serializer_class)
+    if select_related:
+        queryset = queryset.select_related(*select_related)
+    # One Prefetch per relation, shared by every field reading it (e.g. the
+    # "categories" PK list and the "category_names" string list).
+    prefetches = [
+        Prefetch(relation, queryset=queryset.model._meta.get_field(relation).related_model._default_manager.all())
+        for relation in prefetch_related
+    ]
+    if prefetches:
+        queryset = queryset.prefetch_related(*prefetches)
+    return queryset
+
+
+SERIALIZE_CHUNK_SIZE = 100
+
+
+async def aserialize_many(serializer, instances):
+    # The async counterpart of ListSerializer.data for instances loaded by
+    # prefetch_for_serializer: nothing here may query the database, and the
+    # event loop gets control back between chunks of a large page.
+    data = []
+    for start in range(0, len(instances), SERIALIZE_CHUNK_SIZE):
+        data.extend(serializer.to_representation(instance) for instance in instances[start:start + SERIALIZE_CHUNK_SIZE])
+        await asyncio.sleep(0)
+    return data
+
+
 class AuthorSerializer(serializers.ModelSerializer):
     class Meta:
         model = Author
@@ -38,6 +96,21 @@ class BookDetailsSerializer(serializers.ModelSerializer):
         fields = ['isbn', 'number_of_pages', 'language', 'publisher']
 
 
+class CoverRenditionField(serializers.ReadOnlyField):
+    # {"webp": url, "jpeg": url} of one rendition, or None until it exists.
+
+    def __init__(self, rendition, **kwargs):
+        self.rendition = rendition
+        super().__init__(source='cover_renditions', **kwargs)
+
+    def to_representation(self, value):
+        urls = rendition_urls(value, self.rendition)
+        request = self.context.get('request')
+        if urls is None or request is None:
+            return urls
+        return {extension: request.build_absolute_uri(url) for extension, url in urls.items()}
+
+
 class BookSerializer(serializers.ModelSerializer):
     author_name = serializers.CharField(source='author.__str__', read_only=True)
     category_names = serializers.StringRelatedField(source='categories', many=True, read_only=True)
@@ -45,6 +118,9 @@ class BookSerializer(serializers.ModelSerializer):
     author = serializers.PrimaryKeyRelatedField(queryset=Author.objects.all())
     categories = serializers.PrimaryKeyRelatedField(queryset=Category.objects.all(), many=True)
     details = BookDetailsSerializer(required=False, allow_null=True, partial=True)
+    cover_thumbnail = CoverRenditionField('thumbnail')
+    cover_card = CoverRenditionField('card')
+    cover_full = CoverRenditionField('full')
 
     class Meta:
         model = Book
@@ -60,6 +136,9 @@ class BookSerializer(serializers.ModelSerializer):
             'publication_date',
             'book_format',
             'cover_image',
+            'cover_thumbnail',
+            'cover_card',
+            'cover_full',
             'details'
         ]
 
@@ -91,3 +170,36 @@ class BookSerializer(serializers.ModelSerializer):
                 BookDetails.objects.create(book=instance, **details_data)
 
         return instance
+
+
+class BookDetailsBulkSerializer(BookDetailsSerializer):
+    class Meta(BookDetailsSerializer.Meta):
+        extra_kwargs = {'isbn': {'validators': []}}
+
+
+class BookBulkSerializer(BookSerializer):
+    # Field validation only: authors, categories and the unique title/ISBN
+    # constraints are checked for the whole batch at once in books.bulk.
+    author = serializers.IntegerField(source='author_id')
+    categories = serializers.ListField(child=serializers.IntegerField(), source='category_ids')
+    details = BookDetailsBulkSerializer(required=False, allow_null=True)
+
+    class Meta(BookSerializer.Meta):
+        fields = [
+            'title',
+            'author',
+            'categories',
+            'description',
+            'price',
+            'publication_date',
+            'book_format',
+            'details'
+        ]
+        validators = []
+
+
+class BookBulkUpdateSerializer(BookBulkSerializer):
+    id = serializers.IntegerField()
+
+    class Meta(BookBulkSerializer.Meta):
+        fields = ['id'] + BookBulkSerializer.Meta.fields
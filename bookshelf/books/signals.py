@@ -0,0 +1,93 @@
+from functools import partial
+
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_save
+from django.dispatch import Signal, receiver
+
+from .cache import bump_version
+from .covers import release_cover, release_renditions, renditions_current, retain_cover, schedule_renditions
+from .models import Author, Book, BookDetails, Category
+from .statistics import rebuild_statistics, record_book_added, record_book_removed, statistics_deferred
+
+# Sent by bulk writers (books.bulk, import_catalog) after writing books with
+# bulk_create/bulk_update/queryset.update, which skip the model signals.
+# author_ids holds every author whose books were added, changed or removed,
+# or is None when any author may have been affected.
+books_bulk_changed = Signal()
+
+
+@receiver(pre_save, sender=Book)
+def remember_book_state(sender, instance, **kwargs):
+    instance._statistics_state = instance._cover_state = None
+    if instance.pk is not None and not instance._state.adding:
+        previous = Book.objects.filter(pk=instance.pk).values_list('author_id', 'price', 'cover_image').first()
+        if previous is not None:
+            if not statistics_deferred():
+                instance._statistics_state = previous[:2]
+            instance._cover_state = previous[2] or None
+
+
+@receiver(post_save, sender=Book)
+def update_statistics_on_save(sender, instance, **kwargs):
+    previous = getattr(instance, '_statistics_state', None)
+    if previous is not None:
+        if previous == (instance.author_id, instance.price):
+            return
+        record_book_removed(*previous)
+    record_book_added(instance.author_id, instance.price)
+
+
+@receiver(post_delete, sender=Book)
+def update_statistics_on_delete(sender, instance, **kwargs):
+    record_book_removed(instance.author_id, instance.price)
+
+
+@receiver(books_bulk_changed)
+def update_statistics_on_bulk_change(sender, author_ids, **kwargs):
+    rebuild_statistics(author_ids)
+
+
+CACHED_MODELS = (Author, Category, Book, BookDetails)
+
+
+@receiver(post_save)
+@receiver(post_delete)
+def invalidate_cached_responses(sender, **kwargs):
+    if sender in CACHED_MODELS:
+        bump_version(sender)
+
+
+@receiver(m2m_changed, sender=Book.categories.through)
+def invalidate_cached_responses_on_categories_change(sender, action, **kwargs):
+    if action.startswith('post_'):
+        bump_version(Book)
+
+
+@receiver(books_bulk_changed)
+def invalidate_cached_responses_on_bulk_change(sender, **kwargs):
+    # Bulk writers may also create authors, categories and details.
+    for model in CACHED_MODELS:
+        bump_version(model)
+
+
+@receiver(post_save, sender=Book)
+def update_cover_references(sender, instance, raw=False, **kwargs):
+    current = instance.cover_image.name or None
+    if raw or current == instance._cover_state:
+        return
+    release_cover(instance._cover_state)
+    retain_cover(current)
+
+
+@receiver(post_save, sender=Book)
+def schedule_cover_renditions(sender, instance, raw=False, **kwargs):
+    if raw or renditions_current(instance):
+        return
+    transaction.on_commit(partial(schedule_renditions, instance.pk, instance.cover_image.name or None))
+
+
+@receiver(post_delete, sender=Book)
+def release_book_cover(sender, instance, **kwargs):
+    release_cover(instance.cover_image.name or None)
+    if instance.cover_renditions:
+        transaction.on_commit(partial(release_renditions, instance.cover_renditions))
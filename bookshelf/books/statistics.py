@@ -0,0 +1,102 @@
+import threading
+from contextlib import contextmanager
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count, Max, Min, Q, Sum
+
+from .models import Book, BookStatistics
+
+
+_state = threading.local()
+
+
+@contextmanager
+def deferred_statistics():
+    # Bulk writers skip the per-row bookkeeping done by the model signals and
+    # call rebuild_statistics(author_ids) once for everything they touched.
+    previous = getattr(_state, 'deferred', False)
+    _state.deferred = True
+    try:
+        yield
+    finally:
+        _state.deferred = previous
+
+
+def statistics_deferred():
+    return getattr(_state, 'deferred', False)
+
+
+def _scope_filter(author_id):
+    return Q(author__isnull=True) | Q(author_id=author_id)
+
+
+def _books_in_scope(stats):
+    if stats.author_id is None:
+        return Book.objects.all()
+    return Book.objects.filter(author_id=stats.author_id)
+
+
+def record_book_added(author_id, price):
+    if statistics_deferred():
+        return
+    price = Decimal(str(price))
+    with transaction.atomic():
+        for scope in (None, author_id):
+            stats, _ = BookStatistics.objects.select_for_update().get_or_create(author_id=scope)
+            stats.book_count += 1
+            stats.price_sum += price
+            stats.min_price = price if stats.min_price is None else min(stats.min_price, price)
+            stats.max_price = price if stats.max_price is None else max(stats.max_price, price)
+            stats.save()
+
+
+def record_book_removed(author_id, price):
+    if statistics_deferred():
+        return
+    price = Decimal(str(price))
+    with transaction.atomic():
+        # Only existing rows are touched: while an author is being deleted
+        # its statistics row may already be gone and must not be recreated.
+        for stats in BookStatistics.objects.select_for_update().filter(_scope_filter(author_id)):
+            stats.book_count = max(stats.book_count - 1, 0)
+            stats.price_sum -= price
+            if not stats.book_count:
+                stats.price_sum, stats.min_price, stats.max_price = 0, None, None
+            elif price in (stats.min_price, stats.max_price):
+                # A running min/max cannot be decremented, recompute the bound.
+                bounds = _books_in_scope(stats).aggregate(min_price=Min('price'), max_price=Max('price'))
+                stats.min_price, stats.max_price = bounds['min_price'], bounds['max_price']
+            stats.save()
+
+
+PARTIAL_REBUILD_MAX_AUTHORS = 1000
+
+
+def rebuild_statistics(author_ids=None):
+    # Without author_ids every row is rebuilt; otherwise only the global row
+    # and the rows of the given authors. Long id lists are cheaper (and stay
+    # under SQLite's parameter limit) as a full rebuild.
+    if author_ids is not None and len(author_ids) > PARTIAL_REBUILD_MAX_AUTHORS:
+        author_ids = None
+    aggregates = {
+        'book_count': Count('id'),
+        'price_sum': Sum('price'),
+        'min_price': Min('price'),
+        'max_price': Max('price'),
+    }
+    stale = BookStatistics.objects.filter(author__isnull=False)
+    books = Book.objects.all()
+    if author_ids is not None:
+        stale = stale.filter(author_id__in=author_ids)
+        books = books.filter(author_id__in=author_ids)
+    with transaction.atomic():
+        # The global row is updated in place, never deleted: a book saved
+        # concurrently must find it instead of creating a second one.
+        totals = Book.objects.aggregate(**aggregates)
+        totals['price_sum'] = totals['price_sum'] or 0
+        global_row, _ = BookStatistics.objects.select_for_update().update_or_create(author=None, defaults=totals)
+        stale.delete()
+        per_author = books.order_by().values('author_id').annotate(**aggregates)
+        rows = BookStatistics.objects.bulk_create(BookStatistics(**row) for row in per_author)
+    return [global_row, *rows]
@@ -0,0 +1,83 @@
+import hashlib
+import os
+import posixpath
+import re
+import tempfile
+
+from django.core.files.storage import FileSystemStorage
+from PIL import Image
+
+BLOB_NAME = re.compile(r'(^|/)[0-9a-f]{2}/[0-9a-f]{64}(\.[0-9a-z]+)?$')
+IMAGE_EXTENSIONS = {'JPEG': '.jpg', 'PNG': '.png', 'GIF': '.gif', 'WEBP': '.webp'}
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    Stores every file once, under the SHA-256 digest of its content:
+    "<upload_to>/ab/abcdef....jpg". The extension follows the image format
+    of the content, not the uploaded name, so the same bytes always get the
+    same name (files that are not images get none). The upload is hashed
+    while it is copied chunk by chunk into a temporary file next to its
+    destination, which is then renamed into place, or discarded when the
+    blob already exists. Reference counting and deletion of unused blobs
+    are the callers' job (books.covers).
+    """
+
+    def get_available_name(self, name, max_length=None):
+        # The final name is only known once _save() has hashed the content.
+        return name
+
+    def is_blob_name(self, name):
+        return bool(name and BLOB_NAME.search(name))
+
+    def _makedirs(self, directory):
+        if self.directory_permissions_mode is None:
+            os.makedirs(directory, exist_ok=True)
+            return
+        old_umask = os.umask(0o777 & ~self.directory_permissions_mode)
+        try:
+            os.makedirs(directory, self.directory_permissions_mode, exist_ok=True)
+        finally:
+            os.umask(old_umask)
+
+    def content_extension(self, path):
+        try:
+            with Image.open(path) as image:
+                image_format = image.format
+        except (OSError, Image.DecompressionBombError):
+            return ''
+        return IMAGE_EXTENSIONS.get(image_format, f'.{image_format.lower()}')
+
+    def _save(self, name, content):
+        directory = posixpath.dirname(name)
+        self._makedirs(self.path(directory))
+
+        digest = hashlib.sha256()
+        descriptor, temporary = tempfile.mkstemp(dir=self.path(directory), prefix='.upload-')
+        try:
+            with os.fdopen(descriptor, 'wb') as output:
+                for chunk in content.chunks():
+                    digest.update(chunk)
+                    output.write(chunk)
+            hexdigest = digest.hexdigest()
+            extension = self.content_extension(temporary)
+            blob = posixpath.join(directory, hexdigest[:2], f"{hexdigest}{extension}")
+            if os.path.exists(self.path(blob)):
+                os.remove(temporary)
+            else:
+                self._makedirs(os.path.dirname(self.path(blob)))
+                if self.file_permissions_mode is not None:
+                    os.chmod(temporary, self.file_permissions_mode)
+                os.replace(temporary, self.path(blob))
+        except BaseException:
+            if os.path.exists(temporary):
+                os.remove(temporary)
+            raise
+        return blob
+
+
+cover_storage = ContentAddressedStorage()
+
+
+def get_cover_storage():
+    return cover_storage
@@ -1,10 +1,46 @@
 from django.urls import reverse
-from rest_framework import status
+from rest_framework import permissions, status
+from rest_framework.renderers import JSONRenderer
 from rest_framework.test import APITestCase
 from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import IntegrityError, connection, transaction
+from django.test import override_settings, tag
+from unittest import mock, skipUnless
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django.utils.http import http_date, parse_http_date
+from django.db.models import Avg, Count, Max, Min
 from decimal import Decimal
-from .models import Author, Book, Category
+from PIL import Image
+from bookshelf.documents import document_cache, query_hash
+from bookshelf.loaders import Loaders, page_limit
+from bookshelf.metrics import registry as metrics_registry
+from .benchmarks import seed_catalog
+from .cache import bump_version
+from .counts import get_count
+from .importer import CatalogImporter
+from .models import (
+    Author, Book, BookDetails, BookStatistics, Category, CoverBlob, ModelVersion, publication_cutoff
+)
+from .publishing import rollover_published
+from .serializers import BookSerializer
+from .storage import cover_storage
+from .views import BookViewSet
+from .filters import BookFilterSet, BookNodeFilterSet
+from graphql_relay import to_global_id
+import base64
+import csv
 import datetime
+import hashlib
+import os
+import random
+import tempfile
+import json
+from io import BytesIO, StringIO
 
 
 def get_user_credentials():
@@ -13,6 +49,10 @@ def get_user_credentials():
 
 class AuthorAPITests(APITestCase):
 
+    def setUp(self):
+        # Cached responses outlive the rollback of the model versions they are keyed by.
+        cache.clear()
+
     @classmethod
     def setUpTestData(cls):
         cls.author1 = Author.objects.create(first_name="Adam", last_name="Mickiewicz")
@@ -83,6 +123,10 @@ class AuthorAPITests(APITestCase):
 
 class CategoryAPITests(APITestCase):
 
+    def setUp(self):
+        # Cached responses outlive the rollback of the model versions they are keyed by.
+        cache.clear()
+
     @classmethod
     def setUpTestData(cls):
         cls.category1 = Category.objects.create(name="Powieść historyczna", description="Opis powieści historycznej")
@@ -154,6 +198,10 @@ class CategoryAPITests(APITestCase):
 
 class BookAPITests(APITestCase):
 
+    def setUp(self):
+        # Cached responses outlive the rollback of the model versions they are keyed by.
+        cache.clear()
+
     @classmethod
     def setUpTestData(cls):
         cls.author1 = Author.objects.create(first_name="Adam", last_name="Mickiewicz")
@@ -187,7 +235,7 @@ class BookAPITests(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         if isinstance(response.data, dict) and 'results' in response.data:
             self.assertEqual(len(response.data['results']), 3)
-            self.assertEqual(response.data['results'][0]['title'], self.book3.title)
+            self.assertEqual(response.data['results'][0]['title'], self.book2.title)
         else:
             self.assertEqual(len(response.data), 3)
 
@@ -389,4 +437,1179 @@ class BookAPITests(APITestCase):
         self.assertIn('total_books', response.data['aggregate_stats'])
         self.assertEqual(response.data['aggregate_stats']['total_books'], 3)
         self.assertIn('books_per_author', response.data)
-        self.assertTrue(len(response.data['books_per_author']) > 0)
\ No newline at end of file
+        self.assertTrue(len(response.data['books_per_author']) > 0)
+
+    def test_list_books_query_count_is_constant(self):
+        url = reverse('book-list')
+        # model versions (ETag/cache key), books with joins, categories
+        with self.assertNumQueries(3):
+            response = self.client.get(url, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        for i in range(20):
+            book = Book.objects.create(
+                title=f"Tom {i}", author=self.author2 if i % 2 else self.author1,
+                price=Decimal('10.00'), publication_date=datetime.date(2000, 1, 1)
+            )
+            book.categories.add(self.category1, self.category2)
+            BookDetails.objects.create(book=book, isbn=f"978-{i}", language="polski")
+
+        with self.assertNumQueries(3):
+            response = self.client.get(url, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        results = response.data['results'] if isinstance(response.data, dict) else response.data
+        self.assertEqual(len(results), 23)
+        book = next(book for book in results if book['title'] == "Tom 3")
+        self.assertEqual(book['author_name'], str(self.author2))
+        self.assertEqual(book['category_names'], [self.category1.name, self.category2.name])
+        self.assertEqual(book['categories'], [self.category1.id, self.category2.id])
+        self.assertEqual(book['details']['isbn'], "978-3")
+
+    def test_list_books_cursor_pagination(self):
+        for i in range(7):
+            Book.objects.create(
+                title=f"Tom {i}", author=self.author1, price=Decimal('10.00'),
+                publication_date=datetime.date(1834, 6, 28)
+            )
+        expected = list(Book.objects.order_by('-publication_date', 'title', 'pk').values_list('title', flat=True))
+
+        url = reverse('book-list') + '?page_size=3'
+        pages = []
+        while url:
+            response = self.client.get(url, format='json')
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            pages.append(response.data)
+            url = response.data['next']
+        titles = [book['title'] for page in pages for book in page['results']]
+        self.assertEqual(titles, expected)
+        self.assertEqual(len(pages), 4)
+        self.assertIsNone(pages[0]['previous'])
+
+        response = self.client.get(pages[2]['previous'], format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['results'], pages[1]['results'])
+
+    def test_list_books_cursor_pagination_with_ordering(self):
+        url = reverse('book-list') + '?ordering=author__last_name&page_size=1'
+        titles = []
+        while url:
+            response = self.client.get(url, format='json')
+            titles.extend(book['title'] for book in response.data['results'])
+            url = response.data['next']
+        self.assertEqual(titles, [self.book1.title, self.book3.title, self.book2.title])
+
+    def test_list_books_invalid_cursor(self):
+        response = self.client.get(reverse('book-list') + '?cursor=nonsense', format='json')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+        for position in (['abc', 'Tytuł', 1], ['2000-01-01', 'Tytuł', 'x'], ['2000-01-01', None, 1]):
+            cursor = base64.urlsafe_b64encode(json.dumps({'p': position}).encode()).decode()
+            response = self.client.get(reverse('book-list'), {'cursor': cursor})
+            self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        response = self.client.get(reverse('book-list'), {'ordering': '-price', 'cursor': base64.urlsafe_b64encode(
+            json.dumps({'p': ['drogo', 1]}).encode()).decode()})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def assertStatisticsMatchLiveAggregate(self):
+        response = self.client.get(reverse('book-statistics'), format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        live = Book.objects.aggregate(
+            average_price=Avg('price'), total_books=Count('id'), min_price=Min('price'), max_price=Max('price')
+        )
+        stats = response.data['aggregate_stats']
+        self.assertEqual(stats['total_books'], live['total_books'])
+        self.assertEqual(stats['min_price'], live['min_price'])
+        self.assertEqual(stats['max_price'], live['max_price'])
+        if live['average_price'] is None:
+            self.assertIsNone(stats['average_price'])
+        else:
+            self.assertEqual(stats['average_price'].as_tuple().exponent, -2)
+            self.assertAlmostEqual(stats['average_price'], live['average_price'], delta=Decimal('0.01'))
+        live_per_author = Author.objects.annotate(num_books=Count('books')).values('first_name', 'last_name', 'num_books')
+        self.assertCountEqual(response.data['books_per_author'], list(live_per_author))
+
+    def test_statistics_consistent_with_live_aggregate(self):
+        self.assertStatisticsMatchLiveAggregate()
+
+        self.client.force_authenticate(user=self.user)
+        response = self.client.post(reverse('book-list'), {
+            'title': 'Bieguni', 'author': self.author2.id, 'categories': [self.category2.id],
+            'price': '9.99', 'publication_date': '2007-01-01'
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertStatisticsMatchLiveAggregate()
+
+        response = self.client.patch(reverse('book-detail', kwargs={'pk': self.book2.pk}), {'price': '12.00'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertStatisticsMatchLiveAggregate()
+
+        response = self.client.patch(
+            reverse('book-detail', kwargs={'pk': self.book1.pk}), {'author': self.author2.id}, format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertStatisticsMatchLiveAggregate()
+
+        response = self.client.delete(reverse('book-detail', kwargs={'pk': self.book2.pk}))
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertStatisticsMatchLiveAggregate()
+
+        response = self.client.delete(reverse('author-detail', kwargs={'pk': self.author2.pk}))
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertStatisticsMatchLiveAggregate()
+
+        Book.objects.all().delete()
+        self.assertStatisticsMatchLiveAggregate()
+        self.client.force_authenticate(user=None)
+
+    def test_statistics_reads_constant_number_of_rows(self):
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse('book-statistics'), format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_rebuild_statistics_command(self):
+        Book.objects.filter(pk=self.book3.pk).update(price=Decimal('5.00'))
+        call_command('rebuild_book_statistics', stdout=StringIO())
+        self.assertStatisticsMatchLiveAggregate()
+
+        global_row = BookStatistics.objects.get(author__isnull=True)
+        call_command('rebuild_book_statistics', stdout=StringIO())
+        self.assertEqual(BookStatistics.objects.get(author__isnull=True).pk, global_row.pk)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            BookStatistics.objects.create(author=None)
+
+    def bulk_payload(self, count, prefix="Tom"):
+        return [
+            {
+                "title": f"{prefix} {i}", "author": self.author2.pk if i % 2 else self.author1.pk,
+                "categories": [self.category1.pk, self.category2.pk], "price": f"{10 + i}.00",
+                "publication_date": "2020-01-01", "details": {"isbn": f"978-{prefix}-{i}", "language": "polski"},
+            }
+            for i in range(count)
+        ]
+
+    def test_bulk_create_books(self):
+        url = reverse('book-bulk')
+        response = self.client.post(url, self.bulk_payload(2), format='json')
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+        self.client.force_authenticate(user=self.user)
+        with CaptureQueriesContext(connection) as small:
+            response = self.client.post(url, self.bulk_payload(3, "Mały"), format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        with CaptureQueriesContext(connection) as large:
+            response = self.client.post(url, self.bulk_payload(30, "Duży"), format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.client.force_authenticate(user=None)
+
+        self.assertEqual(response.data['created'], 30)
+        self.assertEqual(len(large), len(small))
+        book = Book.objects.get(pk=response.data['ids'][3])
+        self.assertEqual(book.title, "Duży 3")
+        self.assertEqual(book.author, self.author2)
+        self.assertEqual(list(book.categories.all()), [self.category1, self.category2])
+        self.assertEqual(book.details.isbn, "978-Duży-3")
+        self.assertStatisticsMatchLiveAggregate()
+
+    def test_bulk_create_books_reports_errors_per_item(self):
+        self.client.force_authenticate(user=self.user)
+        payload = self.bulk_payload(4)
+        payload[0]['author'] = 9999
+        payload[1]['title'] = self.book1.title
+        payload[1]['author'] = self.author1.pk
+        payload[2]['details']['isbn'] = payload[3]['details']['isbn']
+        payload[3]['price'] = "abc"
+        response = self.client.post(reverse('book-bulk'), payload, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(list(response.data[3]), ['price'])
+        self.assertEqual(response.data[:3], [{}, {}, {}])
+
+        del payload[3]
+        response = self.client.post(reverse('book-bulk'), payload, format='json')
+        self.client.force_authenticate(user=None)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data[0], {'author': ["Autor o ID 9999 nie istnieje."]})
+        self.assertEqual(response.data[1], {'non_field_errors': ["Książka tego autora o tym tytule już istnieje."]})
+        self.assertEqual(response.data[2], {})
+        self.assertEqual(Book.objects.count(), 3)
+
+    def test_bulk_update_and_delete_books(self):
+        url = reverse('book-bulk')
+        self.client.force_authenticate(user=self.user)
+        response = self.client.patch(url, [
+            {"id": self.book1.pk, "price": "5.00", "categories": [self.category2.pk], "details": {"isbn": "111"}},
+            {"id": self.book2.pk, "author": self.author1.pk},
+        ], format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.book1.refresh_from_db()
+        self.assertEqual(self.book1.price, Decimal('5.00'))
+        self.assertEqual(list(self.book1.categories.all()), [self.category2])
+        self.assertEqual(self.book1.details.isbn, "111")
+        self.assertEqual(Book.objects.get(pk=self.book2.pk).author, self.author1)
+        self.assertStatisticsMatchLiveAggregate()
+
+        response = self.client.patch(url, [{"id": self.book3.pk, "title": self.book1.title}], format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        response = self.client.delete(url, [self.book1.pk, 9999], format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data, [{}, {'id': ["Książka o ID 9999 nie istnieje."]}])
+
+        response = self.client.delete(url, [self.book1.pk, self.book3.pk], format='json')
+        self.client.force_authenticate(user=None)
+        self.assertEqual(response.data, {'deleted': 2})
+        self.assertEqual(list(Book.objects.all()), [self.book2])
+        self.assertStatisticsMatchLiveAggregate()
+
+    def test_graphql_bulk_create_books(self):
+        mutation = """
+        mutation($books: [BookInput!]!) {
+          bulkCreateBooks(books: $books) { ok errors books { title author { lastName } details { isbn } } }
+        }
+        """
+        books = [
+            {"title": "Tom A", "authorId": to_global_id('AuthorType', self.author1.pk),
+             "categoryIds": [to_global_id('CategoryType', self.category1.pk)], "price": "12.50",
+             "publicationDate": "2020-01-01", "details": {"isbn": "978-A"}},
+            {"title": "Tom B", "authorId": to_global_id('AuthorType', self.author2.pk), "categoryIds": [],
+             "price": "15.00", "publicationDate": "2021-01-01", "bookFormat": "XX"},
+        ]
+        self.client.force_login(self.user)
+        response = self.client.post('/graphql/', {'query': mutation, 'variables': {'books': books}}, format='json')
+        result = response.json()['data']['bulkCreateBooks']
+        self.assertFalse(result['ok'])
+        self.assertEqual(len(result['errors']), 1)
+        self.assertTrue(result['errors'][0].startswith("Pozycja 1, book_format"))
+
+        books[1]['bookFormat'] = "EB"
+        response = self.client.post('/graphql/', {'query': mutation, 'variables': {'books': books}}, format='json')
+        self.client.logout()
+        result = response.json()['data']['bulkCreateBooks']
+        self.assertTrue(result['ok'])
+        self.assertEqual(result['books'], [
+            {'title': "Tom A", 'author': {'lastName': "Mickiewicz"}, 'details': {'isbn': "978-A"}},
+            {'title': "Tom B", 'author': {'lastName': "Tokarczuk"}, 'details': None},
+        ])
+        self.assertStatisticsMatchLiveAggregate()
+
+    def test_export_books_csv(self):
+        BookDetails.objects.create(book=self.book1, isbn="978-83-1", number_of_pages=300)
+        self.book1.categories.add(self.category2)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('book-export'), {'author': self.author1.pk})
+            content = b''.join(response.streaming_content).decode()
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        # author filter validation, books with author/details, categories
+        self.assertEqual(len(queries), 3)
+
+        rows = list(csv.DictReader(StringIO(content)))
+        self.assertEqual([row['title'] for row in rows], [self.book1.title, self.book3.title])
+        self.assertEqual(rows[0]['author_last_name'], "Mickiewicz")
+        self.assertEqual(rows[0]['categories'], "Epos|Powieść")
+        self.assertEqual(rows[0]['price'], "29.99")
+        self.assertEqual(rows[0]['isbn'], "978-83-1")
+        self.assertEqual(rows[1]['isbn'], "")
+
+    def test_export_books_ndjson_honors_search_and_ordering(self):
+        response = self.client.get(reverse('book-export'), {'export_format': 'ndjson', 'ordering': 'price'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        records = [json.loads(line) for line in b''.join(response.streaming_content).decode().splitlines()]
+        self.assertEqual([record['id'] for record in records], [self.book3.pk, self.book1.pk, self.book2.pk])
+        self.assertEqual(records[0]['categories'], ["Epos"])
+        self.assertIsNone(records[0]['isbn'])
+
+        response = self.client.get(reverse('book-export'), {'export_format': 'ndjson', 'search': 'jakubowe'})
+        records = [json.loads(line) for line in b''.join(response.streaming_content).decode().splitlines()]
+        self.assertEqual([record['title'] for record in records], [self.book2.title])
+
+        response = self.client.get(reverse('book-export'), {'export_format': 'xml'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_import_catalog_round_trips_export(self):
+        BookDetails.objects.create(book=self.book1, isbn="978-83-1", number_of_pages=300, language="polski")
+        export = b''.join(self.client.get(reverse('book-export')).streaming_content).decode()
+        rows = list(csv.DictReader(StringIO(export)))
+        self.assertEqual(rows[0]['id'], str(self.book2.pk))
+        rows[0]['price'] = "1.00"
+        book1_row = next(row for row in rows if row['id'] == str(self.book1.pk))
+        rows.append({**book1_row, 'title': "Nowa książka", 'author_first_name': "Jan", 'author_last_name': "Kowalski",
+                     'categories': "Epos|Reportaż", 'isbn': "978-83-1"})
+        rows.append({**rows[0], 'title': "", 'price': "abc"})
+        with tempfile.NamedTemporaryFile('w', suffix='.csv', delete=False, encoding='utf-8', newline='') as handle:
+            writer = csv.DictWriter(handle, fieldnames=rows[0].keys())
+            writer.writeheader()
+            writer.writerows(rows)
+        self.addCleanup(os.remove, handle.name)
+
+        out = StringIO()
+        call_command('import_catalog', handle.name, '--batch-size', '2', stdout=out)
+        self.assertIn("1 nowych książek, 1 nowych autorów, 1 nowych kategorii, 1 pominiętych", out.getvalue())
+        self.assertIn("wierszy/s", out.getvalue())
+        self.assertEqual(Book.objects.get(pk=self.book2.pk).price, self.book2.price)
+        new_book = Book.objects.get(title="Nowa książka")
+        self.assertEqual(str(new_book.author), "Jan Kowalski")
+        self.assertEqual([category.name for category in new_book.categories.all()], ["Epos", "Reportaż"])
+        self.assertIsNone(new_book.details.isbn)
+        self.assertEqual(new_book.details.language, "polski")
+
+        call_command('import_catalog', handle.name, '--update', stdout=StringIO())
+        self.assertEqual(Book.objects.get(pk=self.book2.pk).price, Decimal('1.00'))
+        self.assertEqual(Book.objects.count(), 4)
+        self.assertStatisticsMatchLiveAggregate()
+
+    def test_import_catalog_skips_malformed_ndjson_lines(self):
+        self.client.get(reverse('book-list'))
+        lines = [
+            json.dumps({'title': "Tom 1", 'author_first_name': "Jan", 'author_last_name': "Kowalski",
+                        'price': "10.00", 'publication_date': "2020-01-01"}),
+            '{"title": "urwany',
+            '[1, 2]',
+            json.dumps({'title': "Tom 2", 'author_first_name': "Jan", 'author_last_name': "Kowalski",
+                        'price': "12.00", 'publication_date': "2021-01-01"}),
+        ]
+        out = StringIO()
+        with tempfile.NamedTemporaryFile('w', suffix='.ndjson', delete=False, encoding='utf-8') as handle:
+            handle.write('\n'.join(lines) + '\n')
+        self.addCleanup(os.remove, handle.name)
+        call_command('import_catalog', handle.name, '--batch-size', '1', stdout=out)
+        self.assertIn("2 nowych książek, 1 nowych autorów, 0 nowych kategorii, 2 pominiętych", out.getvalue())
+        self.assertStatisticsMatchLiveAggregate()
+        self.assertEqual(len(self.client.get(reverse('book-list')).json()['results']), 5)
+
+    def test_import_catalog_skips_records_invalid_for_the_model(self):
+        valid = {'title': "Tom 1", 'author_first_name': "Jan", 'author_last_name': "Kowalski",
+                 'price': "10.00", 'publication_date': "2020-01-01", 'book_format': "PB"}
+        lines = [json.dumps({**valid, 'title': f"Błąd {number}", **change}) for number, change in enumerate([
+            {'price': "NaN"},
+            {'price': "Infinity"},
+            {'price': "12345.678"},
+            {'book_format': "Hardback"},
+            {'title': "x" * 201},
+            {'publication_date': "2020-02-30"},
+            {'number_of_pages': -5},
+        ])] + [json.dumps(valid)]
+        out = StringIO()
+        with tempfile.NamedTemporaryFile('w', suffix='.ndjson', delete=False, encoding='utf-8') as handle:
+            handle.write('\n'.join(lines) + '\n')
+        self.addCleanup(os.remove, handle.name)
+        call_command('import_catalog', handle.name, stdout=out)
+        self.assertIn("1 nowych książek, 1 nowych autorów, 0 nowych kategorii, 7 pominiętych", out.getvalue())
+        book = Book.objects.get(title="Tom 1")
+        self.assertEqual((book.price, book.book_format), (Decimal('10.00'), "PB"))
+
+    def test_import_catalog_rebuilds_statistics_after_failure(self):
+        def records():
+            yield {'title': "Tom 1", 'author_first_name': "Adam", 'author_last_name': "Mickiewicz",
+                   'price': "10.00", 'publication_date': "2020-01-01"}
+            raise OSError("przerwany odczyt")
+
+        self.client.get(reverse('book-list'))
+        with self.assertRaises(OSError):
+            CatalogImporter(batch_size=1).run(records())
+        self.assertTrue(Book.objects.filter(title="Tom 1").exists())
+        self.assertStatisticsMatchLiveAggregate()
+        self.assertEqual(len(self.client.get(reverse('book-list')).json()['results']), 4)
+
+    def test_import_catalog_update_keeps_published_flag_in_line(self):
+        future = publication_cutoff() + datetime.timedelta(days=30)
+        lines = [
+            json.dumps({'title': self.book1.title, 'author_first_name': "Adam", 'author_last_name': "Mickiewicz",
+                        'price': "29.99", 'publication_date': future.isoformat()}),
+            json.dumps({'title': "Zapowiedź", 'author_first_name': "Adam", 'author_last_name': "Mickiewicz",
+                        'price': "15.00", 'publication_date': future.isoformat()}),
+        ]
+        with tempfile.NamedTemporaryFile('w', suffix='.ndjson', delete=False, encoding='utf-8') as handle:
+            handle.write('\n'.join(lines) + '\n')
+        self.addCleanup(os.remove, handle.name)
+        call_command('import_catalog', handle.name, '--update', stdout=StringIO())
+        self.assertFalse(Book.objects.get(pk=self.book1.pk).is_published)
+        self.assertFalse(Book.objects.get(title="Zapowiedź").is_published)
+        self.assertNotIn(self.book1.pk, Book.published.values_list('pk', flat=True))
+
+    def test_book_list_is_served_from_cache(self):
+        url = reverse('book-list')
+        first = self.client.get(url, {'ordering': 'price', 'author': self.author1.pk})
+        with CaptureQueriesContext(connection) as queries:
+            second = self.client.get(url, {'author': self.author1.pk, 'ordering': 'price'})
+        # Only the model versions are read.
+        self.assertEqual(len(queries), 1)
+        self.assertEqual(second.data, first.data)
+
+        detail = reverse('book-detail', kwargs={'pk': self.book1.pk})
+        self.client.get(detail)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(detail)
+        self.assertEqual(len(queries), 1)
+        self.assertEqual(response.data['title'], self.book1.title)
+
+    def test_book_cache_invalidated_by_related_writes(self):
+        url = reverse('book-detail', kwargs={'pk': self.book1.pk})
+
+        def fetch():
+            # The second request is answered from the cache.
+            self.client.get(url)
+            return self.client.get(url).data
+
+        self.assertEqual(fetch()['author_name'], "Adam Mickiewicz")
+        self.author1.first_name = "Adaś"
+        self.author1.save()
+        self.assertEqual(fetch()['author_name'], "Adaś Mickiewicz")
+
+        self.book1.categories.add(self.category2)
+        self.assertEqual(fetch()['category_names'], ["Epos", "Powieść"])
+        self.category2.name = "Proza"
+        self.category2.save()
+        self.assertEqual(fetch()['category_names'], ["Epos", "Proza"])
+
+        BookDetails.objects.create(book=self.book1, isbn="978-1")
+        self.assertEqual(fetch()['details']['isbn'], "978-1")
+
+        self.client.force_authenticate(user=self.user)
+        self.client.patch(reverse('book-bulk'), [{"id": self.book1.pk, "price": "1.00"}], format='json')
+        self.client.force_authenticate(user=None)
+        self.assertEqual(fetch()['price'], "1.00")
+
+        self.book1.delete()
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_conditional_get_answers_not_modified(self):
+        for url in (reverse('book-list'), reverse('author-list'), reverse('category-detail', args=[self.category1.pk])):
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            etag, last_modified = response['ETag'], response['Last-Modified']
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+            self.assertEqual(len(queries), 1)
+            next_second = http_date(parse_http_date(last_modified) + 1)
+            response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=next_second)
+            self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        url = reverse('book-list')
+        etag = self.client.get(url)['ETag']
+        self.assertNotEqual(self.client.get(url, {'ordering': 'price'})['ETag'], etag)
+        author_etag = self.client.get(reverse('author-list'))['ETag']
+        BookDetails.objects.create(book=self.book1, isbn="978-1")
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], etag)
+        response = self.client.get(reverse('author-list'), HTTP_IF_NONE_MATCH=author_etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_cache_keys_do_not_repeat_after_rolled_back_bump(self):
+        url = reverse('book-detail', args=[self.book1.pk])
+        with transaction.atomic():
+            Book.objects.filter(pk=self.book1.pk).update(title="Wycofany tytuł")
+            bump_version(Book)
+            uncommitted = self.client.get(url)
+            self.assertEqual(uncommitted.json()['title'], "Wycofany tytuł")
+            transaction.set_rollback(True)
+        bump_version(Book)
+        response = self.client.get(url)
+        self.assertEqual(response.json()['title'], self.book1.title)
+        self.assertNotEqual(response['ETag'], uncommitted['ETag'])
+
+    def test_async_views_check_permissions_before_the_cache(self):
+        url = reverse('async-book-list')
+        etag = self.client.get(url)['ETag']
+        with mock.patch.object(BookViewSet, 'permission_classes', [permissions.IsAuthenticated]):
+            for headers in ({}, {'HTTP_IF_NONE_MATCH': etag}):
+                response = self.client.get(url, **headers)
+                self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+            credentials = base64.b64encode(b'tester:password123').decode()
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag, HTTP_AUTHORIZATION=f'Basic {credentials}')
+            self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_async_retrieve_checks_object_permissions(self):
+        class DenyObjects(permissions.BasePermission):
+            def has_object_permission(self, request, view, obj):
+                return False
+
+        credentials = {'HTTP_AUTHORIZATION': f"Basic {base64.b64encode(b'tester:password123').decode()}"}
+        with mock.patch.object(BookViewSet, 'permission_classes', [DenyObjects]):
+            for name in ('book-detail', 'async-book-detail'):
+                with self.subTest(name=name):
+                    response = self.client.get(reverse(name, kwargs={'pk': self.book1.pk}), **credentials)
+                    self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+            response = self.client.get(reverse('async-book-detail', kwargs={'pk': 0}), **credentials)
+            self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_if_modified_since_sees_writes_within_the_same_second(self):
+        url = reverse('book-list')
+        second = timezone.now().replace(microsecond=0)
+        ModelVersion.objects.update(updated_at=second + datetime.timedelta(microseconds=200_000))
+        last_modified = self.client.get(url)['Last-Modified']
+        self.assertEqual(parse_http_date(last_modified), second.timestamp())
+
+        self.book1.save()
+        ModelVersion.objects.update(updated_at=second + datetime.timedelta(microseconds=700_000))
+        response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Last-Modified'], last_modified)
+        response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=http_date(second.timestamp() + 1))
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def explain(self, queryset):
+        sql, params = queryset.query.get_compiler(connection.alias).as_sql()
+        with connection.cursor() as cursor:
+            cursor.execute(f"EXPLAIN QUERY PLAN {sql}", params)
+            return [row[-1] for row in cursor.fetchall()]
+
+    @skipUnless(connection.vendor == 'sqlite', "EXPLAIN QUERY PLAN is SQLite specific.")
+    def test_exposed_filters_use_indexes(self):
+        # Substring lookups cannot use a B-tree index (?search= is the indexed
+        # way to look for words).
+        unindexable = {'icontains'}
+        values = {
+            'author': self.author1.pk, 'categories': self.category1.pk,
+            'publication_date': datetime.date(2000, 1, 1), 'price': Decimal('20.00'), 'title': "Pan",
+            'author__last_name': "Mickiewicz", 'categories__name': "Epos", 'book_format': "EB",
+            'details__isbn': "978-83", 'details__language': "polski",
+            'publication_month': 5, 'publication_day': 15, 'is_published': True,
+        }
+        paths = [(filter.field_name, filter.lookup_expr) for filter in BookFilterSet.base_filters.values()]
+        paths += [(filter.field_name, filter.lookup_expr) for filter in BookNodeFilterSet.base_filters.values()]
+        for field, lookup in paths:
+            if lookup.split('__')[0] in unindexable:
+                continue
+            value = 2000 if lookup.startswith('year') else values[field]
+            plan = self.explain(Book.objects.filter(**{f'{field}__{lookup}': value}).order_by())
+            scans = [step for step in plan if step.startswith('SCAN')]
+            if field == 'is_published':
+                # The partial indexes on published rows hold exactly the matching rows.
+                scans = [step for step in scans if 'USING INDEX book_published' not in step]
+            with self.subTest(filter=f'{field}__{lookup}'):
+                self.assertEqual(scans, [], plan)
+
+        plan = self.explain(Book.objects.order_by(*Book._meta.ordering, 'pk')[:101])
+        self.assertNotIn('USE TEMP B-TREE FOR ORDER BY', plan)
+        plan = self.explain(Book.published.all()[:101])
+        self.assertIn('SCAN books_book USING INDEX book_published_idx', plan)
+        self.assertNotIn('USE TEMP B-TREE FOR ORDER BY', plan)
+        plan = self.explain(Book.published.affordable())
+        self.assertTrue(all('USING INDEX book_published' in step for step in plan if 'books_book' in step), plan)
+        self.assertIn(
+            'SEARCH books_book USING INDEX book_published_price_idx (price<?)',
+            self.explain(Book.published.affordable().order_by())
+        )
+
+    def test_book_search_ranks_by_relevance(self):
+        strong = Book.objects.create(
+            title="Ogień i miecz", author=self.author1, description="Ogień, ogień i jeszcze raz ogień.",
+            price=Decimal('30.00'), publication_date=datetime.date(1884, 1, 1)
+        )
+        weak = Book.objects.create(
+            title="Potop", author=self.author1,
+            description="Długa powieść historyczna, w której pojawia się też ogień wojny i wiele innych wątków.",
+            price=Decimal('30.00'), publication_date=datetime.date(1886, 1, 1)
+        )
+        response = self.client.get(reverse('book-list') + '?search=ogien', format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([book['id'] for book in response.data['results']], [strong.id, weak.id])
+
+        response = self.client.get(reverse('book-list') + '?search=ogien&ordering=-publication_date', format='json')
+        self.assertEqual([book['id'] for book in response.data['results']], [weak.id, strong.id])
+
+    def test_book_search_prefix_follows_updates(self):
+        url = reverse('book-list')
+        response = self.client.get(url + '?search=Tade', format='json')
+        self.assertEqual([book['title'] for book in response.data['results']], [self.book1.title])
+
+        self.client.force_authenticate(user=self.user)
+        response = self.client.patch(
+            reverse('book-detail', kwargs={'pk': self.book1.pk}), {'title': 'Konrad Wallenrod'}, format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.client.force_authenticate(user=None)
+
+        response = self.client.get(url + '?search=Tade', format='json')
+        self.assertEqual(response.data['results'], [])
+        response = self.client.get(url + '?search=wallenrod', format='json')
+        self.assertEqual([book['id'] for book in response.data['results']], [self.book1.id])
+
+    def test_graphql_all_books_search(self):
+        query = '{ allBooks(search: "tadeusz") { edges { node { title details { isbn } } } } }'
+        response = self.client.post('/graphql/', {'query': query}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        edges = response.json()['data']['allBooks']['edges']
+        self.assertEqual([edge['node']['title'] for edge in edges], [self.book1.title])
+        self.assertIsNone(edges[0]['node']['details'])
+
+    def test_graphql_nested_query_count_is_constant(self):
+        query = """
+        {
+          allAuthors(first: 10) {
+            edges { node {
+              firstName
+              books(first: 5) { edges { node {
+                title
+                author { lastName }
+                details { isbn }
+                categories(first: 5) { edges { node { name books(first: 5) { edges { node { title } } } } } }
+              } } }
+            } }
+          }
+        }
+        """
+
+        def run():
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.post('/graphql/', {'query': query}, format='json')
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertNotIn('errors', response.json())
+            return response.json()['data'], len(queries)
+
+        _, baseline = run()
+        for i in range(4):
+            author = Author.objects.create(first_name=f"Autor {i}", last_name="Testowy")
+            for j in range(3):
+                book = Book.objects.create(
+                    title=f"Tom {i}.{j}", author=author, price=Decimal('10.00'),
+                    publication_date=datetime.date(2000, 1, j + 1)
+                )
+                book.categories.add(self.category1, self.category2)
+                BookDetails.objects.create(book=book, isbn=f"978-{i}-{j}")
+        data, grown = run()
+
+        self.assertEqual(grown, baseline)
+        authors = {edge['node']['firstName']: edge['node'] for edge in data['allAuthors']['edges']}
+        books = authors['Autor 2']['books']['edges']
+        self.assertEqual([edge['node']['title'] for edge in books], ['Tom 2.2', 'Tom 2.1', 'Tom 2.0'])
+        self.assertEqual(books[0]['node']['author']['lastName'], 'Testowy')
+        self.assertEqual(books[0]['node']['details']['isbn'], '978-2-2')
+        self.assertEqual(
+            [edge['node']['name'] for edge in books[0]['node']['categories']['edges']],
+            [self.category1.name, self.category2.name]
+        )
+
+    def test_graphql_reports_query_cost(self):
+        query = '{ allAuthors(first: 10) { edges { node { firstName books(first: 5) { edges { node { title } } } } } } }'
+        response = self.client.post('/graphql/', {'query': query}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        # allAuthors (2) + 10 authors + 10 book connections + 10 * 5 books
+        self.assertEqual(response.json()['extensions']['queryCost']['cost'], 72)
+        self.assertEqual(response.json()['extensions']['queryCost']['depth'], 7)
+
+    def test_graphql_query_cost_uses_variables(self):
+        query = 'query($n: Int) { allBooks(first: $n) { edges { node { title author { lastName } } } } }'
+        response = self.client.post('/graphql/', {'query': query, 'variables': {'n': 3}}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()['extensions']['queryCost']['cost'], 2 + 3 + 3)
+
+    def test_graphql_rejects_expensive_query_before_execution(self):
+        query = """
+        { allAuthors { edges { node { books { edges { node {
+            categories { edges { node { name } } }
+        } } } } } } }
+        """
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post('/graphql/', {'query': query}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertNotIn('data', response.json())
+        self.assertIn('zbyt kosztowne', response.json()['errors'][0]['message'])
+        self.assertGreater(response.json()['extensions']['queryCost']['cost'], 50000)
+        self.assertEqual(len(queries), 0)
+
+    @override_settings(GRAPHQL_MAX_QUERY_DEPTH=5)
+    def test_graphql_rejects_too_deep_query(self):
+        query = '{ allBooks(first: 1) { edges { node { author { books(first: 1) { edges { node { title } } } } } } } }'
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post('/graphql/', {'query': query}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('zbyt głębokie', response.json()['errors'][0]['message'])
+        self.assertEqual(len(queries), 0)
+
+    def test_graphql_persisted_query_round_trip(self):
+        query = '{ allBooks(first: 2, title_Icontains: "pan") { edges { node { title } } } }'
+        extensions = {'persistedQuery': {'version': 1, 'sha256Hash': query_hash(query)}}
+
+        response = self.client.post('/graphql/', {'extensions': extensions}, format='json')
+        self.assertEqual(response.json()['errors'][0]['message'], 'PersistedQueryNotFound')
+
+        response = self.client.post('/graphql/', {'query': query, 'extensions': extensions}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        response = self.client.post('/graphql/', {'extensions': extensions}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()['data']['allBooks']['edges'], [{'node': {'title': self.book1.title}}])
+
+        response = self.client.get('/graphql/', {'extensions': json.dumps(extensions)}, HTTP_ACCEPT='application/json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()['data']['allBooks']['edges'], [{'node': {'title': self.book1.title}}])
+
+    def test_graphql_persisted_query_hash_must_match(self):
+        extensions = {'persistedQuery': {'version': 1, 'sha256Hash': query_hash('{ allAuthors { edges { node { id } } } }')}}
+        response = self.client.post(
+            '/graphql/', {'query': '{ allCategories { edges { node { id } } } }', 'extensions': extensions}, format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.json()['errors'][0]['extensions']['code'], 'INVALID_PERSISTED_QUERY_HASH')
+
+    def test_graphql_reuses_parsed_documents(self):
+        query = '{ allCategories(first: 3) { edges { node { name description } } } }'
+        document_cache.clear()
+        for _ in range(3):
+            response = self.client.post('/graphql/', {'query': query}, format='json')
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(document_cache.info()['misses'], 1)
+        self.assertEqual(document_cache.info()['hits'], 2)
+
+        response = self.client.post('/graphql/', {'query': '{ allCategories { edges { node { nope } } } }'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.post('/graphql/', {'query': '{ allCategories { edges { node { nope } } } }'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(document_cache.info()['hits'], 3)
+
+    def test_graphql_nested_connections_load_only_the_page(self):
+        for i in range(6):
+            book = Book.objects.create(
+                title=f"Tom {i}", author=self.author2, price=Decimal('10.00'),
+                publication_date=datetime.date(2000, 1, i + 1)
+            )
+            book.categories.add(self.category2)
+        query = """
+        query Strona($after: String) {
+          allCategories(name: "Powieść") { edges { node {
+            books(first: 2, after: $after) { totalCount pageInfo { hasNextPage endCursor } edges { node { title } } }
+          } } }
+        }
+        """
+
+        def page(after=None):
+            response = self.client.post('/graphql/', {'query': query, 'variables': {'after': after}}, format='json')
+            self.assertNotIn('errors', response.json())
+            return response.json()['data']['allCategories']['edges'][0]['node']['books']
+
+        first = page()
+        self.assertEqual(first['totalCount'], 7)
+        self.assertTrue(first['pageInfo']['hasNextPage'])
+        self.assertEqual([edge['node']['title'] for edge in first['edges']], [self.book2.title, "Tom 5"])
+        second = page(first['pageInfo']['endCursor'])
+        self.assertEqual([edge['node']['title'] for edge in second['edges']], ["Tom 4", "Tom 3"])
+
+        loaded = Loaders().category_books.load(self.category2.pk, page_limit({'first': 2}))
+        self.assertEqual((len(loaded.rows), len(loaded)), (2, 7))
+
+    def test_graphql_nested_connection_filters(self):
+        query = '{ allAuthors(lastName: "Mickiewicz") { edges { node { books(title_Icontains: "dziady") { edges { node { title } } } } } } }'
+        response = self.client.post('/graphql/', {'query': query}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        edges = response.json()['data']['allAuthors']['edges'][0]['node']['books']['edges']
+        self.assertEqual([edge['node']['title'] for edge in edges], [self.book3.title])
+
+    def test_metrics_endpoint_requires_admin(self):
+        url = reverse('metrics')
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_401_UNAUTHORIZED)
+        self.client.force_authenticate(user=self.user)
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_metrics_report_queries_per_endpoint(self):
+        metrics_registry.reset()
+        self.client.get(reverse('book-list'))
+        self.client.get(reverse('book-list'))
+        self.client.post('/graphql/', {'query': 'query Katalog { allBooks(first: 2) { edges { node { title } } } }'},
+                         format='json')
+
+        admin = User.objects.create_superuser('admin', 'admin@example.com', 'password123')
+        self.client.force_authenticate(user=admin)
+        response = self.client.get(reverse('metrics'), HTTP_ACCEPT='text/plain')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response['Content-Type'].startswith('text/plain'))
+        body = response.content.decode()
+        self.assertIn('bookshelf_requests_total{endpoint="book-list",method="GET",status="200"} 2', body)
+        # The second request is served from the response cache: one query, no serialization.
+        self.assertIn('bookshelf_request_queries{endpoint="book-list",method="GET",quantile="0.99"} 3', body)
+        self.assertIn('bookshelf_request_queries_sum{endpoint="book-list",method="GET"} 4', body)
+        self.assertIn('bookshelf_request_serializer_seconds_count{endpoint="book-list",method="GET"} 2', body)
+        self.assertIn('bookshelf_response_size_bytes_count{endpoint="book-list",method="GET"} 2', body)
+        self.assertIn('bookshelf_requests_total{endpoint="graphql:query:Katalog",method="POST",status="200"} 1', body)
+
+    @override_settings(METRICS_MAX_OPERATION_NAMES=2)
+    def test_metrics_cap_graphql_operation_names(self):
+        metrics_registry.reset()
+        for name in ('Pierwsze', 'Drugie', 'Trzecie', 'Czwarte', 'Pierwsze'):
+            self.client.post('/graphql/', {'query': 'query %s { allBooks(first: 1) { totalCount } }' % name},
+                             format='json')
+        self.client.post('/graphql/', {'query': '{ allBooks(first: 1) { totalCount } }'}, format='json')
+        endpoints = {endpoint for endpoint, _, _ in metrics_registry.requests}
+        self.assertEqual(endpoints, {'graphql:query:Pierwsze', 'graphql:query:Drugie', 'graphql:query:other'})
+        self.assertEqual(metrics_registry.requests[('graphql:query:other', 'POST', 200)], 3)
+
+    def test_async_list_matches_sync_list(self):
+        params = {'author': self.author1.pk, 'ordering': '-price'}
+        expected = self.client.get(reverse('book-list'), params).json()
+        response = self.client.get(reverse('async-book-list'), params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()['results'], expected['results'])
+
+        response = self.client.get(reverse('async-book-list'), {'page_size': 2})
+        first = response.json()
+        self.assertIsNone(first['previous'])
+        second = self.client.get(first['next']).json()
+        self.assertIsNone(second['next'])
+        self.assertEqual(
+            [book['id'] for book in first['results'] + second['results']],
+            [book['id'] for book in self.client.get(reverse('book-list')).json()['results']]
+        )
+
+        response = self.client.get(reverse('async-book-list'), {'author': 9999})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('author', response.json())
+
+    def test_async_retrieve(self):
+        url = reverse('async-book-detail', args=[self.book1.pk])
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json(), self.client.get(reverse('book-detail', args=[self.book1.pk])).json())
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        response = self.client.get(reverse('async-book-detail', args=[9999]))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    async def test_async_views_under_asgi(self):
+        responses = [
+            await self.async_client.get(reverse(name))
+            for name in ('async-author-list', 'async-category-list', 'async-book-list')
+        ]
+        self.assertEqual([response.status_code for response in responses], [200, 200, 200])
+        self.assertEqual(
+            [len(response.json()['results']) for response in responses],
+            [2, 2, 3]
+        )
+        self.assertEqual(responses[2].json()['results'][0]['category_names'], [self.category2.name])
+
+    async def test_metrics_count_queries_under_asgi(self):
+        metrics_registry.reset()
+        for name in ('book-list', 'async-book-list'):
+            response = await self.async_client.get(reverse(name))
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            # Model versions, books, categories.
+            self.assertEqual(metrics_registry.series[('queries', name, 'GET')].total, 3)
+            self.assertGreater(metrics_registry.series[('sql_time', name, 'GET')].total, 0)
+
+    def cover_upload(self, name='okladka.png', size=(600, 900)):
+        buffer = BytesIO()
+        Image.new('RGBA', size, (200, 30, 30, 255)).save(buffer, 'PNG')
+        return SimpleUploadedFile(name, buffer.getvalue(), content_type='image/png')
+
+    def test_cover_renditions_generated_on_upload(self):
+        with tempfile.TemporaryDirectory() as media_root, \
+                override_settings(MEDIA_ROOT=media_root, COVER_RENDITION_WORKERS=0):
+            url = reverse('book-detail', args=[self.book1.pk])
+            self.client.force_authenticate(user=self.user)
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.client.patch(url, {'cover_image': self.cover_upload()}, format='multipart')
+            self.client.force_authenticate(user=None)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+            data = self.client.get(url).json()
+            self.assertEqual(set(data['cover_thumbnail']), {'webp', 'jpeg'})
+            self.assertTrue(data['cover_card']['webp'].startswith('http://testserver/media/book_covers/renditions/'))
+            expected_sizes = {'cover_thumbnail': (100, 150), 'cover_card': (300, 450), 'cover_full': (600, 900)}
+            for field, size in expected_sizes.items():
+                for extension, image_format in (('webp', 'WEBP'), ('jpeg', 'JPEG')):
+                    path = data[field][extension].split('/media/', 1)[1]
+                    with default_storage.open(path) as handle, Image.open(handle) as image:
+                        self.assertEqual((image.format, image.size), (image_format, size))
+
+            query = '{ book(id: "%s") { coverThumbnail { webp jpeg } } }' % to_global_id('BookType', self.book1.pk)
+            response = self.client.post('/graphql/', {'query': query}, format='json')
+            self.assertEqual(response.json()['data']['book']['coverThumbnail'], data['cover_thumbnail'])
+
+            previous = Book.objects.get(pk=self.book1.pk).cover_renditions
+            self.client.force_authenticate(user=self.user)
+            with self.captureOnCommitCallbacks(execute=True):
+                self.client.patch(url, {'cover_image': ''}, format='multipart')
+            self.client.force_authenticate(user=None)
+            self.assertIsNone(self.client.get(url).json()['cover_thumbnail'])
+            self.assertFalse(default_storage.exists(previous['files']['thumbnail']['webp']))
+
+    def test_generate_cover_renditions_command(self):
+        with tempfile.TemporaryDirectory() as media_root, \
+                override_settings(MEDIA_ROOT=media_root, COVER_RENDITION_WORKERS=0):
+            self.book2.cover_image.save('okladka.png', self.cover_upload(), save=False)
+            Book.objects.filter(pk=self.book2.pk).update(cover_image=self.book2.cover_image.name)
+            self.assertIsNone(Book.objects.get(pk=self.book2.pk).cover_renditions)
+
+            out = StringIO()
+            call_command('generate_cover_renditions', '--workers', '1', stdout=out)
+            self.assertIn("Przetworzono 1 okładek, 0 było aktualnych", out.getvalue())
+            renditions = Book.objects.get(pk=self.book2.pk).cover_renditions
+            self.assertEqual(renditions['source'], self.book2.cover_image.name)
+
+            default_storage.delete(renditions['files']['card']['jpeg'])
+            out = StringIO()
+            call_command('generate_cover_renditions', '--workers', '1', stdout=out)
+            self.assertIn("Przetworzono 1 okładek", out.getvalue())
+            self.assertTrue(default_storage.exists(renditions['files']['card']['jpeg']))
+            out = StringIO()
+            call_command('generate_cover_renditions', '--workers', '1', stdout=out)
+            self.assertIn("Przetworzono 0 okładek, 1 było aktualnych", out.getvalue())
+
+    def test_identical_covers_are_stored_once(self):
+        with tempfile.TemporaryDirectory() as media_root, \
+                override_settings(MEDIA_ROOT=media_root, COVER_RENDITION_WORKERS=0):
+            upload = self.cover_upload('pierwsza.png')
+            digest = hashlib.sha256(upload.read()).hexdigest()
+            self.client.force_authenticate(user=self.user)
+            for book, name in ((self.book1, 'pierwsza.png'), (self.book2, 'druga.jpeg')):
+                with self.captureOnCommitCallbacks(execute=True):
+                    response = self.client.patch(
+                        reverse('book-detail', args=[book.pk]), {'cover_image': self.cover_upload(name)},
+                        format='multipart'
+                    )
+                self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.client.force_authenticate(user=None)
+
+            name = f'book_covers/{digest[:2]}/{digest}.png'
+            self.assertEqual(
+                set(Book.objects.filter(pk__in=[self.book1.pk, self.book2.pk]).values_list('cover_image', flat=True)),
+                {name}
+            )
+            self.assertEqual(os.listdir(os.path.join(media_root, 'book_covers', digest[:2])), [f'{digest}.png'])
+            self.assertEqual(CoverBlob.objects.get().ref_count, 2)
+            upload.seek(0)
+            self.assertEqual(cover_storage.save('book_covers/bez-rozszerzenia', upload), name)
+            renditions = Book.objects.get(pk=self.book2.pk).cover_renditions
+            self.assertEqual(renditions, Book.objects.get(pk=self.book1.pk).cover_renditions)
+
+            self.client.force_authenticate(user=self.user)
+            with self.captureOnCommitCallbacks(execute=True):
+                self.client.delete(reverse('book-detail', args=[self.book1.pk]))
+            self.assertEqual(CoverBlob.objects.get().ref_count, 1)
+            self.assertTrue(default_storage.exists(name))
+            self.assertTrue(default_storage.exists(renditions['files']['thumbnail']['webp']))
+
+            with self.captureOnCommitCallbacks(execute=True):
+                self.client.delete(reverse('book-detail', args=[self.book2.pk]))
+            self.client.force_authenticate(user=None)
+            self.assertFalse(CoverBlob.objects.exists())
+            self.assertFalse(default_storage.exists(name))
+            self.assertFalse(default_storage.exists(renditions['files']['thumbnail']['webp']))
+
+    def test_collect_cover_blobs_command(self):
+        with tempfile.TemporaryDirectory() as media_root, \
+                override_settings(MEDIA_ROOT=media_root, COVER_RENDITION_WORKERS=0):
+            legacy = default_storage.path('book_covers/stara.png')
+            os.makedirs(os.path.dirname(legacy))
+            with open(legacy, 'wb') as handle:
+                handle.write(self.cover_upload().read())
+            Book.objects.filter(pk__in=[self.book1.pk, self.book3.pk]).update(cover_image='book_covers/stara.png')
+            untracked = Book._meta.get_field('cover_image').storage.save(
+                'book_covers/nieuzywana.png', self.cover_upload(size=(10, 10))
+            )
+
+            out = StringIO()
+            call_command('collect_cover_blobs', '--legacy', stdout=out)
+            self.assertIn("usunięto 1 nieużywanych plików; w magazynie jest 1 plików okładek", out.getvalue())
+            self.assertFalse(os.path.exists(legacy))
+            self.assertFalse(default_storage.exists(untracked))
+            blob = CoverBlob.objects.get()
+            self.assertEqual(blob.ref_count, 2)
+            self.assertEqual(
+                set(Book.objects.exclude(cover_image='').values_list('cover_image', flat=True)), {blob.name}
+            )
+
+            CoverBlob.objects.update(ref_count=5)
+            out = StringIO()
+            call_command('collect_cover_blobs', stdout=out)
+            self.assertIn("Poprawiono 1 liczników, usunięto 0", out.getvalue())
+            self.assertEqual(CoverBlob.objects.get().ref_count, 2)
+
+    @tag('slow')
+    def test_admin_search_matches_every_term(self):
+        self.client.force_login(User.objects.create_superuser('admin', password='admin'))
+        url = reverse('admin:books_book_changelist')
+        for term, expected in [
+            ("Mickiewicz", {self.book1.title, self.book3.title}),
+            ("Mickiewicz Dziady", {self.book3.title}),
+            ("Tokarczuk Dziady", set()),
+            ("tadeusz", {self.book1.title}),
+            ('"Księgi Jakubowe" Olga', {self.book2.title}),
+        ]:
+            with self.subTest(term=term):
+                response = self.client.get(url, {'q': term})
+                self.assertEqual({book.title for book in response.context['cl'].result_list}, expected)
+
+    def test_admin_changelist_query_count_is_constant(self):
+        self.client.force_login(User.objects.create_superuser('admin', password='admin'))
+        url = reverse('admin:books_book_changelist')
+        filtered = {
+            'author__id__exact': self.author1.pk,
+            'categories__id__exact': self.category1.pk,
+            'price_range': '20-50',
+        }
+
+        def count_queries(params):
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(url, params)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            return len(queries), response
+
+        small = [count_queries({})[0], count_queries(filtered)[0]]
+        seed_catalog(100_000)
+        unfiltered, response = count_queries({})
+        self.assertEqual([unfiltered, count_queries(filtered)[0]], small)
+        self.assertContains(response, 'admin-autocomplete')
+        # The sidebars no longer list every author.
+        self.assertNotContains(response, Author.objects.order_by('-pk').first().first_name)
+
+        _, response = count_queries(filtered)
+        self.assertEqual(list(response.context['cl'].result_list), [self.book1])
+
+    def test_counts_use_counters_and_cache(self):
+        url = reverse('book-list')
+        self.assertNotIn('count', self.client.get(url).data)
+        self.assertEqual(self.client.get(url, {'count': 'true'}).data['count'], 3)
+        self.assertEqual(self.client.get(url, {'count': 'true', 'author': self.author1.pk}).data['count'], 2)
+        self.assertEqual(self.client.get(url, {'count': 'true', 'price__lt': '20'}).data['count'], 1)
+        with self.assertNumQueries(1):
+            self.assertEqual(get_count(Book.objects.filter(author=self.author2)), 1)
+
+        queryset = Book.objects.filter(price__lt=50)
+        with override_settings(COUNT_EXACT_THRESHOLD=1):
+            # bounded count, model versions, full count
+            with self.assertNumQueries(3):
+                self.assertEqual(get_count(queryset), 2)
+            with self.assertNumQueries(2):
+                self.assertEqual(get_count(queryset), 2)
+            Book.objects.create(
+                title="Bieguni", author=self.author2, price=Decimal('39.90'), publication_date=datetime.date(2007, 1, 1)
+            )
+            with self.assertNumQueries(3):
+                self.assertEqual(get_count(queryset), 3)
+
+        query = """
+            {
+              allBooks(first: 1, price_Lt: 50) { totalCount edges { node { title } } }
+              allAuthors { totalCount edges { node { books { totalCount } } } }
+            }
+        """
+        response = self.client.post('/graphql/', {'query': query}, format='json')
+        data = response.json()['data']
+        self.assertEqual(data['allBooks']['totalCount'], 3)
+        self.assertEqual(len(data['allBooks']['edges']), 1)
+        self.assertEqual(data['allAuthors']['totalCount'], 2)
+        self.assertEqual(
+            sorted(edge['node']['books']['totalCount'] for edge in data['allAuthors']['edges']), [2, 2]
+        )
+
+    def test_publication_date_parts_are_stored(self):
+        Book.objects.filter(pk=self.book2.pk).update(publication_date=datetime.date(2014, 5, 15))
+        book = Book.objects.get(pk=self.book2.pk)
+        self.assertEqual((book.publication_year, book.publication_month, book.publication_day), (2014, 5, 15))
+
+        url = reverse('book-list')
+        for params, expected in [
+            ({'publication_date__month': 5}, [self.book2.title]),
+            ({'publication_date__day': 28}, [self.book1.title]),
+            ({'publication_date__year': 1832}, [self.book3.title]),
+        ]:
+            with self.subTest(params=params):
+                response = self.client.get(url, params)
+                self.assertEqual([book['title'] for book in response.data['results']], expected)
+
+        years = Book.objects.dates('publication_date', 'year')
+        self.assertEqual(
+            list(years), [datetime.date(1832, 1, 1), datetime.date(1834, 1, 1), datetime.date(2014, 1, 1)]
+        )
+        self.assertEqual(years.count(), 3)
+        self.assertEqual(list(years.filter(price__lt=Decimal('20.00'))), [datetime.date(1832, 1, 1)])
+        self.assertFalse(years.filter(title='Brak').exists())
+        self.assertEqual(
+            list(Book.objects.filter(author=self.author1).dates('publication_date', 'month', order='DESC')),
+            [datetime.date(1834, 6, 1), datetime.date(1832, 1, 1)]
+        )
+        self.client.force_login(User.objects.create_superuser('admin', password='admin'))
+        response = self.client.get(reverse('admin:books_book_changelist'), {'publication_date__year': 1834})
+        self.assertContains(response, 'June 1834')
+
+    def test_published_flag_follows_publication_date(self):
+        future = publication_cutoff() + datetime.timedelta(days=1)
+        upcoming = Book.objects.create(
+            title="Zapowiedź", author=self.author1, price=Decimal('15.00'), publication_date=future
+        )
+        self.assertFalse(upcoming.is_published)
+        self.assertEqual(list(Book.published.affordable()), [self.book3])
+        Book.objects.filter(pk=self.book1.pk).update(publication_date=future)
+        Book.objects.bulk_create([
+            Book(title="Nowość", author=self.author2, price=Decimal('9.99'), publication_date=future)
+        ])
+        self.assertEqual(set(Book.published.all()), {self.book2, self.book3})
+
+        url = reverse('book-list')
+        unpublished = {"Zapowiedź", "Nowość", self.book1.title}
+        response = self.client.get(url, {'published': 'false'})
+        self.assertEqual({book['title'] for book in response.data['results']}, unpublished)
+        response = self.client.post('/graphql/', {'query': '{ allBooks(published: false) { totalCount } }'}, format='json')
+        self.assertEqual(response.json()['data']['allBooks']['totalCount'], 3)
+
+        self.assertEqual(rollover_published(cutoff=future), 3)
+        self.assertEqual(self.client.get(url, {'published': 'false'}).data['results'], [])
+        self.assertEqual(rollover_published(), 3)
+        out = StringIO()
+        call_command('rollover_published', stdout=out)
+        self.assertIn("Zmieniono stan publikacji 0 książek.", out.getvalue())
+        self.assertEqual(set(Book.published.all()), {self.book2, self.book3})
+
+    def test_book_reader_matches_serializer(self):
+        rng = random.Random(25)
+        authors = [self.author1, self.author2] + [
+            Author.objects.create(first_name=f"Imię{index}", last_name=f"Nazwisko{index}") for index in range(4)
+        ]
+        categories = [self.category1, self.category2] + [
+            Category.objects.create(name=f"Kategoria {name}") for name in "CABED"
+        ]
+        formats = [value for value, _ in Book.FORMAT_CHOICES]
+        for index in range(40):
+            cover = rng.choice(['', None, f'book_covers/{index:02x}/{"a" * 64}.jpg'])
+            renditions = None
+            if cover:
+                renditions = {'source': cover, 'files': {
+                    rendition: {'webp': f'book_covers/renditions/{index}/{rendition}.webp',
+                                'jpeg': f'book_covers/renditions/{index}/{rendition}.jpg'}
+                    for rendition in rng.sample(['thumbnail', 'card', 'full'], rng.randint(0, 3))
+                }}
+            book = Book.objects.create(
+                title=f"Książka {index}", author=rng.choice(authors), description=rng.choice(['', f"Opis {index}"]),
+                price=Decimal(rng.randint(1, 99999)) / 100, book_format=rng.choice(formats),
+                publication_date=datetime.date(rng.randint(1800, 2030), rng.randint(1, 12), rng.randint(1, 28))
+            )
+            # Stored names only: saving a cover through the model would process the file.
+            Book.objects.filter(pk=book.pk).update(cover_image=cover, cover_renditions=renditions)
+            book.categories.set(rng.sample(categories, rng.randint(0, 3)))
+            if rng.random() < 0.6:
+                BookDetails.objects.create(
+                    book=book, isbn=rng.choice([None, f"978-83-{index:05d}"]),
+                    number_of_pages=rng.choice([None, rng.randint(1, 1200)]),
+                    language=rng.choice(['', 'polski', 'angielski']), publisher=rng.choice(['', 'Znak'])
+                )
+
+        def expected(queryset, request):
+            data = BookSerializer(queryset, many=True, context={'request': request}).data
+            return json.loads(JSONRenderer().render(data))
+
+        def items(books):
+            return [list(book.items()) for book in books]
+
+        url = reverse('book-list')
+        for params, ordering in (({}, ['-publication_date', 'title']), ({'ordering': '-price'}, ['-price', 'pk']),
+                                 ({'ordering': 'author__last_name'}, ['author__last_name', 'pk'])):
+            response = self.client.get(url, {'page_size': 1000, **params})
+            queryset = Book.objects.order_by(*ordering, 'pk')
+            self.assertEqual(items(response.json()['results']), items(expected(queryset, response.wsgi_request)))
+
+        first = self.client.get(url, {'search': 'Książka', 'page_size': 25})
+        second = self.client.get(first.json()['next'])
+        results = first.json()['results'] + second.json()['results']
+        self.assertEqual(len(results), 40)
+        books = Book.objects.in_bulk([book['id'] for book in results])
+        self.assertEqual(items(results), items(expected([books[book['id']] for book in results], first.wsgi_request)))
+
+        for book in rng.sample(list(Book.objects.all()), 10):
+            response = self.client.get(reverse('book-detail', args=[book.pk]))
+            self.assertEqual(items([response.json()]), items(expected([book], response.wsgi_request)))
+            response = self.client.get(reverse('async-book-detail', args=[book.pk]))
+            self.assertEqual(items([response.json()]), items(expected([book], response.wsgi_request)))
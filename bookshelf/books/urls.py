@@ -1,12 +1,25 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import AuthorViewSet, CategoryViewSet, BookViewSet
+from .views import (
+    AuthorViewSet, CategoryViewSet, BookViewSet, AuthorAsyncView, CategoryAsyncView, BookAsyncView
+)
 
 router = DefaultRouter()
 router.register(r'authors', AuthorViewSet, basename='author')
 router.register(r'categories', CategoryViewSet, basename='category')
 router.register(r'books', BookViewSet, basename='book')
 
+# Async list/retrieve of the same resources for ASGI deployments.
+async_urlpatterns = [
+    path('authors/', AuthorAsyncView.as_view(), name='async-author-list'),
+    path('authors/<int:pk>/', AuthorAsyncView.as_view(), name='async-author-detail'),
+    path('categories/', CategoryAsyncView.as_view(), name='async-category-list'),
+    path('categories/<int:pk>/', CategoryAsyncView.as_view(), name='async-category-detail'),
+    path('books/', BookAsyncView.as_view(), name='async-book-list'),
+    path('books/<int:pk>/', BookAsyncView.as_view(), name='async-book-detail'),
+]
+
 urlpatterns = [
+    path('async/', include(async_urlpatterns)),
     path('', include(router.urls)),
 ]
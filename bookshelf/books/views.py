@@ -1,14 +1,38 @@
-from rest_framework import viewsets, permissions, generics, filters
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.http import Http404, JsonResponse
+from django.utils.cache import get_conditional_response
+from django.views import View
+from rest_framework import viewsets, permissions, generics, filters, serializers, status
+from rest_framework.exceptions import APIException, NotFound
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework.response import Response
 from rest_framework.decorators import action
-from django.db.models import Avg, Count, Min, Max
+from django.db.models.functions import Coalesce
 
-from .models import Author, Category, Book
-from .serializers import AuthorSerializer, CategorySerializer, BookSerializer
+from bookshelf.metrics import SerializerTimingMixin
 
+from .bulk import bulk_create_books, bulk_delete_books, bulk_update_books
+from .cache import ResponseCacheMixin, get_versions, response_validators, set_validator_headers
+from .export import EXPORT_FORMATS, streaming_export
+from .filters import BookFilterSet
+from .models import Author, Category, Book, BookDetails, BookStatistics
+from .readers import BookReader, ReaderMixin
+from .search import FullTextSearchFilter
+from .serializers import (
+    AuthorSerializer, CategorySerializer, BookSerializer, BookBulkSerializer, BookBulkUpdateSerializer,
+    aserialize_many, prefetch_for_serializer
+)
 
-class AuthorViewSet(viewsets.ModelViewSet):
+
+class EagerLoadingMixin:
+    def get_queryset(self):
+        return prefetch_for_serializer(super().get_queryset(), self.get_serializer_class())
+
+
+class AuthorViewSet(ResponseCacheMixin, SerializerTimingMixin, viewsets.ModelViewSet):
+    cache_models = (Author,)
     queryset = Author.objects.all().order_by('last_name', 'first_name')
     serializer_class = AuthorSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
@@ -16,41 +40,180 @@ class AuthorViewSet(viewsets.ModelViewSet):
     search_fields = ['first_name', 'last_name']
 
 
-class CategoryViewSet(viewsets.ModelViewSet):
+class CategoryViewSet(ResponseCacheMixin, SerializerTimingMixin, viewsets.ModelViewSet):
+    cache_models = (Category,)
     queryset = Category.objects.all().order_by('name')
     serializer_class = CategorySerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
 
 
-class BookViewSet(viewsets.ModelViewSet):
+class BookViewSet(ResponseCacheMixin, SerializerTimingMixin, ReaderMixin, EagerLoadingMixin, viewsets.ModelViewSet):
+    cache_models = (Book, Author, Category, BookDetails)
     queryset = Book.objects.all()
     serializer_class = BookSerializer
+    reader_class = BookReader
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+    filter_backends = [DjangoFilterBackend, FullTextSearchFilter, filters.OrderingFilter]
 
-    filterset_fields = {
-        'author': ['exact'],
-        'categories': ['exact'],
-        'publication_date': ['year', 'month', 'day', 'gte', 'lte'],
-        'price': ['exact', 'gt', 'lt', 'gte', 'lte'],
-    }
+    filterset_class = BookFilterSet
 
     search_fields = ['title', 'description']
 
     ordering_fields = ['title', 'price', 'publication_date', 'author__last_name']
-    ordering = ['title']
 
     @action(detail=False, methods=['get'])
     def statistics(self, request):
-        stats = Book.objects.aggregate(
-            average_price=Avg('price'),
-            total_books=Count('id'),
-            min_price=Min('price'),
-            max_price=Max('price')
-        )
-        books_per_author = Author.objects.annotate(num_books=Count('books')).values('first_name', 'last_name', 'num_books')
+        totals = BookStatistics.objects.filter(author__isnull=True).first() or BookStatistics()
+        stats = {
+            "average_price": totals.average_price,
+            "total_books": totals.book_count,
+            "min_price": totals.min_price,
+            "max_price": totals.max_price
+        }
+        books_per_author = Author.objects.annotate(
+            num_books=Coalesce('statistics__book_count', 0)
+        ).values('first_name', 'last_name', 'num_books')
 
         return Response({
             "aggregate_stats": stats,
             "books_per_author": list(books_per_author)
         })
+
+    @action(detail=False, methods=['get'])
+    def export(self, request):
+        # Same filters, search and ordering as the list, but unpaginated and
+        # streamed row by row. "export_format" because DRF reserves "format".
+        export_format = request.query_params.get('export_format', 'csv')
+        if export_format not in EXPORT_FORMATS:
+            raise serializers.ValidationError(
+                {"export_format": [f"Dostępne formaty: {', '.join(EXPORT_FORMATS)}."]}
+            )
+        return streaming_export(self.filter_queryset(Book.objects.all()), export_format)
+
+    @action(detail=False, methods=['post', 'patch', 'delete'])
+    def bulk(self, request):
+        # POST creates a list of books, PATCH partially updates a list of
+        # books (each item with its "id"), DELETE removes a list of ids. Either
+        # every item is written in one transaction or nothing is, and the
+        # errors are reported per item.
+        if request.method == 'DELETE':
+            ids = serializers.ListField(child=serializers.IntegerField(), allow_empty=False).run_validation(
+                request.data
+            )
+            deleted, errors = bulk_delete_books(ids)
+            if errors:
+                return Response(errors, status=status.HTTP_400_BAD_REQUEST)
+            return Response({"deleted": deleted})
+
+        partial = request.method == 'PATCH'
+        serializer_class = BookBulkUpdateSerializer if partial else BookBulkSerializer
+        serializer = serializer_class(data=request.data, many=True, partial=partial, allow_empty=False)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        if partial:
+            books, errors = bulk_update_books(serializer.validated_data)
+        else:
+            books, errors = bulk_create_books(serializer.validated_data)
+        if errors:
+            return Response(errors, status=status.HTTP_400_BAD_REQUEST)
+        return Response(
+            {"updated" if partial else "created": len(books), "ids": [book.pk for book in books]},
+            status=status.HTTP_200_OK if partial else status.HTTP_201_CREATED
+        )
+
+
+class AsyncReadView(View):
+    """
+    Native async GET list/retrieve of a viewset, for ASGI deployments.
+
+    Authentication, permissions and throttling of viewset_class run first,
+    in one short sync_to_async step together with reading the model
+    versions, so neither a 304 nor a cached body is given to a client the
+    viewset would refuse. On a cache miss the filter backends run in a
+    second step (they may query the database); a page is then loaded with
+    aiterator() (a single object is fetched and its object permissions
+    checked in a third step), serialized in the event loop and cached under
+    the same versions and ETag rules as ResponseCacheMixin, so waiting on
+    slow clients never holds a thread.
+    """
+
+    viewset_class = None
+    json_dumps_params = {'ensure_ascii': False, 'separators': (',', ':')}
+
+    async def get(self, request, pk=None):
+        try:
+            viewset, versions = await sync_to_async(self.initialize)(request, pk)
+        except APIException as exc:
+            return self.error_response(exc)
+        key, etag, last_modified = response_validators(request, versions, 'json')
+        response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if response is None:
+            data = await cache.aget(key)
+            if data is None:
+                try:
+                    queryset = await sync_to_async(self.prepare)(viewset)
+                    if pk is None:
+                        data = await self.list(viewset, queryset)
+                    else:
+                        data = await self.retrieve(viewset, queryset, pk)
+                except (APIException, Http404) as exc:
+                    return self.error_response(exc)
+                await cache.aset(key, data, timeout=settings.BOOKS_RESPONSE_CACHE_TIMEOUT)
+            response = JsonResponse(data, safe=False, json_dumps_params=self.json_dumps_params)
+        return set_validator_headers(response, etag, last_modified)
+
+    def initialize(self, request, pk):
+        action = 'list' if pk is None else 'retrieve'
+        viewset = self.viewset_class(action_map={'get': action}, args=(), kwargs={} if pk is None else {'pk': pk})
+        viewset.format_kwarg = None
+        viewset.request = viewset.initialize_request(request)
+        viewset.initial(viewset.request)
+        return viewset, get_versions(self.viewset_class.cache_models)
+
+    def prepare(self, viewset):
+        if isinstance(viewset, ReaderMixin):
+            viewset.reader = viewset.get_reader()
+            return viewset.get_read_queryset(viewset.reader)
+        return viewset.filter_queryset(viewset.get_queryset())
+
+    async def serialize_many(self, viewset, rows):
+        if isinstance(viewset, ReaderMixin):
+            return await viewset.reader.arepresent(rows)
+        return await aserialize_many(viewset.get_serializer(), rows)
+
+    async def list(self, viewset, queryset):
+        paginator = viewset.paginator
+        rows = await paginator.apaginate_queryset(queryset, viewset.request, view=viewset)
+        if rows is None:
+            return await self.serialize_many(viewset, [row async for row in queryset])
+        return paginator.get_paginated_data(await self.serialize_many(viewset, rows))
+
+    async def retrieve(self, viewset, queryset, pk):
+        instance = await sync_to_async(self.get_object)(viewset, queryset, pk)
+        return (await self.serialize_many(viewset, [instance]))[0]
+
+    def get_object(self, viewset, queryset, pk):
+        # Object permissions may query the database, so the lookup and the
+        # check run in one thread, as in get_object() of the viewset.
+        instance = generics.get_object_or_404(queryset, **{viewset.lookup_field: pk})
+        viewset.check_object_permissions(viewset.request, instance)
+        return instance
+
+    def error_response(self, exc):
+        if isinstance(exc, Http404):
+            exc = NotFound()
+        detail = exc.detail if isinstance(exc.detail, (dict, list)) else {'detail': exc.detail}
+        return JsonResponse(detail, status=exc.status_code, safe=False, json_dumps_params=self.json_dumps_params)
+
+
+class AuthorAsyncView(AsyncReadView):
+    viewset_class = AuthorViewSet
+
+
+class CategoryAsyncView(AsyncReadView):
+    viewset_class = CategoryViewSet
+
+
+class BookAsyncView(AsyncReadView):
+    viewset_class = BookViewSet
@@ -0,0 +1,108 @@
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+from graphql import GraphQLError, parse, validate
+from graphene_django.settings import graphene_settings
+
+PERSISTED_QUERY_CACHE_KEY = 'graphql:persisted-query:{}'
+
+
+def query_hash(query):
+    return hashlib.sha256(query.encode('utf-8')).hexdigest()
+
+
+class DocumentCache:
+    """
+    LRU cache of parsed documents together with the result of validating
+    them against the standard rules, keyed by the sha256 of the query text.
+    Request specific checks (e.g. the cost budget, which depends on the
+    variables) still run on every request.
+    """
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self.documents = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, schema, query, key=None):
+        key = key or query_hash(query)
+        with self.lock:
+            entry = self.documents.get(key)
+            if entry is not None:
+                self.documents.move_to_end(key)
+                self.hits += 1
+                return entry
+            self.misses += 1
+
+        # Syntax errors propagate and are never cached.
+        document = parse(query)
+        entry = (document, validate(schema, document, max_errors=graphene_settings.MAX_VALIDATION_ERRORS))
+        if self.maxsize:
+            with self.lock:
+                self.documents[key] = entry
+                self.documents.move_to_end(key)
+                while len(self.documents) > self.maxsize:
+                    self.documents.popitem(last=False)
+        return entry
+
+    def clear(self):
+        with self.lock:
+            self.documents.clear()
+            self.hits = self.misses = 0
+
+    def info(self):
+        return {'hits': self.hits, 'misses': self.misses, 'size': len(self.documents), 'maxsize': self.maxsize}
+
+
+document_cache = DocumentCache(settings.GRAPHQL_DOCUMENT_CACHE_SIZE)
+
+
+class PersistedQueryError(GraphQLError):
+    def __init__(self, message, code):
+        super().__init__(message, extensions={'code': code})
+
+
+def _persisted_query_extension(extensions):
+    if isinstance(extensions, str):
+        try:
+            extensions = json.loads(extensions)
+        except ValueError:
+            return None
+    if not isinstance(extensions, dict):
+        return None
+    return extensions.get('persistedQuery')
+
+
+def resolve_persisted_query(extensions, query):
+    """
+    Automatic persisted queries: the client sends only
+    extensions.persistedQuery.sha256Hash; if the server does not know the
+    hash yet it answers PersistedQueryNotFound and the client repeats the
+    request with the full query, which is stored under its hash.
+
+    Returns (query, hash); hash is None for ordinary requests.
+    """
+    persisted = _persisted_query_extension(extensions)
+    if not persisted:
+        return query, None
+    sha256_hash = persisted.get('sha256Hash') if isinstance(persisted, dict) else None
+    if not sha256_hash or persisted.get('version', 1) != 1:
+        raise PersistedQueryError("Nieobsługiwany format zapytania utrwalonego.", 'PERSISTED_QUERY_NOT_SUPPORTED')
+
+    cache_key = PERSISTED_QUERY_CACHE_KEY.format(sha256_hash)
+    if not query:
+        query = cache.get(cache_key)
+        if query is None:
+            raise PersistedQueryError("PersistedQueryNotFound", 'PERSISTED_QUERY_NOT_FOUND')
+        return query, sha256_hash
+
+    if query_hash(query) != sha256_hash:
+        raise PersistedQueryError("Skrót zapytania nie zgadza się z jego treścią.", 'INVALID_PERSISTED_QUERY_HASH')
+    cache.set(cache_key, query, timeout=settings.GRAPHQL_PERSISTED_QUERY_TIMEOUT)
+    return query, sha256_hash
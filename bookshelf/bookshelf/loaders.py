@@ -0,0 +1,220 @@
+from collections import defaultdict
+from functools import partial
+
+import graphene
+from django.db.models import Count, F, QuerySet, Window
+from django.db.models.functions import RowNumber
+from graphene import relay
+from graphene_django.filter import DjangoFilterConnectionField
+from graphene_django.settings import graphene_settings
+from graphql_relay import get_offset_with_default
+
+from books.counts import CountedQuerySet
+from books.models import Author, Book, BookDetails, Category
+
+
+class BatchLoader:
+    """
+    Per-request batching loader for the synchronous executor.
+
+    graphql-core resolves list items one after another, so instead of waiting
+    for an event loop tick, keys are queued up front with prime() as soon as a
+    parent list is known; the first load() then fetches every queued key in
+    one query and later loads are served from the cache.
+    """
+
+    def __init__(self, batch_load, default=None):
+        self.batch_load = batch_load
+        self.default = default
+        self.cache = {}
+        self.pending = set()
+
+    def prime(self, keys):
+        self.pending.update(key for key in keys if key not in self.cache)
+
+    def load(self, key):
+        if key not in self.cache:
+            keys = self.pending | {key}
+            self.pending = set()
+            results = self.batch_load(keys)
+            for batch_key in keys:
+                self.cache[batch_key] = results.get(batch_key, self.default() if self.default else None)
+        return self.cache[key]
+
+
+class RelationPage:
+    """
+    The rows of a to-many relation that one connection page can reach, with
+    the length of the whole relation for totalCount and pageInfo. The
+    relation itself is kept for connections that are filtered.
+    """
+
+    def __init__(self, rows, length, queryset):
+        self.rows = rows
+        self.length = length
+        self.queryset = queryset
+
+    def __len__(self):
+        return self.length
+
+    def __getitem__(self, index):
+        return self.rows[index]
+
+
+def page_limit(args):
+    # How many rows from the start of a relation a connection page can
+    # reach, or None when it needs all of them (last/before count from the
+    # end).
+    if args.get('last') is not None or args.get('before') is not None:
+        return None
+    first = args.get('first')
+    if first is None:
+        first = graphene_settings.RELAY_CONNECTION_MAX_LIMIT
+        if first is None:
+            return None
+    start = get_offset_with_default(args.get('after'), -1) + 1 + (args.get('offset') or 0)
+    return start + first
+
+
+class RelationLoader:
+    """
+    Batching loader for the connections of to-many relations. Parents are
+    primed once; each page limit gets its own BatchLoader, whose batch reads
+    at most `limit` rows of every parent.
+    """
+
+    def __init__(self, batch_load):
+        self.batch_load = batch_load
+        self.keys = set()
+        self.loaders = {}
+
+    def prime(self, keys):
+        self.keys.update(keys)
+
+    def load(self, key, limit=None):
+        loader = self.loaders.get(limit)
+        if loader is None:
+            loader = self.loaders[limit] = BatchLoader(partial(self.batch_load, limit=limit))
+        if key not in loader.cache:
+            loader.prime(self.keys)
+        return loader.load(key)
+
+
+class Loaders:
+    def __init__(self):
+        self.author = BatchLoader(self.load_authors)
+        self.book_details = BatchLoader(self.load_book_details)
+        self.book_categories = BatchLoader(self.load_book_categories, default=list)
+        self.author_books = RelationLoader(self.load_author_books)
+        self.category_books = RelationLoader(self.load_category_books)
+
+    def prime(self, nodes):
+        books = [node for node in nodes if isinstance(node, Book)]
+        if books:
+            self.author.prime(book.author_id for book in books)
+            self.book_details.prime(book.pk for book in books)
+            self.book_categories.prime(book.pk for book in books)
+        self.author_books.prime(node.pk for node in nodes if isinstance(node, Author))
+        self.category_books.prime(node.pk for node in nodes if isinstance(node, Category))
+
+    def load_authors(self, keys):
+        return Author.objects.in_bulk(keys)
+
+    def load_book_details(self, keys):
+        return BookDetails.objects.in_bulk(keys)
+
+    def load_book_categories(self, keys):
+        rows = Book.categories.through.objects.filter(book_id__in=keys).select_related('category').order_by(
+            'category__name', 'category__pk'
+        )
+        grouped = defaultdict(list)
+        for row in rows:
+            grouped[row.book_id].append(row.category)
+        self.prime([category for categories in grouped.values() for category in categories])
+        return grouped
+
+    def load_pages(self, keys, rows, parent, ordering, limit, node, relation):
+        # One query for every parent: ROW_NUMBER() cuts each relation at the
+        # limit and COUNT() OVER keeps its full length.
+        rows = rows.annotate(
+            relation_length=Window(Count('pk'), partition_by=F(parent)),
+            relation_position=Window(RowNumber(), partition_by=F(parent), order_by=ordering),
+        ).order_by(*ordering)
+        if limit is not None:
+            rows = rows.filter(relation_position__lte=limit)
+        grouped, lengths = defaultdict(list), {}
+        for row in rows:
+            grouped[getattr(row, parent)].append(node(row))
+            lengths[getattr(row, parent)] = row.relation_length
+        self.prime([item for items in grouped.values() for item in items])
+        return {key: RelationPage(grouped[key], lengths.get(key, 0), relation(key)) for key in keys}
+
+    def load_author_books(self, keys, limit=None):
+        return self.load_pages(
+            keys, Book.objects.filter(author_id__in=keys), 'author_id', [*Book._meta.ordering, 'pk'], limit,
+            node=lambda book: book, relation=lambda key: Book.objects.filter(author_id=key)
+        )
+
+    def load_category_books(self, keys, limit=None):
+        return self.load_pages(
+            keys, Book.categories.through.objects.filter(category_id__in=keys).select_related('book'),
+            'category_id', ['-book__publication_date', 'book__title', 'book__pk'], limit,
+            node=lambda row: row.book, relation=lambda key: Book.objects.filter(categories=key)
+        )
+
+
+def get_loaders(info):
+    loaders = getattr(info.context, 'loaders', None)
+    if loaders is None:
+        loaders = info.context.loaders = Loaders()
+    return loaders
+
+
+class CountableConnection(relay.Connection):
+    total_count = graphene.Int(required=True)
+
+    class Meta:
+        abstract = True
+
+    def resolve_total_count(root, info):
+        return root.length
+
+
+class BatchedConnectionField(DjangoFilterConnectionField):
+    """
+    Connection field whose nodes are handed to the request's loaders, so
+    relations of every node on the page are fetched together. Resolvers may
+    return a list or a RelationPage produced by a loader; it is only turned
+    back into a queryset when the client passes filter arguments.
+    """
+
+    @classmethod
+    def resolve_queryset(cls, connection, iterable, info, args, filtering_args, filterset_class):
+        if isinstance(iterable, (list, RelationPage)):
+            if not any(args.get(name) is not None for name in filtering_args):
+                return iterable
+            if isinstance(iterable, RelationPage):
+                iterable = iterable.queryset
+            else:
+                model = connection._meta.node._meta.model
+                iterable = model.objects.filter(pk__in=[node.pk for node in iterable])
+        return super().resolve_queryset(connection, iterable, info, args, filtering_args, filterset_class)
+
+    @classmethod
+    def resolve_connection(cls, connection, args, iterable, max_limit=None):
+        # graphene-django sizes a queryset with COUNT(*) before slicing it;
+        # books.counts answers from counters or its cache where it can. The
+        # count bounds the slice, so it is always exact here.
+        if isinstance(iterable, QuerySet):
+            iterable = CountedQuerySet(iterable)
+        return super().resolve_connection(connection, args, iterable, max_limit)
+
+    @classmethod
+    def connection_resolver(cls, resolver, connection, default_manager, queryset_resolver, max_limit,
+                            enforce_first_or_last, root, info, **args):
+        result = super().connection_resolver(
+            resolver, connection, default_manager, queryset_resolver, max_limit,
+            enforce_first_or_last, root, info, **args
+        )
+        get_loaders(info).prime([edge.node for edge in result.edges])
+        return result
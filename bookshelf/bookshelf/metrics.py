@@ -0,0 +1,263 @@
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import lru_cache
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from rest_framework import permissions, renderers
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+QUANTILES = (0.5, 0.9, 0.99)
+MEASUREMENTS = {
+    'duration': ('bookshelf_request_duration_seconds', "Czas obsługi żądania."),
+    'queries': ('bookshelf_request_queries', "Liczba zapytań SQL na żądanie."),
+    'sql_time': ('bookshelf_request_sql_seconds', "Łączny czas zapytań SQL na żądanie."),
+    'serializer_time': ('bookshelf_request_serializer_seconds', "Czas serializacji DRF na żądanie."),
+    'response_size': ('bookshelf_response_size_bytes', "Rozmiar odpowiedzi."),
+}
+
+_current = ContextVar('request_metrics', default=None)
+
+
+class RequestMetrics:
+    def __init__(self):
+        self.tag = None
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.sql_time = 0.0
+        self.serializer_time = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        # Called by _record_query for the queries of the request.
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries += 1
+            self.sql_time += time.perf_counter() - started
+
+
+def current_metrics():
+    return _current.get()
+
+
+def _record_query(execute, sql, params, many, context):
+    metrics = _current.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    return metrics(execute, sql, params, many, context)
+
+
+@receiver(connection_created)
+def install_query_recorder(sender, connection, **kwargs):
+    # Installed on every connection by the thread that opens it. Under ASGI
+    # the queries of a request run in sync_to_async worker threads, whose
+    # connections a wrapper installed by the middleware on the event loop
+    # thread would never see; the request's RequestMetrics reaches them
+    # through the context variable, which sync_to_async carries over.
+    if _record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_record_query)
+
+
+class _Series:
+    def __init__(self, sample_size):
+        self.samples = deque(maxlen=sample_size)
+        self.total = 0.0
+        self.count = 0
+
+    def add(self, value):
+        self.samples.append(value)
+        self.total += value
+        self.count += 1
+
+    def quantile(self, fraction):
+        ordered = sorted(self.samples)
+        return ordered[min(int(round(fraction * (len(ordered) - 1))), len(ordered) - 1)]
+
+
+class MetricsRegistry:
+    """
+    In-process aggregation per (endpoint, method). Sums and counts are
+    cumulative; quantiles are computed over the last METRICS_SAMPLE_SIZE
+    requests of each endpoint. GraphQL operation names come from clients,
+    so only the first METRICS_MAX_OPERATION_NAMES get their own series.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.series = defaultdict(lambda: _Series(settings.METRICS_SAMPLE_SIZE))
+            self.requests = defaultdict(int)
+            self.operation_names = set()
+
+    def graphql_endpoint(self, operation, name):
+        with self.lock:
+            if name not in self.operation_names and len(self.operation_names) < settings.METRICS_MAX_OPERATION_NAMES:
+                self.operation_names.add(name)
+            if name not in self.operation_names:
+                name = 'other'
+        return f"graphql:{operation}:{name}"
+
+    def record(self, endpoint, method, status_code, measurements):
+        with self.lock:
+            self.requests[(endpoint, method, status_code)] += 1
+            for name, value in measurements.items():
+                self.series[(name, endpoint, method)].add(value)
+
+    def render_prometheus(self):
+        with self.lock:
+            lines = [
+                "# HELP bookshelf_requests_total Liczba obsłużonych żądań.",
+                "# TYPE bookshelf_requests_total counter",
+            ]
+            for (endpoint, method, status_code), count in sorted(self.requests.items()):
+                lines.append(
+                    f'bookshelf_requests_total{{endpoint="{endpoint}",method="{method}",status="{status_code}"}} {count}'
+                )
+            for name, (metric, help_text) in MEASUREMENTS.items():
+                lines += [f"# HELP {metric} {help_text}", f"# TYPE {metric} summary"]
+                for (series_name, endpoint, method), series in sorted(self.series.items()):
+                    if series_name != name:
+                        continue
+                    labels = f'endpoint="{endpoint}",method="{method}"'
+                    for fraction in QUANTILES:
+                        lines.append(f'{metric}{{{labels},quantile="{fraction}"}} {series.quantile(fraction):g}')
+                    lines.append(f'{metric}_sum{{{labels}}} {series.total:g}')
+                    lines.append(f'{metric}_count{{{labels}}} {series.count}')
+            return '\n'.join(lines) + '\n'
+
+
+registry = MetricsRegistry()
+
+
+def _endpoint(request, metrics):
+    if metrics.tag:
+        return metrics.tag
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return 'unmatched'
+    return match.view_name or match.route
+
+
+class RequestMetricsMiddleware:
+    # Sync and async capable, so the async read views are not pushed into a
+    # thread under ASGI.
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        with self.recording() as metrics:
+            response = self.get_response(request)
+        self.record(request, response, metrics)
+        return response
+
+    async def __acall__(self, request):
+        with self.recording() as metrics:
+            response = await self.get_response(request)
+        self.record(request, response, metrics)
+        return response
+
+    @contextmanager
+    def recording(self):
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+        try:
+            yield metrics
+        finally:
+            _current.reset(token)
+
+    def record(self, request, response, metrics):
+        measurements = {
+            'duration': time.perf_counter() - metrics.started,
+            'queries': metrics.queries,
+            'sql_time': metrics.sql_time,
+            'serializer_time': metrics.serializer_time,
+        }
+        # Streaming responses are produced after the middleware returns, so
+        # neither their size nor their queries are known here.
+        if not response.streaming:
+            measurements['response_size'] = len(response.content)
+        registry.record(_endpoint(request, metrics), request.method, response.status_code, measurements)
+
+
+class GraphQLMetricsMiddleware:
+    # Graphene middleware: tags the request with the GraphQL operation name
+    # instead of the single /graphql/ route.
+
+    def resolve(self, next, root, info, **args):
+        if info.path.prev is None:
+            metrics = current_metrics()
+            if metrics is not None and metrics.tag is None:
+                name = info.operation.name.value if info.operation.name else 'anonymous'
+                metrics.tag = registry.graphql_endpoint(info.operation.operation.value, name)
+        return next(root, info, **args)
+
+
+@contextmanager
+def serializer_timing():
+    # Adds the time spent in the block to the serializer time of the request.
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics = current_metrics()
+        if metrics is not None:
+            metrics.serializer_time += time.perf_counter() - started
+
+
+@lru_cache(maxsize=None)
+def timed_serializer_class(serializer_class):
+    def to_representation(self, instance):
+        with serializer_timing():
+            return super(timed, self).to_representation(instance)
+
+    timed = type(serializer_class.__name__, (serializer_class,), {
+        '__module__': serializer_class.__module__,
+        '__qualname__': serializer_class.__qualname__,
+        'to_representation': to_representation,
+    })
+    return timed
+
+
+class SerializerTimingMixin:
+    # Viewset mixin adding the time spent in the serializer's
+    # to_representation to the request metrics.
+
+    def get_serializer_class(self):
+        return timed_serializer_class(super().get_serializer_class())
+
+
+class PrometheusRenderer(renderers.BaseRenderer):
+    media_type = 'text/plain'
+    format = 'prometheus'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if isinstance(data, str):
+            return data
+        return '\n'.join(f"{key}: {value}" for key, value in data.items()) + '\n'
+
+
+class MetricsView(APIView):
+    permission_classes = [permissions.IsAdminUser]
+    renderer_classes = [PrometheusRenderer]
+
+    def get(self, request):
+        return Response(registry.render_prometheus(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -0,0 +1,146 @@
+from dataclasses import dataclass
+
+from graphql import (
+    FieldNode,
+    FragmentDefinitionNode,
+    FragmentSpreadNode,
+    GraphQLError,
+    GraphQLObjectType,
+    VariableNode,
+    get_named_type,
+    get_operation_ast,
+    is_leaf_type,
+)
+from graphql.validation import ValidationRule
+from graphene_django.settings import graphene_settings
+
+# Fields whose cost differs from the default: 1 per object a composite field
+# may resolve, 0 for scalars and for the edges/pageInfo connection wrappers.
+# Top-level connections run a COUNT(*) besides the page query.
+FIELD_WEIGHTS = {
+    'Query.allAuthors': 2,
+    'Query.allCategories': 2,
+    'Query.allBooks': 2,
+}
+CONNECTION_WRAPPERS = ('edges', 'pageInfo')
+
+
+@dataclass
+class QueryCost:
+    cost: int
+    depth: int
+
+    def as_extension(self, max_cost, max_depth):
+        return {'cost': self.cost, 'maxCost': max_cost, 'depth': self.depth, 'maxDepth': max_depth}
+
+
+def _is_connection(graphql_type):
+    return isinstance(graphql_type, GraphQLObjectType) and 'edges' in graphql_type.fields \
+        and 'pageInfo' in graphql_type.fields
+
+
+class QueryCostAnalyzer:
+    """
+    Static upper bound of the work an operation may cause, computed from the
+    document alone before anything is executed: every object field costs its
+    weight times the number of parents it can be resolved for, and each
+    connection multiplies that number by its first/last argument (or by the
+    default page size when none is given).
+    """
+
+    def __init__(self, schema, document, variables=None):
+        self.schema = schema
+        self.variables = variables or {}
+        self.fragments = {
+            definition.name.value: definition
+            for definition in document.definitions
+            if isinstance(definition, FragmentDefinitionNode)
+        }
+        self.document = document
+
+    def analyze(self, operation_name=None):
+        operation = get_operation_ast(self.document, operation_name)
+        if operation is None:
+            return QueryCost(cost=0, depth=0)
+        root_type = self.schema.get_root_type(operation.operation)
+        cost, depth = self.selection_set_cost(root_type, operation.selection_set, multiplier=1, depth=0)
+        return QueryCost(cost=cost, depth=depth)
+
+    def page_size(self, field_node):
+        for argument in field_node.arguments:
+            if argument.name.value not in ('first', 'last'):
+                continue
+            value = argument.value
+            if isinstance(value, VariableNode):
+                value = self.variables.get(value.name.value)
+            else:
+                value = getattr(value, 'value', None)
+            try:
+                return int(value)
+            except (TypeError, ValueError):
+                pass
+        return graphene_settings.RELAY_CONNECTION_MAX_LIMIT
+
+    def selection_set_cost(self, parent_type, selection_set, multiplier, depth):
+        total, max_depth = 0, depth
+        for selection in selection_set.selections:
+            if isinstance(selection, FieldNode):
+                cost, field_depth = self.field_cost(parent_type, selection, multiplier, depth + 1)
+            else:
+                if isinstance(selection, FragmentSpreadNode):
+                    fragment = self.fragments.get(selection.name.value)
+                    if fragment is None:
+                        continue
+                else:
+                    fragment = selection
+                fragment_type = parent_type
+                if fragment.type_condition is not None:
+                    fragment_type = self.schema.get_type(fragment.type_condition.name.value) or parent_type
+                cost, field_depth = self.selection_set_cost(fragment_type, fragment.selection_set, multiplier, depth)
+            total += cost
+            max_depth = max(max_depth, field_depth)
+        return total, max_depth
+
+    def field_cost(self, parent_type, field_node, multiplier, depth):
+        name = field_node.name.value
+        fields = getattr(parent_type, 'fields', {})
+        if name.startswith('__') or name not in fields:
+            return 0, depth
+
+        field_type = get_named_type(fields[name].type)
+        default_weight = 0 if is_leaf_type(field_type) or name in CONNECTION_WRAPPERS else 1
+        cost = FIELD_WEIGHTS.get(f'{parent_type.name}.{name}', default_weight) * multiplier
+        if field_node.selection_set is None:
+            return cost, depth
+
+        if _is_connection(field_type):
+            multiplier *= self.page_size(field_node)
+        child_cost, child_depth = self.selection_set_cost(field_type, field_node.selection_set, multiplier, depth)
+        return cost + child_cost, child_depth
+
+
+def analyze_query_cost(schema, document, operation_name=None, variables=None):
+    return QueryCostAnalyzer(schema, document, variables).analyze(operation_name)
+
+
+def query_cost_rule(variables=None, operation_name=None, max_cost=None, max_depth=None, on_analyzed=None):
+    # Validation rules are instantiated by graphql-core without arguments, so
+    # the request specific variables are bound into a class built per request.
+
+    class QueryCostRule(ValidationRule):
+        def enter_document(self, node, *args):
+            query_cost = analyze_query_cost(self.context.schema, node, operation_name, variables)
+            if on_analyzed is not None:
+                on_analyzed(query_cost)
+            if max_depth is not None and query_cost.depth > max_depth:
+                self.report_error(GraphQLError(
+                    f"Zapytanie jest zbyt głębokie: głębokość {query_cost.depth} przekracza limit {max_depth}.",
+                    node
+                ))
+            if max_cost is not None and query_cost.cost > max_cost:
+                self.report_error(GraphQLError(
+                    f"Zapytanie jest zbyt kosztowne: koszt {query_cost.cost} przekracza limit {max_cost}.",
+                    node
+                ))
+
+    return QueryCostRule
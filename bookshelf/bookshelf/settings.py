@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.1/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -43,6 +44,7 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'bookshelf.metrics.RequestMetricsMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -124,6 +126,10 @@ STATIC_ROOT = BASE_DIR / 'staticfiles'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'mediafiles'
 
+# Background threads rendering cover renditions (books.covers); 0 renders
+# them synchronously after the upload is committed.
+COVER_RENDITION_WORKERS = 2
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.1/ref/settings/#default-auto-field
 
@@ -137,9 +143,47 @@ REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticatedOrReadOnly',
     ),
+    'DEFAULT_PAGINATION_CLASS': 'books.pagination.KeysetPagination',
+    'PAGE_SIZE': 100,
+}
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
 }
+if os.environ.get('REDIS_URL'):
+    CACHES['default'] = {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.environ['REDIS_URL'],
+    }
+
+# Cached REST responses are versioned (see books/cache.py), the timeout only
+# bounds how long unused entries occupy the cache.
+BOOKS_RESPONSE_CACHE_TIMEOUT = 60 * 60
+
+# Results up to this size are counted exactly on every request; larger
+# counts are cached until the next catalog write (see books/counts.py).
+COUNT_EXACT_THRESHOLD = 1000
+COUNT_CACHE_TIMEOUT = 60 * 60
 
 GRAPHENE = {
-    "SCHEMA": "bookshelf.schema.schema"
+    "SCHEMA": "bookshelf.schema.schema",
+    "MIDDLEWARE": ["bookshelf.metrics.GraphQLMetricsMiddleware"],
 }
 
+# Static upper bounds checked before a GraphQL operation is executed; see
+# bookshelf/query_cost.py for how the cost is computed.
+GRAPHQL_MAX_QUERY_COST = 50000
+GRAPHQL_MAX_QUERY_DEPTH = 15
+
+# Parsed and validated GraphQL documents kept in memory, per process.
+GRAPHQL_DOCUMENT_CACHE_SIZE = 256
+# Persisted queries are stored in the default cache; None keeps them forever.
+GRAPHQL_PERSISTED_QUERY_TIMEOUT = None
+
+# Per-endpoint samples kept for the quantiles served at /api/_metrics/.
+METRICS_SAMPLE_SIZE = 1000
+# Distinct GraphQL operation names tracked as separate endpoints; further
+# names are counted under graphql:<operation>:other.
+METRICS_MAX_OPERATION_NAMES = 100
@@ -2,19 +2,21 @@ from django.contrib import admin
 from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
-from graphene_django.views import GraphQLView
 from rest_framework_simplejwt.views import (
     TokenObtainPairView,
     TokenRefreshView,
 )
+from .metrics import MetricsView
+from .views import BookshelfGraphQLView
 
 urlpatterns = [
     path('admin/', admin.site.urls),
+    path('api/_metrics/', MetricsView.as_view(), name='metrics'),
     path('api/', include('books.urls')),
     path('api-auth/', include('rest_framework.urls', namespace='rest_framework')),
     path('api/token/', TokenObtainPairView.as_view(), name='token_obtain_pair'),
     path('api/token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
-    path("graphql/", GraphQLView.as_view(graphiql=True)),
+    path("graphql/", BookshelfGraphQLView.as_view(graphiql=True)),
 
 ]
 
@@ -0,0 +1,107 @@
+from django.conf import settings
+from django.db import connection, transaction
+from django.http import HttpResponseNotAllowed
+from graphene_django.constants import MUTATION_ERRORS_FLAG
+from graphene_django.settings import graphene_settings
+from graphene_django.views import GraphQLView, HttpError
+from graphql import ExecutionResult, GraphQLError, OperationType, execute, get_operation_ast, validate, validate_schema
+
+from .documents import PersistedQueryError, document_cache, resolve_persisted_query
+from .query_cost import query_cost_rule
+
+
+class BookshelfGraphQLView(GraphQLView):
+    """
+    GraphQLView that refuses operations above the configured cost or depth
+    while validating them, so an over-budget query never reaches a resolver
+    (and never runs SQL). The computed cost is returned in "extensions".
+
+    Parsed and validated documents are reused from document_cache, and
+    clients may send only the hash of a query they persisted earlier.
+    """
+
+    def get_response(self, request, data, show_graphiql=False):
+        self.extensions = {}
+        self.persisted_query_error = None
+        self.query_hash = None
+        return super().get_response(request, data, show_graphiql)
+
+    def get_graphql_params(self, request, data):
+        query, variables, operation_name, id = super().get_graphql_params(request, data)
+        try:
+            extensions = request.GET.get('extensions') or data.get('extensions')
+            query, self.query_hash = resolve_persisted_query(extensions, query)
+        except PersistedQueryError as error:
+            self.persisted_query_error = error
+        return query, variables, operation_name, id
+
+    def execute_graphql_request(self, request, data, query, variables, operation_name, show_graphiql=False):
+        if self.persisted_query_error is not None:
+            return ExecutionResult(errors=[self.persisted_query_error])
+        if not query:
+            return super().execute_graphql_request(request, data, query, variables, operation_name, show_graphiql)
+
+        schema = self.schema.graphql_schema
+        schema_validation_errors = validate_schema(schema)
+        if schema_validation_errors:
+            return ExecutionResult(data=None, errors=schema_validation_errors)
+
+        try:
+            document, validation_errors = document_cache.get(schema, query, key=self.query_hash)
+        except GraphQLError as error:
+            return ExecutionResult(errors=[error])
+        if validation_errors:
+            return ExecutionResult(data=None, errors=validation_errors)
+
+        operation_ast = get_operation_ast(document, operation_name)
+        if request.method.lower() == 'get' and operation_ast is not None \
+                and operation_ast.operation != OperationType.QUERY:
+            if show_graphiql:
+                return None
+            raise HttpError(HttpResponseNotAllowed(
+                ['POST'], f"Can only perform a {operation_ast.operation.value} operation from a POST request."
+            ))
+
+        cost_errors = validate(schema, document, [query_cost_rule(
+            variables, operation_name,
+            max_cost=settings.GRAPHQL_MAX_QUERY_COST,
+            max_depth=settings.GRAPHQL_MAX_QUERY_DEPTH,
+            on_analyzed=self.report_cost,
+        )])
+        if cost_errors:
+            return ExecutionResult(data=None, errors=cost_errors)
+
+        try:
+            execute_options = {
+                'root_value': self.get_root_value(request),
+                'context_value': self.get_context(request),
+                'variable_values': variables,
+                'operation_name': operation_name,
+                'middleware': self.get_middleware(request),
+            }
+            if self.execution_context_class:
+                execute_options['execution_context_class'] = self.execution_context_class
+
+            if operation_ast is not None and operation_ast.operation == OperationType.MUTATION and (
+                graphene_settings.ATOMIC_MUTATIONS is True
+                or connection.settings_dict.get('ATOMIC_MUTATIONS', False) is True
+            ):
+                with transaction.atomic():
+                    result = execute(schema, document, **execute_options)
+                    if getattr(request, MUTATION_ERRORS_FLAG, False) is True:
+                        transaction.set_rollback(True)
+                return result
+
+            return execute(schema, document, **execute_options)
+        except Exception as error:
+            return ExecutionResult(errors=[error])
+
+    def report_cost(self, query_cost):
+        self.extensions['queryCost'] = query_cost.as_extension(
+            settings.GRAPHQL_MAX_QUERY_COST, settings.GRAPHQL_MAX_QUERY_DEPTH
+        )
+
+    def json_encode(self, request, d, pretty=False):
+        if getattr(self, 'extensions', None):
+            d = {**d, 'extensions': self.extensions}
+        return super().json_encode(request, d, pretty)
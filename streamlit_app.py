@@ -1,5 +1,10 @@
 import streamlit as st
 import requests
+from requests.adapters import HTTPAdapter
+from concurrent.futures import ThreadPoolExecutor
+from itertools import count
+import threading
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
 from decimal import Decimal, InvalidOperation
 import datetime
 
@@ -21,6 +26,22 @@ BOOK_FORMAT_CHOICES_FRONTEND = [
 ]
 BOOK_FORMAT_CODES = [code for code, name in BOOK_FORMAT_CHOICES_FRONTEND]
 
+HTTP_POOL_SIZE = 10
+# The API's max_page_size: cursor pages can only be fetched one after
+# another, so fewer, larger pages mean fewer serial round trips.
+PAGE_SIZE = 1000
+# Reads are cached for CACHE_TTL seconds and then revalidated with
+# If-None-Match; writes made through this app invalidate them at once.
+CACHE_TTL = 300
+CACHE_MAX_ENTRIES = 256
+# Books embed author and category names, so writes to those collections
+# make the cached books stale as well.
+DEPENDENT_COLLECTIONS = {
+    AUTHORS_URL: [BOOKS_URL],
+    CATEGORIES_URL: [BOOKS_URL],
+    BOOKS_URL: [],
+}
+
 if "auth_token" not in st.session_state:
     st.session_state.auth_token = None
 if "refresh_token" not in st.session_state:
@@ -29,6 +50,18 @@ if "user_info" not in st.session_state:
     st.session_state.user_info = None
 if "selected_book_data" not in st.session_state:
     st.session_state.selected_book_data = None
+if "http_session" not in st.session_state:
+    # One pooled session per Streamlit session: keep-alive connections are
+    # reused across reruns and shared by the concurrent fetches.
+    _session = requests.Session()
+    _adapter = HTTPAdapter(pool_connections=HTTP_POOL_SIZE, pool_maxsize=HTTP_POOL_SIZE)
+    _session.mount("http://", _adapter)
+    _session.mount("https://", _adapter)
+    st.session_state.http_session = _session
+
+
+def get_session():
+    return st.session_state.http_session
 
 
 def get_auth_headers():
@@ -39,7 +72,7 @@ def get_auth_headers():
 
 def login(username, password):
     try:
-        response = requests.post(
+        response = get_session().post(
             TOKEN_URL, data={"username": username, "password": password}
         )
         response.raise_for_status()
@@ -67,43 +100,141 @@ def logout():
     st.rerun()
 
 
-def fetch_data(url, params=None):
-    try:
-        response = requests.get(url, headers=get_auth_headers(), params=params)
-        response.raise_for_status()
+class UnexpectedDataFormat(Exception):
+    pass
+
+
+@st.cache_resource
+def _cache_state():
+    # Shared by all sessions. The generation of a collection is part of the
+    # st.cache_data key, so bumping it after a write makes every session miss
+    # the stale entries; the validators keep the last ETag and body per URL
+    # for conditional requests once an entry has expired.
+    return {"lock": threading.Lock(), "counter": count(1), "generations": {}, "validators": {}}
+
+
+def _collection_of(url):
+    for collection in DEPENDENT_COLLECTIONS:
+        if url.startswith(collection):
+            return collection
+    return url
+
+
+def _generation(url):
+    return _cache_state()["generations"].get(_collection_of(url), 0)
+
+
+def invalidate_collection(url):
+    state = _cache_state()
+    collection = _collection_of(url)
+    with state["lock"]:
+        for affected in [collection, *DEPENDENT_COLLECTIONS.get(collection, [])]:
+            state["generations"][affected] = next(state["counter"])
+
+
+def _conditional_get(session, url, headers, params=None, load=None):
+    # GETs url with the stored ETag; a 304 returns the stored body without
+    # downloading it again. load(response) builds the body to store (by
+    # default the JSON of the response).
+    state = _cache_state()
+    key = (url, tuple(sorted((params or {}).items())), headers.get("Authorization"))
+    with state["lock"]:
+        stored = state["validators"].get(key)
+    request_headers = dict(headers)
+    if stored:
+        request_headers["If-None-Match"] = stored[0]
+    response = session.get(url, headers=request_headers, params=params)
+    if stored and response.status_code == 304:
+        return stored[1]
+    response.raise_for_status()
+    body = load(response) if load else response.json()
+    etag = response.headers.get("ETag")
+    if etag:
+        with state["lock"]:
+            state["validators"].pop(key, None)
+            state["validators"][key] = (etag, body)
+            while len(state["validators"]) > CACHE_MAX_ENTRIES:
+                state["validators"].pop(next(iter(state["validators"])))
+    return body
+
+
+def _get_all_pages(session, url, headers, params=None):
+    # Runs in worker threads, so it must not touch st.* - errors are raised
+    # and reported by the caller. The ETag of the first page covers the whole
+    # collection: it changes with any write to it.
+    def load(response):
         data = response.json()
-        results = []
-        if isinstance(data, dict) and "results" in data:
+        if isinstance(data, list):
+            return data
+        if not (isinstance(data, dict) and "results" in data):
+            raise UnexpectedDataFormat(url)
+        results = list(data["results"])
+        next_url = data.get("next")
+        while next_url:
+            page = session.get(next_url, headers=headers)
+            page.raise_for_status()
+            data = page.json()
             results.extend(data["results"])
             next_url = data.get("next")
-            while next_url:
-                response = requests.get(next_url, headers=get_auth_headers())
-                response.raise_for_status()
-                data = response.json()
-                results.extend(data["results"])
-                next_url = data.get("next")
-            return results
-        elif isinstance(data, list):
-            return data
-        else:
-            st.warning(f"Nieoczekiwany format danych z {url}")
-            return None
-    except requests.exceptions.RequestException as e:
+        return results
+
+    return _conditional_get(session, url, headers, {"page_size": PAGE_SIZE, **(params or {})}, load)
+
+
+# The auth token and the generation only take part in the cache key; the
+# session (underscore prefix) is not hashed.
+@st.cache_data(ttl=CACHE_TTL, max_entries=CACHE_MAX_ENTRIES, show_spinner=False)
+def _cached_collection(url, params, auth_token, generation, _session):
+    headers = {"Authorization": f"Bearer {auth_token}"} if auth_token else {}
+    return _get_all_pages(_session, url, headers, params)
+
+
+@st.cache_data(ttl=CACHE_TTL, max_entries=CACHE_MAX_ENTRIES, show_spinner=False)
+def _cached_single(url, auth_token, generation, _session):
+    headers = {"Authorization": f"Bearer {auth_token}"} if auth_token else {}
+    return _conditional_get(_session, url, headers)
+
+
+def _report_fetch_error(url, e):
+    if isinstance(e, UnexpectedDataFormat):
+        st.warning(f"Nieoczekiwany format danych z {url}")
+    elif isinstance(e, requests.exceptions.RequestException):
         st.error(f"Błąd pobierania danych z {url}: {e}")
         st.error(
             f"Odpowiedź serwera: {e.response.text if e.response else 'Brak odpowiedzi'}"
         )
-        return None
-    except Exception as e:
+    else:
         st.error(f"Nieoczekiwany błąd podczas pobierania danych: {e}")
-        return None
+
+
+def fetch_collections(urls, params=None):
+    # Every page of several collections, fetched concurrently on cache
+    # misses; None for a failed one. Failures are not cached.
+    session, token, ctx = get_session(), st.session_state.auth_token, get_script_run_ctx()
+    with ThreadPoolExecutor(
+        max_workers=len(urls), initializer=lambda: add_script_run_ctx(threading.current_thread(), ctx)
+    ) as pool:
+        futures = [
+            pool.submit(_cached_collection, url, params or {}, token, _generation(url), session)
+            for url in urls
+        ]
+    results = []
+    for url, future in zip(urls, futures):
+        try:
+            results.append(future.result())
+        except Exception as e:
+            _report_fetch_error(url, e)
+            results.append(None)
+    return results
+
+
+def fetch_data(url, params=None):
+    return fetch_collections([url], params)[0]
 
 
 def fetch_single_data(url):
     try:
-        response = requests.get(url, headers=get_auth_headers())
-        response.raise_for_status()
-        return response.json()
+        return _cached_single(url, st.session_state.auth_token, _generation(url), get_session())
     except requests.exceptions.RequestException as e:
         st.error(f"Błąd pobierania danych z {url}: {e}")
         st.error(
@@ -122,8 +253,9 @@ def create_data(url, data):
         return None
     headers["Content-Type"] = "application/json"
     try:
-        response = requests.post(url, headers=headers, json=data)
+        response = get_session().post(url, headers=headers, json=data)
         response.raise_for_status()
+        invalidate_collection(url)
         st.success("Dane dodane pomyślnie!")
         return response.json()
     except requests.exceptions.RequestException as e:
@@ -147,8 +279,9 @@ def create_data_with_file(url, data, files):
         st.warning("Musisz być zalogowany.")
         return None
     try:
-        response = requests.post(url, headers=headers, data=data, files=files)
+        response = get_session().post(url, headers=headers, data=data, files=files)
         response.raise_for_status()
+        invalidate_collection(url)
         st.success("Dane i plik dodane pomyślnie!")
         return response.json()
     except requests.exceptions.RequestException as e:
@@ -173,8 +306,9 @@ def update_data(url, data):
         return None
     headers["Content-Type"] = "application/json"
     try:
-        response = requests.patch(url, headers=headers, json=data)
+        response = get_session().patch(url, headers=headers, json=data)
         response.raise_for_status()
+        invalidate_collection(url)
         st.success("Dane zaktualizowane pomyślnie!")
         return response.json()
     except requests.exceptions.RequestException as e:
@@ -198,8 +332,9 @@ def delete_data(url):
         st.warning("Musisz być zalogowany.")
         return False
     try:
-        response = requests.delete(url, headers=headers)
+        response = get_session().delete(url, headers=headers)
         response.raise_for_status()
+        invalidate_collection(url)
         st.success("Dane usunięte pomyślnie!")
         return True
     except requests.exceptions.RequestException as e:
@@ -234,14 +369,18 @@ else:
 
 tab_authors, tab_categories, tab_books = st.tabs(["Autorzy", "Kategorie", "Książki"])
 
+# Every tab is rendered on each rerun, so the collections are fetched once,
+# in parallel, and shared by the tabs.
+authors, categories, books = fetch_collections([AUTHORS_URL, CATEGORIES_URL, BOOKS_URL])
+
 with tab_authors:
     st.header("Zarządzanie Autorami")
     col1, col2 = st.columns(2)
     with col1:
         st.subheader("Lista Autorów")
         if st.button("Odśwież Autorów"):
+            invalidate_collection(AUTHORS_URL)
             st.rerun()
-        authors = fetch_data(AUTHORS_URL)
         if authors:
             authors_display = [
                 {
@@ -347,8 +486,8 @@ with tab_categories:
     with col1_cat:
         st.subheader("Lista Kategorii")
         if st.button("Odśwież Kategorie"):
+            invalidate_collection(CATEGORIES_URL)
             st.rerun()
-        categories = fetch_data(CATEGORIES_URL)
         if categories:
             cat_display = [
                 {
@@ -443,8 +582,8 @@ with tab_categories:
 with tab_books:
     st.header("Zarządzanie Książkami")
 
-    all_authors = fetch_data(AUTHORS_URL)
-    all_categories = fetch_data(CATEGORIES_URL)
+    all_authors = authors
+    all_categories = categories
 
     author_map = (
         {f"{a['first_name']} {a['last_name']}": a["id"] for a in all_authors}
@@ -462,8 +601,8 @@ with tab_books:
     with col1_book:
         st.subheader("Lista Książek")
         if st.button("Odśwież Książki"):
+            invalidate_collection(BOOKS_URL)
             st.rerun()
-        books = fetch_data(BOOKS_URL)
         if books:
             st.markdown("---")
             cols_per_row = 4
@@ -472,7 +611,8 @@ with tab_books:
                     cols = st.columns(cols_per_row)
                 col_index = i % cols_per_row
                 with cols[col_index]:
-                    cover_url = b.get("cover_image")
+                    # The precomputed thumbnail; the original until it is generated.
+                    cover_url = (b.get("cover_thumbnail") or {}).get("webp") or b.get("cover_image")
                     details = b.get("details", {})
 
                     if cover_url:
@@ -530,7 +670,9 @@ with tab_books:
                     st.markdown("###")
                     st.subheader(f"Edytuj / Usuń: {current_book.get('title')}")
 
-                    current_cover_url = current_book.get("cover_image")
+                    current_cover_url = (current_book.get("cover_card") or {}).get(
+                        "webp"
+                    ) or current_book.get("cover_image")
                     if current_cover_url:
                         if current_cover_url.startswith("/media"):
                             current_cover_url = f"{SERVER_BASE_URL}{current_cover_url}"